@@ -1,17 +1,23 @@
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import copy
-from dataclasses import dataclass, field
+import hashlib
+from dataclasses import dataclass, field, fields
+import json
 import logging
 import df_utils
 from itertools import product
 from multiprocess import Process, Pool, Manager
+from multiprocessing.shared_memory import SharedMemory
 import numpy as np
 import os
 import pandas as pd
+import tempfile
 from tqdm import tqdm
 from typing import Callable, List, DefaultDict
+import warnings
 
 import names
+from seeding import key_hash, stream
 import success_metrics
 
 EPSILON = 1e-10
@@ -23,6 +29,201 @@ logger = logging.getLogger(__name__)
 tqdm.pandas()
 
 
+def _best_responses(responses, response_dir):
+    """
+    Best of grouped responses: minimum for response_dir = -1, maximum otherwise
+    """
+    if response_dir == -1:  # Minimization
+        return responses.min()
+    return responses.max()  # Maximization
+
+
+@dataclass
+class ReferenceTable:
+    """
+    Reference values of the metrics of every instance (best_value, RTT_factor, ...).
+
+    The table is built once (from the data with a single groupby, or from a
+    ground-truth file) and looked up by instance instead of scanning each group in
+    update_rule. Every column is written to shared_args, except those of metric_cols,
+    which are written to the arguments of their metric. The rows can also be keyed by
+    every group column (e.g., parameter_names + instance_cols) for values that depend on
+    the parameter set. A table holds per-group values: RTT_factor, if present, scales
+    the RTT of a single group.
+
+    Attributes
+    ----------
+    instance_cols : list[str]
+        Columns that identify a row of the table: an instance, or a group.
+    values : pd.DataFrame
+        Reference values, indexed by instance_cols (or with instance_cols as columns).
+    metric_cols : dict
+        Metric whose metric_args receive each column, e.g. {'RTT_factor': 'RTT'}.
+
+    Methods
+    -------
+    from_data(df, instance_cols, shared_args, agg=None, group_on=None)
+        Table of best_value (and RTT_factor) for every instance (or group)
+    from_file(filename, instance_cols, columns=None)
+        Table read from a ground-truth file
+    row(instance_key)
+        Reference values of an instance
+    apply(bs_params, row)
+        Write reference values to bootstrap parameters
+    """
+
+    instance_cols: List[str]
+    values: pd.DataFrame
+    metric_cols: dict = field(default_factory=lambda: {"RTT_factor": "RTT"})
+
+    def __post_init__(self):
+        self.instance_cols = list(self.instance_cols)
+        if list(self.values.index.names) != self.instance_cols:
+            self.values = self.values.set_index(self.instance_cols)
+        keys = [k if isinstance(k, tuple) else (k,) for k in self.values.index]
+        self._rows = dict(zip(keys, self.values.to_dict("records")))
+
+    @classmethod
+    def from_data(cls, df, instance_cols, shared_args, agg=None, group_on=None):
+        """
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Raw results
+        instance_cols : list[str]
+            Columns that identify a row of the table: the group columns of the
+            bootstrap (parameters and instance), or a subset of them such as the
+            instance columns. best_value is the best response over every group of a row.
+        shared_args : dict
+            Shared arguments with 'response_col', 'resource_col' and 'response_dir'.
+            With several response columns (a list), best_value is a dict keyed by
+            response column, like in BootstrapParameters.default_update.
+        agg : str, optional
+            Column of the number of reads of each row (see BootstrapParameters.agg),
+            which weights the total resource. The default is None (one read per row).
+        group_on : list[str], optional
+            Group columns of the bootstrap, which must include instance_cols. RTT_factor
+            is then 1e-6 * the total resource of a group (that of default_update),
+            averaged over the groups of each row so that it does not grow with the
+            number of parameter sets. The default is None, which leaves RTT_factor out
+            of the table (update_rule sets it for each group).
+
+        Returns
+        -------
+        ReferenceTable
+            best_value (best response) of every row, and RTT_factor if group_on is given
+        """
+        instance_cols = list(instance_cols)
+        grouped = df.groupby(instance_cols)
+        response_col = shared_args["response_col"]
+        if isinstance(response_col, (list, tuple)):
+            best = {}
+            for col in response_col:
+                args = success_metrics.response_args(shared_args, col)
+                best[col] = _best_responses(grouped[col], args["response_dir"])
+            best = pd.DataFrame(best)
+            best_value = pd.Series(best.to_dict("records"), index=best.index)
+        else:
+            best_value = _best_responses(
+                grouped[response_col], shared_args["response_dir"]
+            )
+        values = pd.DataFrame({"best_value": best_value})
+
+        if group_on is not None:
+            group_on = list(group_on)
+            missing = [col for col in instance_cols if col not in group_on]
+            if len(missing) > 0:
+                raise ValueError(
+                    "Reference table columns {} are not group columns {}".format(
+                        missing, group_on
+                    )
+                )
+            resources = df[shared_args["resource_col"]]
+            if agg is not None:
+                resources = resources * df[agg]
+            group_resources = resources.groupby([df[col] for col in group_on]).sum()
+            values["RTT_factor"] = 1e-6 * group_resources.groupby(
+                level=instance_cols
+            ).mean()
+        return cls(instance_cols, values)
+
+    @classmethod
+    def from_file(cls, filename, instance_cols, columns=None):
+        """
+        Parameters
+        ----------
+        filename : str
+            Pickled DataFrame or csv file with instance_cols and the reference values
+        instance_cols : list[str]
+            Columns that identify an instance
+        columns : dict, optional
+            Reference value of each column of the file to keep, e.g.
+            {'GTMinEnergy': 'best_value'}. The default is every column.
+
+        Returns
+        -------
+        ReferenceTable
+        """
+        if filename.endswith(".csv"):
+            values = pd.read_csv(filename)
+        else:
+            values = pd.read_pickle(filename)
+        if columns is not None:
+            values = values[list(instance_cols) + list(columns)].rename(columns=columns)
+        return cls(instance_cols, values.drop_duplicates(instance_cols))
+
+    def row(self, instance_key):
+        """
+        Parameters
+        ----------
+        instance_key : tuple
+            Values of instance_cols
+
+        Returns
+        -------
+        dict
+            Reference values of the instance
+        """
+        instance_key = tuple(instance_key)
+        if instance_key not in self._rows:
+            raise KeyError(
+                "No reference values for instance {}={}".format(
+                    self.instance_cols, instance_key
+                )
+            )
+        return self._rows[instance_key]
+
+    def apply(self, bs_params, row):
+        """
+        Write the reference values of row to the arguments of bs_params
+        """
+        for col, val in row.items():
+            metric = self.metric_cols.get(col)
+            if metric is None:
+                bs_params.shared_args[col] = val
+            else:
+                if bs_params.metric_args[metric] is None:
+                    bs_params.metric_args[metric] = {}
+                bs_params.metric_args[metric][col] = val
+
+
+def _level_metrics(metric_refs, method):
+    """
+    Names of the metrics evaluated from the resample arrays of every level (without
+    evaluate_stats), which cannot be drawn in blocks of iterations
+    """
+    return [
+        metric_ref.__name__
+        for metric_ref in metric_refs
+        if not (method == "exact" and getattr(metric_ref, "exact", False))
+        and (
+            not isinstance(metric_ref, type)
+            or not issubclass(metric_ref, success_metrics.SuccessMetrics)
+            or metric_ref.evaluate_stats is success_metrics.SuccessMetrics.evaluate_stats
+        )
+    ]
+
+
 @dataclass
 class BootstrapParameters:
     """
@@ -33,6 +234,9 @@ class BootstrapParameters:
     shared_args : dict
         Shared arguments for the bootstrap method.
         We usually have 'resource_col, response_col, response_dir, best_value, random_value, confidence_level'
+        response_col can be a list of columns, which are all resampled with the same
+        indices and evaluated separately (see success_metrics.ResponseMetrics). Their
+        arguments can then be dicts keyed by response column.
     update_rule : Callable[[pd.DataFrame], None]
         Function to update the dataframe with the bootstrap results.
     agg : str
@@ -47,13 +251,72 @@ class BootstrapParameters:
         Number of bootstrap iterations to perform.
     keep_cols : list
         List of columns to keep in the dataframe.
+    method : str
+        'resample' (Monte Carlo resamples), 'exact' or 'multinomial'. With 'exact',
+        metrics that support it are evaluated from the closed-form distribution of their
+        resamples (best-of-n for Response/PerfRatio, binomial for SuccessProb/RTT) and
+        the others fall back to resampling. With 'multinomial', resamples are drawn as
+        multinomial counts over the distinct (response, resource) outcomes of each group,
+        which is much cheaper for histogram-like data (see df_utils.compress_counts).
+    sampler : str
+        Weighted sampler used when agg is set: 'choice' (np.random.choice) or 'alias'
+        (Walker alias table, built once per group and cached across downsample levels,
+        with O(1) draws).
+    adaptive : bool
+        Draw the bootstrap iterations in blocks of adaptive_block and stop a group once
+        the confidence interval bounds of its metrics change by less than adaptive_tol
+        (relative, or absolute below 1) between blocks. bootstrap_iterations is then the
+        maximum, and the iterations used are recorded in an 'iterations' column.
+    adaptive_block : int
+        Number of bootstrap iterations per block in adaptive mode.
+    adaptive_tol : float
+        Tolerance on the change of the confidence interval bounds in adaptive mode.
+    seed : int
+        Root seed of the resamples. Each group draws from its own stream, keyed by the
+        group and its downsample levels (see seeding.stream), so results do not depend
+        on the pool size or scheduling. None uses the global NumPy random state.
+    crn_cols : list
+        Columns identifying the instance of a group (e.g., ['instance']) for common
+        random numbers: groups with the same values of crn_cols and the same number of
+        rows (e.g., parameter settings run on an instance) draw the same resample
+        indices, so paired comparisons between them have a much lower variance. The
+        levels of a group then share the first rows of one resample. Needs a seed.
+        None draws independent resamples for every group.
+    reference : ReferenceTable
+        Reference values of every instance, written to the arguments of each group
+        after update_rule (so they take precedence over it). None only uses update_rule.
+    memory_budget : int
+        Approximate memory in bytes of the resample of a group, or of its counts with
+        the multinomial method. The bootstrap iterations are then drawn in blocks that
+        fit it, and each block is reduced to the (levels, iterations) intermediate
+        values of the metrics (best responses, success counts, resource sums) before
+        the next one is drawn, so the peak memory does not grow with downsample *
+        bootstrap_iterations (or levels * distinct outcomes). Blocks hold at least one
+        iteration, and seeded resamples depend on the block size. Metrics without
+        evaluate_stats read the resample of every level, so a budget with any of them
+        is disabled with a warning. None draws every iteration at once.
+    dtype : str
+        Floating point type of the resampled responses and resources: 'float64' or
+        'float32'. float32 halves the memory traffic of the resample gather and of the
+        reductions over its rows (best responses, success masks). Resource sums and the
+        per-level statistics are still accumulated in float64, and success thresholds
+        are compared at the precision of the responses.
+    mean_scheme : str
+        How mean-type metrics (e.g., Resource) are resampled: 'resample' (mean of the
+        resampled values) or 'bayesian' (Dirichlet-weighted means of the group's distinct
+        values, see success_metrics.dirichlet_means). With 'bayesian', the resources are
+        not resampled unless a metric reads them directly, but levels * iterations *
+        distinct values gammas are drawn, so it pays off for groups with few distinct
+        resources (e.g., compressed with df_utils.compress_counts). The gammas drawn at
+        once are capped by memory_budget.
 
     Methods
     -------
     __post_init__()
         Post-initialization function.
     default_update(df)
-        Default update rule for the bootstrap method.
+        Default update rule for the bootstrap method: best response and total resource
+        (counting the agg reads of every row) of df.
     """
 
     shared_args: dict  #'resource_col, response_col, response_dir, best_value, random_value, confidence_level'
@@ -66,23 +329,253 @@ class BootstrapParameters:
     bootstrap_iterations: int = 1000
     downsample: int = 10
     keep_cols: List = field(default_factory=lambda: [])
+    method: str = "resample"
+    sampler: str = "choice"
+    adaptive: bool = False
+    adaptive_block: int = 100
+    adaptive_tol: float = 1e-2
+    seed: int = None
+    crn_cols: List = None
+    reference: ReferenceTable = None
+    memory_budget: int = None
+    dtype: str = "float64"
+    mean_scheme: str = "resample"
 
     def __post_init__(self):
         temp_metric_args = defaultdict(lambda: None)
         temp_metric_args.update(self.metric_args)
         self.metric_args = temp_metric_args
 
+        if self.method not in ["resample", "exact", "multinomial"]:
+            warn_str = "Unsupported bootstrap method: {}. Setting method to resample.".format(
+                self.method
+            )
+            warnings.warn(warn_str)
+            self.method = "resample"
+
+        if self.sampler not in ["choice", "alias"]:
+            warn_str = "Unsupported sampler: {}. Setting sampler to choice.".format(
+                self.sampler
+            )
+            warnings.warn(warn_str)
+            self.sampler = "choice"
+
+        if self.dtype not in ["float64", "float32"]:
+            warn_str = "Unsupported dtype: {}. Setting dtype to float64.".format(
+                self.dtype
+            )
+            warnings.warn(warn_str)
+            self.dtype = "float64"
+
+        if self.mean_scheme not in ["resample", "bayesian"]:
+            warn_str = "Unsupported mean scheme: {}. Setting mean_scheme to resample.".format(
+                self.mean_scheme
+            )
+            warnings.warn(warn_str)
+            self.mean_scheme = "resample"
+
+        if self.memory_budget is not None and self.memory_budget <= 0:
+            warn_str = "Memory budget must be positive. Setting it to None."
+            warnings.warn(warn_str)
+            self.memory_budget = None
+
+        level_metrics = []
+        if self.memory_budget is not None:
+            level_metrics = _level_metrics(self.success_metrics, self.method)
+        if len(level_metrics) > 0:
+            warn_str = (
+                "Memory budget cannot be honored by metrics that read the resample of "
+                "every level: {}. Setting it to None.".format(", ".join(level_metrics))
+            )
+            warnings.warn(warn_str)
+            self.memory_budget = None
+
+        if self.crn_cols is not None and self.seed is None:
+            warn_str = "Common random numbers need a seed. Setting crn_cols to None."
+            warnings.warn(warn_str)
+            self.crn_cols = None
+
+        if self.adaptive_block < 1:
+            warn_str = "Adaptive block size must be positive. Setting it to 100."
+            warnings.warn(warn_str)
+            self.adaptive_block = 100
+
         if not hasattr(self, "update_rule"):
             self.update_rule = self.default_update
 
     def default_update(self, df):
-        if self.shared_args["response_dir"] == -1:  # Minimization
+        """
+        Set best_value to the best response of df and RTT_factor to 1e-6 * its total
+        resource.
+
+        With agg set, every row holds df[agg] reads, so the total resource weighs each
+        row's resource by its count. Runs with agg therefore get a larger RTT_factor
+        (and RTT) than before agg was counted, unless every count is 1; runs without agg
+        are unchanged.
+        """
+        if isinstance(self.shared_args["response_col"], (list, tuple)):
+            best_value = {}
+            for col in self.shared_args["response_col"]:
+                args = success_metrics.response_args(self.shared_args, col)
+                if args["response_dir"] == -1:  # Minimization
+                    best_value[col] = df[col].min()
+                else:  # Maximization
+                    best_value[col] = df[col].max()
+            self.shared_args["best_value"] = best_value
+        elif self.shared_args["response_dir"] == -1:  # Minimization
             self.shared_args["best_value"] = df[self.shared_args["response_col"]].min()
         else:  # Maximization
             self.shared_args["best_value"] = df[self.shared_args["response_col"]].max()
-        self.metric_args["RTT"]["RTT_factor"] = (
-            1e-6 * df[self.shared_args["resource_col"]].sum()
+        resources = df[self.shared_args["resource_col"]]
+        if self.agg is not None:  # Rows hold agg reads each
+            resources = resources * df[self.agg]
+        self.metric_args["RTT"]["RTT_factor"] = 1e-6 * resources.sum()
+
+
+@dataclass
+class GridLevels:
+    """
+    Downsample levels of each group needed to reach a target resource grid.
+
+    With resource = resource_per_boot(df) * boots (e.g., sweep * boots), every grid
+    value is hit by a single downsample level or bracketed by the closest levels below
+    and above it, so only those levels have to be bootstrapped. Interpolating the
+    results on the same grid (InterpolationParameters with resource_value_type='manual')
+    then only reads the bracketing levels.
+
+    Attributes
+    ----------
+    resource_values : list
+        Target resource grid.
+    resource_per_boot : Callable[[pd.DataFrame], float]
+        Resource of a single downsample unit of a group, e.g.
+        lambda df: df['sweep'].iloc[0]
+
+    Methods
+    -------
+    __call__(df, boots)
+        Levels of boots needed for the group df
+    """
+
+    resource_values: list
+    resource_per_boot: Callable[[pd.DataFrame], float]
+
+    def __call__(self, df, boots):
+        boots = np.unique(np.asarray(boots, dtype=int))
+        boots = boots[boots > 0]
+        targets = np.asarray(self.resource_values, dtype=float) / self.resource_per_boot(
+            df
         )
+        below = np.searchsorted(boots, targets, side="right") - 1  # Largest <= target
+        above = np.searchsorted(boots, targets, side="left")  # Smallest >= target
+        idx = np.concatenate([below[below >= 0], above[above < len(boots)]])
+        return boots[np.unique(idx)]
+
+
+@dataclass
+class RaceParameters:
+    """
+    Racing pre-screen of the parameter sets before the full bootstrap (see race).
+
+    Every group is first bootstrapped with a few iterations and a wide confidence
+    interval. A parameter set is dropped when, on every instance and at every resource
+    of its levels, the optimistic bound of its metric is worse than the pessimistic
+    bound reached by another parameter set with at most that resource. Parameter sets
+    without such a competitor somewhere (e.g., at the smallest resources) are kept.
+
+    Attributes
+    ----------
+    parameter_names : list[str]
+        Columns that define a parameter set.
+    instance_cols : list[str]
+        Columns that define an instance.
+    metric : str
+        Metric to compare, e.g. 'PerfRatio' (its Key= and ConfInt= columns are read).
+    response_dir : int
+        Direction of the metric (-1 for minimization, 1 for maximization).
+    resource_fcn : Callable[[pd.DataFrame], pd.Series]
+        Resource of the bootstrapped rows, e.g. sweep * boots. None compares the
+        parameter sets at equal downsample levels.
+    bootstrap_iterations : int
+        Number of bootstrap iterations of the pre-screen.
+    confidence_level : float
+        Confidence level of the pre-screen intervals.
+
+    Methods
+    -------
+    __call__(bs_df)
+        Parameter sets dominated in the bootstrap results bs_df
+    """
+
+    parameter_names: List[str]
+    instance_cols: List[str]
+    metric: str = "PerfRatio"
+    response_dir: int = 1
+    resource_fcn: Callable[[pd.DataFrame], pd.Series] = None
+    bootstrap_iterations: int = 50
+    confidence_level: float = 99
+
+    def __call__(self, bs_df):
+        """
+        Parameters
+        ----------
+        bs_df : pd.DataFrame
+            Bootstrap results of every (parameter set, instance) group
+
+        Returns
+        -------
+        pd.DataFrame
+            Dominated parameter sets, one row each with the parameter_names columns
+        """
+        bs_df = bs_df.reset_index(drop=True)
+        if self.resource_fcn is None:
+            resource = bs_df["boots"].values.astype(float)
+        else:
+            resource = np.asarray(self.resource_fcn(bs_df), dtype=float)
+        lower = bs_df[
+            names.param2filename({"Key": self.metric, "ConfInt": "lower"}, "")
+        ].values
+        upper = bs_df[
+            names.param2filename({"Key": self.metric, "ConfInt": "upper"}, "")
+        ].values
+        # Pessimistic and optimistic bounds, as values to maximize
+        if self.response_dir == -1:
+            pessimistic, optimistic = -upper, -lower
+        else:
+            pessimistic, optimistic = lower, upper
+
+        sets = bs_df.groupby(self.parameter_names, sort=True).ngroup().values
+        params = bs_df[self.parameter_names].groupby(sets).first()
+        dominated = np.ones(len(params), dtype=bool)
+        for idx in bs_df.groupby(self.instance_cols).indices.values():
+            idx = idx[np.argsort(resource[idx], kind="stable")]
+            # Last row with at most the resource of each row
+            last = np.searchsorted(resource[idx], resource[idx], side="right") - 1
+            for k in np.unique(sets[idx]):
+                if not dominated[k]:
+                    continue
+                mine = sets[idx] == k
+                others = np.where(mine, -np.inf, pessimistic[idx])
+                envelope = np.fmax.accumulate(others)
+                if not np.all(optimistic[idx][mine] < envelope[last[mine]]):
+                    dominated[k] = False
+        return params[dominated].reset_index(drop=True)
+
+
+def _level_params(bs_params):
+    """
+    Copy bs_params for one bootstrap level.
+
+    The level gets deep copies of shared_args and metric_args, which initBootstrap
+    and update_rule write into, while the reference table, metrics and update rule
+    stay shared with bs_params.
+    """
+    result = copy.copy(bs_params)
+    result.shared_args = copy.deepcopy(bs_params.shared_args)
+    result.metric_args = defaultdict(lambda: None)
+    for name, args in bs_params.metric_args.items():
+        result.metric_args[name] = copy.deepcopy(args)
+    return result
 
 
 class BSParams_iter:
@@ -110,9 +603,8 @@ class BSParams_iter:
 
     def __next__(self):
         if self.bs_params.downsample <= self.nboots - 1:
-            # Make a deep copy with current downsample value
-            result = copy.deepcopy(self.bs_params)
-            result.downsample = self.bs_params.downsample
+            # Copy with the current downsample value and its own argument dicts
+            result = _level_params(self.bs_params)
             # Then increment for next iteration
             self.bs_params.downsample += 1
             return result
@@ -153,7 +645,7 @@ class BSParams_range_iter:
     def __next__(self):
         self.bs_params.downsample = next(self.boots_iter)
         if self.bs_params is not None:
-            return copy.deepcopy(self.bs_params)
+            return _level_params(self.bs_params)
         else:
             raise StopIteration
 
@@ -164,6 +656,640 @@ class BSParams_range_iter:
         return self
 
 
+def _table_key(key):
+    """
+    Key of a group in a BootstrapPlan table. Single-column keys are reported either as
+    scalars (groupby apply) or as 1-tuples (groupby iteration).
+    """
+    if isinstance(key, tuple) and len(key) == 1:
+        key = key[0]
+    return key.item() if isinstance(key, np.generic) else key
+
+
+class BootstrapPlan:
+    """
+    Bootstrap parameters compiled once for a set of groups.
+
+    The metric objects are built once, on the plan's own copy of shared_args and
+    metric_args. The reference values that update_rule sets for each group (e.g.,
+    best_value and RTT_factor) are computed once per group and kept in a table, and
+    binding a group only writes its row of the table into the arguments read by the
+    metrics. Downsample levels are not part of the plan, so a single plan serves every
+    level of a run and the work left per group and level is the resample and the metric
+    arrays. The rows of bs_params.reference are joined on the instance of each group,
+    read from its key when group_on holds the instance columns.
+
+    Attributes
+    ----------
+    bs_params : BootstrapParameters
+        Parameters the plan was compiled from
+    group_on : list[str]
+        Columns of the group keys, or None if unknown
+    fused : success_metrics.FusedMetrics or success_metrics.ResponseMetrics
+        Metric objects, reading the reference values of the bound group
+    reference : dict
+        (shared_args, metric_args) written by update_rule, by group key
+
+    Methods
+    -------
+    __init__(bs_params, reference=None, group_on=None)
+        Constructor for BootstrapPlan class
+    compile(bs_params, groups, group_on=None)
+        Plan with the reference values of every (key, df) group
+    reference_values(df, key=None)
+        Reference values of a group, from the table or from update_rule
+    bind(df, key=None)
+        Point the metric objects to the reference values of a group
+    """
+
+    def __init__(self, bs_params, reference=None, group_on=None):
+        self.bs_params = bs_params
+        self.reference = {} if reference is None else reference
+        self.group_on = None if group_on is None else list(group_on)
+        self._metric_names = [ref.__name__ for ref in bs_params.success_metrics]
+        self._shared_args = dict(bs_params.shared_args)
+        self._metric_args = defaultdict(lambda: None)
+        for name, args in bs_params.metric_args.items():
+            self._metric_args[name] = copy.copy(args)
+        self._build()
+
+    def _build(self):
+        metrics = success_metrics.FusedMetrics
+        if isinstance(self._shared_args["response_col"], (list, tuple)):
+            metrics = success_metrics.ResponseMetrics
+        self.fused = metrics(
+            self._shared_args,
+            self._metric_args,
+            self.bs_params.success_metrics,
+            exact=self.bs_params.method == "exact",
+        )
+
+    @classmethod
+    def compile(cls, bs_params, groups, group_on=None):
+        """
+        Parameters
+        ----------
+        bs_params : BootstrapParameters
+            Parameters of the run (any downsample level)
+        groups : iterable
+            (key, df) of every group
+        group_on : list[str], optional
+            Columns of the group keys
+
+        Returns
+        -------
+        BootstrapPlan
+        """
+        plan = cls(bs_params, group_on=group_on)
+        reference = {
+            _table_key(key): plan._update(_with_group_key(df_single, key), key)
+            for key, df_single in groups
+        }
+        return cls(bs_params, reference, group_on)
+
+    def _instance_key(self, df, key):
+        """
+        Values of the instance columns of the reference table for a group
+        """
+        instance_cols = self.bs_params.reference.instance_cols
+        if (
+            key is not None
+            and self.group_on is not None
+            and all(col in self.group_on for col in instance_cols)
+        ):
+            key = key if isinstance(key, tuple) else (key,)
+            return tuple(key[self.group_on.index(col)] for col in instance_cols)
+        return tuple(df[instance_cols].iloc[0])
+
+    def _update(self, df, key=None):
+        """
+        Apply update_rule and the reference table for df to a copy of the compiled
+        arguments
+        """
+        scratch = copy.copy(self.bs_params)
+        scratch.shared_args = dict(self._shared_args)
+        scratch.metric_args = defaultdict(lambda: None)
+        for name, args in self._metric_args.items():
+            scratch.metric_args[name] = copy.copy(args)
+        scratch.update_rule(scratch, df)
+        reference = self.bs_params.reference
+        if reference is not None:
+            reference.apply(scratch, reference.row(self._instance_key(df, key)))
+        return scratch.shared_args, {
+            name: scratch.metric_args[name] for name in self._metric_names
+        }
+
+    def reference_values(self, df, key=None):
+        """
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Data of the group
+        key : optional
+            Key of the group. The default is the key recorded in df (see
+            _with_group_key).
+
+        Returns
+        -------
+        shared_args : dict
+        metric_args : dict
+            Arguments of each metric, by metric name
+        """
+        key = _group_key(df) if key is None else key
+        if key is not None and _table_key(key) in self.reference:
+            return self.reference[_table_key(key)]
+        return self._update(df, key)
+
+    def bind(self, df, key=None):
+        """
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Data of the group
+        key : optional
+            Key of the group. The default is the key recorded in df.
+
+        Returns
+        -------
+        success_metrics.FusedMetrics
+            Metric objects of the plan, reading the reference values of the group
+        """
+        shared_args, metric_args = self.reference_values(df, key)
+        self._shared_args.clear()
+        self._shared_args.update(shared_args)
+        rebuild = False
+        for name, args in metric_args.items():
+            held = self._metric_args[name]
+            if isinstance(held, dict) and isinstance(args, dict):
+                held.clear()
+                held.update(args)
+            elif held is not args:
+                self._metric_args[name] = copy.copy(args)
+                rebuild = True
+        if rebuild:
+            self._build()
+        return self.fused
+
+
+_attached_blocks = {}  # Shared memory blocks attached by this process, by name
+
+
+def _attach_block(name):
+    if name not in _attached_blocks:
+        _attached_blocks[name] = SharedMemory(name=name)
+    return _attached_blocks[name]
+
+
+class SharedGroups:
+    """
+    Numeric columns of a grouped DataFrame placed in shared memory blocks.
+
+    Rows are sorted by group code, so every group is a contiguous slice of each column.
+    Pickling only ships the block names, group keys and offsets: worker processes attach
+    to the blocks once and read their groups as zero-copy NumPy views instead of
+    receiving a copy of the DataFrame.
+    Columns that are not shared (e.g., keep_cols) are stored as one value per group.
+
+    Attributes
+    ----------
+    group_on : list[str]
+        Column names the data is grouped on
+    keys : list[tuple]
+        Key of each group, in group code order
+    offsets : np.array
+        Group g holds rows offsets[g]:offsets[g + 1] of every shared column
+    specs : dict
+        (block name, dtype, length) of each shared column
+    group_values : dict
+        Value of each non-shared column for every group
+
+    Methods
+    -------
+    __init__(df, group_on, columns, keep_cols=())
+        Copy the columns of df to shared memory
+    ngroups()
+        Number of groups
+    group(g)
+        DataFrame of group g, backed by views of the shared blocks
+    close()
+        Release and unlink the shared memory blocks
+    """
+
+    def __init__(self, df, group_on, columns, keep_cols=()):
+        self.group_on = list(group_on)
+        codes = df.groupby(self.group_on, sort=True).ngroup().values
+        order = np.argsort(codes, kind="stable")
+        order = order[codes[order] >= 0]  # Rows with missing keys are not grouped
+        counts = np.bincount(codes[order])
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        first_rows = order[self.offsets[:-1]]
+        self.keys = list(
+            df[self.group_on].iloc[first_rows].itertuples(index=False, name=None)
+        )
+
+        columns = list(dict.fromkeys(columns))
+        self.group_values = {
+            col: df[col].values[first_rows] for col in keep_cols if col not in columns
+        }
+        self.specs = {}
+        self._blocks = []
+        self._views = {}
+        for col in columns:
+            values = np.ascontiguousarray(df[col].values[order])
+            block = SharedMemory(create=True, size=max(values.nbytes, 1))
+            self._blocks.append(block)
+            view = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)
+            view[:] = values
+            self._views[col] = view
+            self.specs[col] = (block.name, values.dtype.str, len(values))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_blocks"] = []
+        state["_views"] = {}
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _arrays(self):
+        if len(self._views) < len(self.specs):
+            for col, (name, dtype, length) in self.specs.items():
+                self._views[col] = np.ndarray(
+                    length, dtype=np.dtype(dtype), buffer=_attach_block(name).buf
+                )
+        return self._views
+
+    def ngroups(self):
+        return len(self.keys)
+
+    def group(self, g):
+        start, stop = self.offsets[g], self.offsets[g + 1]
+        df = pd.DataFrame(
+            {col: view[start:stop] for col, view in self._arrays().items()},
+            copy=False,
+        )
+        for col, values in self.group_values.items():
+            df[col] = values[g]
+        for col, val in zip(self.group_on, self.keys[g]):
+            df[col] = val
+        return _with_group_key(df, self.keys[g])
+
+    def close(self):
+        self._views = {}
+        for block in self._blocks:
+            attached = _attached_blocks.pop(block.name, None)
+            for shm in [attached, block]:
+                if shm is None:
+                    continue
+                try:
+                    shm.close()
+                except BufferError:
+                    # Views are still referenced, the memory is freed once they are gone
+                    pass
+            block.unlink()
+        self._blocks = []
+
+
+def _response_cols(bs_params):
+    """
+    Response columns of the bootstrap, as a list
+    """
+    response_col = bs_params.shared_args["response_col"]
+    if isinstance(response_col, (list, tuple)):
+        return list(response_col)
+    return [response_col]
+
+
+def _shared_columns(bs_params):
+    """
+    Columns of the raw data read by the bootstrap of a single group
+    """
+    columns = _response_cols(bs_params) + [bs_params.shared_args["resource_col"]]
+    if bs_params.agg is not None:
+        columns.append(bs_params.agg)
+    return columns
+
+
+def _imap_concat(f, items):
+    """
+    Map f over items in a worker pool and concatenate the resulting DataFrames in item
+    order. Results are consumed as they arrive and spooled to disk (see
+    df_utils.FrameSpool), so only a few of them are held in memory at once.
+    """
+
+    def indexed(task):
+        i, item = task
+        return i, f(item)
+
+    with df_utils.FrameSpool() as spool:
+        with Pool() as p:
+            for i, bs_df in p.imap_unordered(indexed, enumerate(items)):
+                spool.append(bs_df, i)
+        return spool.to_frame()
+
+
+def _compile_shared_plan(df, group_on, bs_params):
+    """
+    Plan with the reference values of every group of df, for a bootstrap of its
+    SharedGroups. update_rule runs on the original groups, as the shared groups only
+    hold the columns read by the resampling.
+    """
+    return BootstrapPlan.compile(bs_params, df.groupby(group_on), group_on)
+
+
+def _bootstrap_shared(shared, bs_params_list, plan, group_major=False, grid_levels=None):
+    """
+    Bootstrap every group of a SharedGroups in a worker pool.
+
+    Only the shared memory handles are pickled to the workers, with the plan compiled
+    from the original groups (see _compile_shared_plan). The output has the same layout
+    as the per-level (or group-major) bootstrap of the original DataFrame.
+    """
+    bs_params_list = list(bs_params_list)
+    if len(bs_params_list) == 0:
+        return pd.DataFrame()
+    group_on = shared.group_on
+
+    def add_keys(bs_df, key):
+        for col, val in zip(group_on, key):
+            bs_df[col] = val
+        return bs_df[group_on + [col for col in bs_df.columns if col not in group_on]]
+
+    if group_major:
+        bs_params = bs_params_list[0]
+        boots = [p.downsample for p in bs_params_list]
+
+        def f(g):
+            df_single = shared.group(g)
+            bs_df = BootstrapSingleLevels(
+                df_single, bs_params, _group_boots(df_single, boots, grid_levels), plan
+            )
+            return add_keys(bs_df, shared.keys[g])
+
+        return _imap_concat(f, range(shared.ngroups()))
+    else:
+
+        def f(bs_params):
+            temp_df = pd.concat(
+                [
+                    add_keys(
+                        BootstrapSingle(shared.group(g), bs_params, plan),
+                        shared.keys[g],
+                    )
+                    for g in range(shared.ngroups())
+                ],
+                ignore_index=True,
+            )
+            temp_df["boots"] = bs_params.downsample
+            return temp_df
+
+        return _imap_concat(f, bs_params_list)
+
+
+class AliasTable:
+    """
+    Walker alias table for O(1) weighted sampling of indices.
+
+    Built in O(n) with Vose's method. Each draw picks a column uniformly and keeps it
+    with probability prob[column], otherwise returns its alias.
+
+    Attributes
+    ----------
+    prob : np.array
+        Probability of keeping each column
+    alias : np.array
+        Index returned when a column is not kept
+
+    Methods
+    -------
+    __init__(weights)
+        Build the table for (unnormalized) weights
+    draw(size, rng=np.random)
+        Draw indices with probability proportional to the weights
+    """
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=float)
+        n = len(weights)
+        scaled = weights * n / weights.sum()
+        self.prob = np.ones(n)
+        self.alias = np.arange(n)
+        small = list(np.flatnonzero(scaled < 1.0))
+        large = list(np.flatnonzero(scaled >= 1.0))
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # Leftovers are 1 up to rounding errors
+
+    def draw(self, size, rng=np.random):
+        columns = rng.randint(0, len(self.prob), size=size, dtype=np.intp)
+        keep = rng.random_sample(size) < self.prob[columns]
+        return np.where(keep, columns, self.alias[columns])
+
+
+_alias_tables = OrderedDict()  # Alias tables of recent groups, by weights
+_alias_cache_size = 128
+
+
+def _alias_table(weights):
+    """
+    Alias table of weights, cached so every downsample level of a group reuses it
+    """
+    weights = np.ascontiguousarray(weights, dtype=float)
+    key = weights.tobytes()
+    if key in _alias_tables:
+        _alias_tables.move_to_end(key)
+    else:
+        _alias_tables[key] = AliasTable(weights)
+        if len(_alias_tables) > _alias_cache_size:
+            _alias_tables.popitem(last=False)
+    return _alias_tables[key]
+
+
+def _resample_indices(df, bs_params, downsample, iterations=None, rng=np.random):
+    """
+    Draw a (downsample, iterations) matrix of row indices into df from rng.
+    iterations defaults to bs_params.bootstrap_iterations.
+    """
+    if iterations is None:
+        iterations = bs_params.bootstrap_iterations
+    size = (downsample, iterations)
+    if bs_params.agg is not None and bs_params.sampler == "alias":
+        resamples = _alias_table(df[bs_params.agg].values).draw(size, rng)
+    elif bs_params.agg is not None:
+        weights = df[bs_params.agg].values
+        p = weights / weights.sum()
+        resamples = rng.choice(len(df), size, p=p)
+    else:
+        resamples = rng.randint(0, len(df), size=size, dtype=np.intp)
+    return resamples
+
+
+def _distinct_outcomes(responses, resources, weights):
+    """
+    Distinct (response, resource) pairs of a group and their summed weights. With a
+    (rows, responses) array of several responses, the outcomes are the distinct rows.
+    """
+    responses = np.asarray(responses)
+    response_cols = ["response"]
+    if responses.ndim > 1:
+        response_cols = ["response_{}".format(j) for j in range(responses.shape[1])]
+    outcomes = pd.DataFrame(
+        responses.reshape(len(responses), -1), columns=response_cols
+    )
+    outcomes["resource"] = resources
+    outcomes["weight"] = weights
+    outcomes = outcomes.groupby(response_cols + ["resource"], sort=True)["weight"].sum()
+    values = np.column_stack(
+        [outcomes.index.get_level_values(col).values for col in response_cols]
+    )
+    return (
+        values[:, 0] if responses.ndim == 1 else values,
+        outcomes.index.get_level_values("resource").values,
+        outcomes.values,
+    )
+
+
+def _multinomial_counts(weights, boots, bootstrap_iterations, rng=np.random):
+    """
+    Draw (len(boots), bootstrap_iterations, len(weights)) resample counts from rng.
+
+    Levels are nested like the rows of a shared resample: the counts of a level are the
+    counts of the previous (smaller) level plus the draws in between.
+    """
+    p = np.asarray(weights, dtype=float)
+    p = p / p.sum()
+    order = np.argsort(boots, kind="stable")
+    steps = np.diff(boots[order], prepend=0)
+    counts = np.empty((len(boots), bootstrap_iterations, len(p)), dtype=np.int64)
+    current = np.zeros((bootstrap_iterations, len(p)), dtype=np.int64)
+    for j, step in zip(order, steps):
+        if step > 0:
+            current = current + rng.multinomial(
+                step, p, size=bootstrap_iterations
+            )
+        counts[j] = current
+    return counts
+
+
+def _evaluate_adaptive(fused, draw_block, boots, bs_params, group=None):
+    """
+    Evaluate blocks of resamples until the confidence intervals converge.
+
+    draw_block(iterations) returns the ResampleStats of a new block. Evaluation stops
+    once no confidence interval bound changes by more than bs_params.adaptive_tol
+    between blocks, or after bs_params.bootstrap_iterations iterations.
+    """
+    blocks = []
+    iterations = 0
+    prev_ci = None
+    compact = not fused.needs_resources()
+    while iterations < bs_params.bootstrap_iterations:
+        block = min(
+            bs_params.adaptive_block, bs_params.bootstrap_iterations - iterations
+        )
+        blocks.append(draw_block(block))
+        iterations += block
+        bs_df = fused.evaluate(
+            boots, None, None, group=group, stats=success_metrics.StackedStats(blocks)
+        )
+        if compact:  # Later evaluations only read the cached values
+            blocks[-1].compact()
+        ci = bs_df[[col for col in bs_df.columns if "ConfInt=" in col]].values
+        if prev_ci is not None and np.all(
+            np.isclose(
+                ci,
+                prev_ci,
+                rtol=bs_params.adaptive_tol,
+                atol=bs_params.adaptive_tol,
+                equal_nan=True,
+            )
+        ):
+            break
+        prev_ci = ci
+    bs_df["iterations"] = iterations
+    return bs_df
+
+
+def _resample_bytes(bs_params, downsample):
+    """
+    Bytes of a bootstrap iteration of a resample: the indices, every response and the
+    resources, and a reduction temporary per draw
+    """
+    draw_bytes = np.dtype(np.intp).itemsize + np.dtype(bs_params.dtype).itemsize * (
+        2 + len(_response_cols(bs_params))
+    )
+    return draw_bytes * downsample
+
+
+def _count_bytes(boots, outcomes):
+    """
+    Bytes of a bootstrap iteration of multinomial counts: the counts of every level and
+    their cumulative sums over the outcomes
+    """
+    return 2 * np.dtype(np.int64).itemsize * len(boots) * (outcomes + 1)
+
+
+def _block_iterations(bs_params, iteration_bytes):
+    """
+    Bootstrap iterations of a block that fits bs_params.memory_budget
+    """
+    return max(1, int(bs_params.memory_budget // iteration_bytes))
+
+
+def _evaluate_blocks(fused, draw_block, boots, bs_params, size, group=None):
+    """
+    Evaluate a resample drawn in blocks of size iterations.
+
+    The intermediate values the metrics read are cached from each block (see
+    FusedMetrics.cache), then its resample arrays are dropped (see
+    ResampleStats.compact) and the metrics are evaluated once from the values of every
+    block.
+    """
+    blocks = []
+    for start in range(0, bs_params.bootstrap_iterations, size):
+        block = draw_block(min(size, bs_params.bootstrap_iterations - start))
+        fused.cache(block)
+        block.compact()
+        blocks.append(block)
+    return fused.evaluate(
+        boots, None, None, group=group, stats=success_metrics.StackedStats(blocks)
+    )
+
+
+def _with_group_key(df, key):
+    """
+    Record the key of the group held by df, which identifies its random stream
+    """
+    df.attrs["group_key"] = key
+    return df
+
+
+def _group_key(df):
+    return df.attrs.get("group_key")
+
+
+def _stream_key(df, bs_params, levels):
+    """
+    Key of the resample stream of a group at the given downsample levels. With
+    common random numbers, it is shared by the groups of the same instance and size.
+    """
+    if bs_params.crn_cols is None:
+        return (_group_key(df), levels)
+    instance = tuple(df[bs_params.crn_cols].iloc[0].tolist())
+    return ("crn", instance, len(df))
+
+
 def initBootstrap(df, bs_params):
     """
     Initialize the bootstrap method.
@@ -184,26 +1310,35 @@ def initBootstrap(df, bs_params):
     times : numpy.ndarray
         Array of times.
     """
-    if bs_params.agg is not None:
-        p = list(df[bs_params.agg] / df[bs_params.agg].sum())
-        resamples = np.random.choice(
-            len(df), (bs_params.downsample, bs_params.bootstrap_iterations), p=p
-        )
-    else:
-        resamples = np.random.randint(
-            0,
-            len(df),
-            size=(bs_params.downsample, bs_params.bootstrap_iterations),
-            dtype=np.intp,
-        )
-    responses = df[bs_params.shared_args["response_col"]].values[resamples]
-    resources = df[bs_params.shared_args["resource_col"]].values[resamples]
-
+    responses, resources = _resample_group(df, bs_params)
     bs_params.update_rule(bs_params, df)
+    reference = bs_params.reference
+    if reference is not None:
+        reference.apply(bs_params, reference.row(df[reference.instance_cols].iloc[0]))
     return responses, resources
 
 
-def BootstrapSingle(df, bs_params):
+def _sample_values(df, bs_params, col):
+    """
+    Values of col (or of a list of columns) of a group, as bs_params.dtype
+    """
+    return df[col].values.astype(bs_params.dtype, copy=False)
+
+
+def _resample_group(df, bs_params):
+    """
+    Responses and resources of the resamples of a group at bs_params.downsample
+    """
+    rng = stream(
+        bs_params.seed, "bootstrap", *_stream_key(df, bs_params, bs_params.downsample)
+    )
+    resamples = _resample_indices(df, bs_params, bs_params.downsample, rng=rng)
+    responses = _sample_values(df, bs_params, bs_params.shared_args["response_col"])
+    resources = _sample_values(df, bs_params, bs_params.shared_args["resource_col"])
+    return responses[resamples], resources[resamples]
+
+
+def BootstrapSingle(df, bs_params, plan=None):
     """
     Bootstrap single function.
 
@@ -213,29 +1348,747 @@ def BootstrapSingle(df, bs_params):
         DataFrame containing the data.
     bs_params : BootstrapParameters
         Parameters for the bootstrap method.
+    plan : BootstrapPlan, optional
+        Compiled metrics and reference values of the run. The default is None (apply
+        update_rule and build the metrics for this group).
 
     Returns
     -------
     bs_df : pandas.DataFrame
         DataFrame containing the bootstrap results.
     """
-    responses, resources = initBootstrap(df, bs_params)
-    bs_params.update_rule(bs_params, df)
-    bs_df = pd.DataFrame()
-    for metric_ref in bs_params.success_metrics:
-        metric = metric_ref(
-            bs_params.shared_args, bs_params.metric_args[metric_ref.__name__]
+    if (
+        bs_params.method in ["exact", "multinomial"]
+        or bs_params.adaptive
+        or bs_params.mean_scheme == "bayesian"
+        or bs_params.memory_budget is not None
+    ):
+        bs_df = BootstrapSingleLevels(df, bs_params, [bs_params.downsample], plan)
+        return bs_df.drop(columns="boots", errors="ignore")
+
+    if plan is None:
+        responses, resources = initBootstrap(df, bs_params)
+        fused = BootstrapPlan(bs_params).fused
+    else:
+        fused = plan.bind(df)
+        responses, resources = _resample_group(df, bs_params)
+    bs_df = fused.evaluate([len(responses)], responses, resources)
+
+    for col in bs_params.keep_cols:
+        val = df[col].iloc[0]
+        bs_df[col] = val
+
+    return bs_df
+
+
+def BootstrapSingleLevels(df, bs_params, boots, plan=None):
+    """
+    Bootstrap a single group at every downsample level from one shared resample.
+
+    A single (max(boots), bootstrap_iterations) resample is drawn and level n uses its
+    first n rows, so the best-so-far response, success counts and mean resources of all
+    levels follow from cumulative reductions along the first axis.
+    With bs_params.method == 'exact', metrics that support it skip the resample and are
+    evaluated from the closed-form distribution of the group's responses instead.
+    With bs_params.method == 'multinomial', the nested levels are drawn as counts over
+    the distinct outcomes of the group (see success_metrics.CountStats).
+    With bs_params.adaptive, the iterations are drawn in blocks until the confidence
+    intervals of every level converge.
+    With bs_params.memory_budget, the iterations are drawn and reduced in blocks that
+    fit the budget.
+    With bs_params.mean_scheme == 'bayesian', mean resources are Dirichlet-weighted
+    means of the group's resources (see success_metrics.dirichlet_means).
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        DataFrame containing the data of a single group.
+    bs_params : BootstrapParameters
+        Parameters for the bootstrap method. Its downsample is ignored.
+    boots : list[int]
+        Downsample levels to evaluate. Levels without draws (boots <= 0) are skipped.
+    plan : BootstrapPlan, optional
+        Compiled metrics and reference values of the run. The default is None (compile
+        them for this group).
+
+    Returns
+    -------
+    bs_df : pandas.DataFrame
+        DataFrame containing the bootstrap results, one row per level with a 'boots' column.
+    """
+    boots = np.asarray(boots, dtype=int)
+    boots = boots[boots > 0]
+    if len(boots) == 0:
+        return pd.DataFrame()
+
+    if plan is None:
+        plan = BootstrapPlan(bs_params)
+    fused = plan.bind(df)
+
+    group_responses = df[bs_params.shared_args["response_col"]].values
+    group_resources = df[bs_params.shared_args["resource_col"]].values
+    weights = None if bs_params.agg is None else df[bs_params.agg].values
+
+    group = (group_responses, group_resources, weights)
+    rng = stream(
+        bs_params.seed, "bootstrap", *_stream_key(df, bs_params, tuple(boots.tolist()))
+    )
+    bayesian = bs_params.mean_scheme == "bayesian"
+
+    def mean_resources(iterations):
+        if not bayesian:
+            return None
+        return success_metrics.dirichlet_means(
+            group_resources, weights, boots, iterations, rng, bs_params.memory_budget
+        )
+
+    # Resampled values, at the precision of bs_params.dtype
+    sample_responses = _sample_values(df, bs_params, bs_params.shared_args["response_col"])
+    sample_resources = _sample_values(df, bs_params, bs_params.shared_args["resource_col"])
+
+    if bs_params.method == "multinomial":
+        values, value_resources, value_weights = _distinct_outcomes(
+            sample_responses,
+            sample_resources,
+            np.ones(len(df)) if weights is None else weights,
+        )
+        iteration_bytes = _count_bytes(boots, len(values))
+
+        def draw_block(iterations):
+            counts = _multinomial_counts(value_weights, boots, iterations, rng)
+            return success_metrics.CountStats(
+                values, value_resources, counts, boots, mean_resources(iterations)
+            )
+
+    else:
+        iteration_bytes = _resample_bytes(bs_params, boots.max())
+
+        def draw_block(iterations):
+            resamples = _resample_indices(df, bs_params, boots.max(), iterations, rng)
+            if bayesian and not fused.needs_resources():
+                resources = None  # Only their means are read
+            else:
+                resources = sample_resources[resamples]
+            return success_metrics.ResampleStats(
+                sample_responses[resamples], resources, boots, mean_resources(iterations)
+            )
+
+    if not fused.needs_resample():
+        bs_df = fused.evaluate(boots, None, None, group=group)
+    elif bs_params.adaptive:
+        bs_df = _evaluate_adaptive(fused, draw_block, boots, bs_params, group=group)
+    elif (
+        bs_params.memory_budget is not None
+        and _block_iterations(bs_params, iteration_bytes)
+        < bs_params.bootstrap_iterations
+        and not fused.needs_resources()
+    ):
+        size = _block_iterations(bs_params, iteration_bytes)
+        bs_df = _evaluate_blocks(fused, draw_block, boots, bs_params, size, group=group)
+    else:
+        stats = draw_block(bs_params.bootstrap_iterations)
+        bs_df = fused.evaluate(
+            boots, stats.responses, stats.resources, group=group, stats=stats
         )
-        metric.evaluate(bs_df, responses, resources)
 
     for col in bs_params.keep_cols:
         val = df[col].iloc[0]
         bs_df[col] = val
+    bs_df["boots"] = boots
 
     return bs_df
 
 
-def Bootstrap(df, group_on, bs_params_list, progress_dir=None):
+def _group_boots(df_single, boots, grid_levels=None):
+    """
+    Downsample levels to evaluate for a group: all of boots, or those of grid_levels
+    """
+    if grid_levels is None:
+        return boots
+    return grid_levels(df_single, boots)
+
+
+def _bootstrap_groups(
+    groups, group_on, block, group_major=False, grid_levels=None, plan=None
+):
+    """
+    Bootstrap (key, df_single) groups at the downsample levels of a block of parameters:
+    all of them at once with group_major, otherwise the single level of the block.
+    """
+    if plan is None:
+        plan = BootstrapPlan(block[0], group_on=group_on)
+    df_list = []
+    for key, df_single in groups:
+        df_single = _with_group_key(df_single, key)
+        if group_major:
+            boots = [p.downsample for p in block]
+            bs_df = BootstrapSingleLevels(
+                df_single, block[0], _group_boots(df_single, boots, grid_levels), plan
+            )
+        else:
+            bs_df = BootstrapSingle(df_single, block[0], plan)
+            bs_df["boots"] = block[0].downsample
+        for col, val in zip(group_on, key):
+            bs_df[col] = val
+        df_list.append(bs_df)
+    if len(df_list) == 0:
+        return pd.DataFrame()
+    bs_df = pd.concat(df_list, ignore_index=True)
+    return bs_df[group_on + [col for col in bs_df.columns if col not in group_on]]
+
+
+def Bootstrap_group_major(
+    df, group_on, bs_params_list, shared_memory=False, grid_levels=None
+):
+    """
+    Bootstrap function that parallelizes over groups instead of downsample levels.
+
+    Every group is resampled once for all levels with BootstrapSingleLevels. The
+    parameters in bs_params_list should only differ in their downsample value.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        DataFrame containing the data.
+    group_on : List[str]
+        Column names to group on.
+    bs_params_list: list or iterator of bootstrap parameters
+        Bootstrap parameters, one per downsample level.
+    shared_memory : bool, optional
+        Pass the numeric columns to the workers through shared memory (see SharedGroups)
+        instead of pickling every group. The default is False.
+    grid_levels : GridLevels, optional
+        Only evaluate the downsample levels of each group needed to reach a resource
+        grid. The default is None (every level).
+
+    Returns
+    -------
+    bs_df : pandas.DataFrame
+        DataFrame containing the bootstrap results.
+    """
+    bs_params_list = list(bs_params_list)
+    if len(bs_params_list) == 0:
+        return pd.DataFrame()
+    bs_params = bs_params_list[0]
+    if shared_memory:
+        columns = _shared_columns(bs_params)
+        plan = _compile_shared_plan(df, group_on, bs_params)
+        with SharedGroups(df, group_on, columns, bs_params.keep_cols) as shared:
+            return _bootstrap_shared(
+                shared, bs_params_list, plan, group_major=True, grid_levels=grid_levels
+            )
+    boots = [p.downsample for p in bs_params_list]
+    plan = BootstrapPlan(bs_params, group_on=group_on)
+
+    def f(group):
+        key, df_single = group
+        df_single = _with_group_key(df_single, key)
+        bs_df = BootstrapSingleLevels(
+            df_single, bs_params, _group_boots(df_single, boots, grid_levels), plan
+        )
+        for col, val in zip(group_on, key):
+            bs_df[col] = val
+        return bs_df[group_on + [col for col in bs_df.columns if col not in group_on]]
+
+    return _imap_concat(f, df.groupby(group_on))
+
+
+def _weighted_rows(weights, totals, cols, rng):
+    """
+    Draw one row index per entry of cols, from the weights of that replicate (a row of
+    weights), by inverse transform over the normalized cumulative weights with every
+    replicate offset by its index so a single np.searchsorted covers all of them
+    """
+    nrows = weights.shape[1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cum = np.cumsum(weights, axis=1) / totals[:, None]
+    cum[totals == 0] = 1.0  # Never drawn from
+    keys = (cum + np.arange(len(weights))[:, None]).ravel()
+    targets = cols + rng.random_sample(len(cols))
+    rows = np.searchsorted(keys, targets, side="right") - cols * nrows
+    return np.minimum(rows, nrows - 1)
+
+
+class OnlineBootstrap:
+    """
+    Poisson-weighted online bootstrap that is updated one batch of results at a time.
+
+    Every replicate of a group gives each read a Poisson(1) weight and keeps a resample
+    of max(boots) reads drawn from its weighted reads, of which level n uses the first
+    n. When a batch arrives, each resampled read of a replicate is replaced by a read of
+    the batch with probability (batch weight) / (total weight of the replicate), which
+    keeps it a draw from every read ingested so far. Ingesting a batch costs
+    O((batch + max(boots)) * bootstrap_iterations) for each group it contains, and
+    re-evaluating every level of such a group O(max(boots) * bootstrap_iterations),
+    however many reads were ingested before. An update is therefore not O(batch): it
+    always redraws and re-evaluates the resamples of the groups in the batch.
+
+    update_rule receives the distinct (response, resource) outcomes of a group with
+    their read counts in the agg column ('count' if agg is None), and is bound with
+    agg set to it, so e.g. default_update counts every read.
+
+    Attributes
+    ----------
+    group_on : list[str]
+        Column names to group on
+    bs_params : BootstrapParameters
+        Parameters of the bootstrap. agg, if set, holds the number of reads of a row.
+    boots : np.array
+        Downsample levels to evaluate
+
+    Methods
+    -------
+    __init__(group_on, bs_params_list)
+        Constructor for OnlineBootstrap class
+    ingest(batch_df)
+        Add a batch of results
+    evaluate()
+        Bootstrap results of every group, re-evaluating the groups updated since the
+        last call
+    """
+
+    def __init__(self, group_on, bs_params_list):
+        bs_params_list = list(bs_params_list)
+        self.group_on = list(group_on)
+        self.bs_params = bs_params_list[0]
+        self.boots = np.array([p.downsample for p in bs_params_list], dtype=int)
+        self.boots = self.boots[self.boots > 0]
+        self._groups = {}
+        self._results = {}
+
+    def ingest(self, batch_df):
+        """
+        Parameters
+        ----------
+        batch_df : pandas.DataFrame
+            New results, with the group_on, response and resource columns
+        """
+        response_col = self.bs_params.shared_args["response_col"]
+        resource_col = self.bs_params.shared_args["resource_col"]
+        iterations = self.bs_params.bootstrap_iterations
+        size = (self.boots.max() if len(self.boots) else 0, iterations)
+        for key, df_single in batch_df.groupby(self.group_on):
+            if key not in self._groups:
+                self._groups[key] = {
+                    "outcomes": {},
+                    "counts": np.zeros(0, dtype=np.int64),
+                    "totals": np.zeros(iterations),
+                    "responses": np.zeros(size),
+                    "resources": np.zeros(size),
+                    "batches": 0,
+                    "keep": {
+                        col: df_single[col].iloc[0]
+                        for col in self.bs_params.keep_cols
+                        if col in df_single.columns
+                    },
+                }
+            state = self._groups[key]
+            responses = df_single[response_col].values
+            resources = df_single[resource_col].values
+
+            # Read counts of the distinct outcomes, for the arguments of the group
+            outcomes = state["outcomes"]
+            idx = np.array(
+                [
+                    outcomes.setdefault(outcome, len(outcomes))
+                    for outcome in zip(responses, resources)
+                ]
+            )
+            new = len(outcomes) - len(state["counts"])
+            if new > 0:
+                state["counts"] = np.concatenate(
+                    [state["counts"], np.zeros(new, dtype=np.int64)]
+                )
+
+            if self.bs_params.agg is None:
+                reads = np.ones(len(df_single), dtype=np.int64)
+            else:
+                reads = df_single[self.bs_params.agg].values.astype(np.int64)
+            np.add.at(state["counts"], idx, reads)
+
+            # A row of c reads gets the sum of c Poisson(1) weights
+            rng = stream(self.bs_params.seed, "online", key, state["batches"])
+            weights = rng.poisson(reads, size=(iterations, len(reads))).astype(float)
+            batch_totals = weights.sum(axis=1)
+            # Replicates without any weight yet use the reads
+            empty = (state["totals"] + batch_totals) == 0
+            weights[empty] = reads
+            batch_totals[empty] = reads.sum()
+            state["totals"] += batch_totals
+
+            with np.errstate(invalid="ignore", divide="ignore"):
+                replace_prob = np.where(
+                    batch_totals > 0, batch_totals / state["totals"], 0.0
+                )
+            replaced = rng.random_sample(size) < replace_prob
+            cols = np.nonzero(replaced)[1]
+            rows = _weighted_rows(weights, batch_totals, cols, rng)
+            state["responses"][replaced] = responses[rows]
+            state["resources"][replaced] = resources[rows]
+            state["batches"] += 1
+            self._results.pop(key, None)
+
+    def _evaluate_group(self, key):
+        state = self._groups[key]
+        response_col = self.bs_params.shared_args["response_col"]
+        resource_col = self.bs_params.shared_args["resource_col"]
+        count_col = "count" if self.bs_params.agg is None else self.bs_params.agg
+        outcomes = list(state["outcomes"])
+        table = pd.DataFrame(
+            {
+                response_col: [outcome[0] for outcome in outcomes],
+                resource_col: [outcome[1] for outcome in outcomes],
+                count_col: state["counts"],
+            }
+        )
+        bs_params = copy.copy(self.bs_params)
+        bs_params.agg = count_col  # The rows of table are read counts
+        fused = BootstrapPlan(bs_params, group_on=self.group_on).bind(table, key)
+
+        stats = success_metrics.ResampleStats(
+            state["responses"], state["resources"], self.boots
+        )
+        bs_df = fused.evaluate(self.boots, None, None, stats=stats)
+        for col, val in state["keep"].items():
+            bs_df[col] = val
+        bs_df["boots"] = self.boots
+        for col, val in zip(self.group_on, key):
+            bs_df[col] = val
+        return bs_df
+
+    def evaluate(self):
+        """
+        Returns
+        -------
+        bs_df : pandas.DataFrame
+            DataFrame containing the bootstrap results, one row per group and level
+        """
+        if len(self._groups) == 0 or len(self.boots) == 0:
+            return pd.DataFrame()
+        for key in self._groups:
+            if key not in self._results:
+                self._results[key] = self._evaluate_group(key)
+        bs_df = pd.concat(
+            [self._results[key] for key in sorted(self._results)], ignore_index=True
+        )
+        group_on = self.group_on
+        return bs_df[group_on + [col for col in bs_df.columns if col not in group_on]]
+
+
+_manifest_name = "manifest.json"
+_manifest_log_name = "manifest.log"  # Records of the shards done since the manifest
+default_group_parts = 1  # Group blocks of a progress shard, fixed so runs can resume anywhere
+
+
+def _write_atomic(write, filename):
+    """
+    Write a file through write(tmp_filename) and move it into place, so readers never
+    see a partial file
+    """
+    tmp_filename = "{}.tmp{}".format(filename, os.getpid())
+    write(tmp_filename)
+    os.replace(tmp_filename, filename)
+
+
+def _read_manifest(progress_dir):
+    """
+    Records of every completed shard in progress_dir, by shard filename: those of the
+    manifest, updated with those appended to the manifest log since it was written
+    """
+    shards = {}
+    filename = os.path.join(progress_dir, _manifest_name)
+    if os.path.exists(filename):
+        with open(filename) as f:
+            shards = json.load(f)["shards"]
+    log_filename = os.path.join(progress_dir, _manifest_log_name)
+    if os.path.exists(log_filename):
+        with open(log_filename) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:  # Interrupted while appending it
+                    continue
+                shards[entry["shard"]] = entry["record"]
+    return shards
+
+
+def _append_manifest(progress_dir, shard, record):
+    """
+    Record a completed shard by appending a line to the manifest log
+    """
+    with open(os.path.join(progress_dir, _manifest_log_name), "a") as f:
+        f.write(json.dumps({"shard": shard, "record": record}) + "\n")
+        f.flush()
+
+
+def _write_manifest(progress_dir, shards):
+    """
+    Write the records of every shard to the manifest and clear the manifest log
+    """
+
+    def write(tmp_filename):
+        with open(tmp_filename, "w") as f:
+            json.dump({"shards": shards}, f, indent=1, sort_keys=True)
+
+    _write_atomic(write, os.path.join(progress_dir, _manifest_name))
+    log_filename = os.path.join(progress_dir, _manifest_log_name)
+    if os.path.exists(log_filename):
+        os.remove(log_filename)
+
+
+def _shard_record(bs_df, digest=None):
+    """
+    Manifest entry of a shard: its rows, (column, dtype) pairs in column order and the
+    digest of the groups it was computed from
+    """
+    dtypes = df_utils.frame_dtypes(bs_df)
+    record = {"rows": len(bs_df), "dtypes": [[col, d.str] for col, d in dtypes.items()]}
+    if digest is not None:
+        record["digest"] = digest
+    return record
+
+
+def _group_part(key, group_parts):
+    """
+    Group block of a group, from its key only (not its position among the groups)
+    """
+    return int.from_bytes(key_hash(key)[:8], "little") % group_parts
+
+
+def _groups_digest(groups, keys, index):
+    """
+    Digest of the keys and data of the groups in index, which identifies what a shard
+    was computed from
+    """
+    digest = hashlib.sha256()
+    for g in index:
+        digest.update(key_hash(keys[g]))
+        digest.update(pd.util.hash_pandas_object(groups(g), index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _fingerprint(value):
+    """
+    JSON form of a parameter value that does not depend on the process: functions and
+    classes by name, reference tables by the hash of their values
+    """
+    if isinstance(value, dict):
+        return {str(k): _fingerprint(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint(v) for v in value]
+    if isinstance(value, ReferenceTable):
+        return {
+            "instance_cols": value.instance_cols,
+            "metric_cols": value.metric_cols,
+            "values": pd.util.hash_pandas_object(value.values).values.tolist(),
+        }
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    if callable(value):
+        return "{}.{}".format(
+            getattr(value, "__module__", None),
+            getattr(value, "__qualname__", type(value).__qualname__),
+        )
+    return repr(value)
+
+
+def _params_digest(block):
+    """
+    Digest of the bootstrap parameters of a block of downsample levels
+    """
+    record = [
+        {f.name: _fingerprint(getattr(bs_params, f.name)) for f in fields(bs_params)}
+        for bs_params in block
+    ]
+    return hashlib.sha256(json.dumps(record, sort_keys=True).encode()).hexdigest()
+
+
+def _merge_shards(filenames, records):
+    """
+    Concatenate shards without holding more than one of them in memory
+    (see df_utils.concat_frames)
+    """
+    return df_utils.concat_frames(
+        (pd.read_pickle(filename) for filename in filenames),
+        [record["rows"] for record in records],
+        [
+            {col: np.dtype(d) for col, d in record["dtypes"]}
+            for record in records
+        ],
+    )
+
+
+def _bootstrap_progress(
+    df,
+    group_on,
+    bs_params_list,
+    progress_dir,
+    group_major=False,
+    shared_memory=False,
+    grid_levels=None,
+    group_parts=None,
+):
+    """
+    Bootstrap with write-through progress shards, resuming from those already done.
+
+    Work is split in (downsample block, group block) tasks, with the group block of a
+    group given by the hash of its key. Every finished task is written atomically to its
+    own shard in progress_dir and recorded with its rows, dtypes and the digest of its
+    groups' keys and data and of its bootstrap parameters, so an interrupted run only
+    recomputes the shards missing from the manifest or computed from other groups, data
+    or parameters (e.g., after a parameter set was added or dropped). Finished shards
+    are appended to a manifest log, which is folded into the manifest once every shard
+    is done. Per-level results of older runs (bootstrapped_results_boots={}.pkl) are
+    used as complete levels. The shards are then merged one at a time.
+    """
+    bs_params_list = list(bs_params_list)
+    if len(bs_params_list) == 0:
+        return pd.DataFrame()
+    if group_parts is None:
+        group_parts = default_group_parts
+    group_major = group_major or grid_levels is not None
+    if group_major:
+        blocks = [bs_params_list]
+    else:
+        blocks = [[bs_params] for bs_params in bs_params_list]
+
+    def shard_filename(b, part):
+        block = blocks[b]
+        levels = "{}-{}".format(block[0].downsample, block[-1].downsample)
+        if len(block) == 1:
+            levels = str(block[0].downsample)
+        return os.path.join(
+            progress_dir,
+            "bootstrapped_results_boots={}_part={}of{}.pkl".format(
+                levels, part, group_parts
+            ),
+        )
+
+    def resume(groups, keys, compile_plan=None):
+        """
+        Compute the shards that are missing or stale and return every shard.
+        compile_plan() returns the plan of groups that update_rule cannot read.
+        """
+        part_of = np.array([_group_part(key, group_parts) for key in keys], dtype=int)
+        parts = [np.nonzero(part_of == part)[0] for part in range(group_parts)]
+        group_digests = [_groups_digest(groups, keys, index) for index in parts]
+        params_digests = [_params_digest(block) for block in blocks]
+
+        def digest(b, part):
+            return hashlib.sha256(
+                (group_digests[part] + params_digests[b]).encode()
+            ).hexdigest()
+
+        manifest = _read_manifest(progress_dir)
+        filenames = []
+        records = []
+        tasks = []
+        for b, block in enumerate(blocks):
+            level_filename = os.path.join(
+                progress_dir,
+                "bootstrapped_results_boots={}.pkl".format(block[0].downsample),
+            )
+            if len(block) == 1 and os.path.exists(level_filename):
+                filenames.append(level_filename)
+                records.append(_shard_record(pd.read_pickle(level_filename)))
+                continue
+            for part in range(group_parts):
+                filename = shard_filename(b, part)
+                record = manifest.get(os.path.basename(filename))
+                filenames.append(filename)
+                if (
+                    record is not None
+                    and record.get("digest") == digest(b, part)
+                    and os.path.exists(filename)
+                ):
+                    records.append(record)
+                else:
+                    records.append(None)
+                    tasks.append((b, part, len(records) - 1))
+        if len(tasks) == 0:
+            if os.path.exists(os.path.join(progress_dir, _manifest_log_name)):
+                _write_manifest(progress_dir, manifest)
+            return filenames, records
+
+        logger.info("bootstrapping %d of %d shards", len(tasks), len(filenames))
+        if compile_plan is not None:
+            plan = compile_plan()
+        elif group_major:
+            plan = BootstrapPlan(bs_params_list[0], group_on=group_on)
+        else:  # Every group is visited once per level
+            plan = BootstrapPlan.compile(
+                bs_params_list[0],
+                ((keys[g], groups(g)) for g in range(len(keys))),
+                group_on,
+            )
+
+        def task_f(task):
+            b, part, _ = task
+            bs_df = _bootstrap_groups(
+                ((keys[g], groups(g)) for g in parts[part]),
+                group_on,
+                blocks[b],
+                group_major,
+                grid_levels,
+                plan,
+            )
+            _write_atomic(bs_df.to_pickle, shard_filename(b, part))
+            return task, _shard_record(bs_df, digest(b, part))
+
+        with Pool() as p:
+            for task, record in p.imap_unordered(task_f, tasks):
+                records[task[2]] = record
+                shard = os.path.basename(filenames[task[2]])
+                manifest[shard] = record
+                _append_manifest(progress_dir, shard, record)
+        _write_manifest(progress_dir, manifest)
+        return filenames, records
+
+    if shared_memory:
+        columns = _shared_columns(bs_params_list[0])
+        with SharedGroups(df, group_on, columns, bs_params_list[0].keep_cols) as shared:
+            filenames, records = resume(
+                shared.group,
+                shared.keys,
+                lambda: _compile_shared_plan(df, group_on, bs_params_list[0]),
+            )
+    else:
+        grouped = list(df.groupby(group_on))
+        filenames, records = resume(
+            lambda g: grouped[g][1], [key for key, _ in grouped]
+        )
+    return _merge_shards(filenames, records)
+
+
+def _read_input(df):
+    """
+    DataFrame of a bootstrap input: a DataFrame, a pickle filename or a list of either
+    """
+    if type(df) == list:
+        if type(df[0]) == pd.DataFrame:
+            df = pd.concat(df, ignore_index=True)
+        elif type(df[0]) == str:
+            df = pd.concat([pd.read_pickle(df_str) for df_str in df], ignore_index=True)
+    elif type(df) == str:
+        df = pd.read_pickle(df)
+
+    if type(df) != pd.DataFrame:
+        logger.error("Unsupported type as bootstrap input")
+    return df
+
+
+def Bootstrap(
+    df,
+    group_on,
+    bs_params_list,
+    progress_dir=None,
+    group_major=False,
+    shared_memory=False,
+    grid_levels=None,
+    group_parts=None,
+):
     """
     Bootstrap function.
 
@@ -255,7 +2108,24 @@ def Bootstrap(df, group_on, bs_params_list, progress_dir=None):
     bs_params_list: list or iterator of bootstrap parameters
         Number of bootstraps.
     progress_dir : str, optional
-        Directory to write progress to. The default is None.
+        Directory to write progress to. Results are written as shards of
+        (downsample block, group block) with a manifest, and a rerun with the same
+        progress_dir only computes the missing shards (or those of other data or
+        parameters). The default is None.
+    group_major : bool, optional
+        Resample each group once for all downsample levels (see Bootstrap_group_major)
+        instead of once per level. The default is False.
+    shared_memory : bool, optional
+        Pass the numeric columns to the workers through shared memory (see SharedGroups)
+        instead of pickling the DataFrame to every worker. The default is False.
+    grid_levels : GridLevels, optional
+        Only evaluate the downsample levels of each group needed to reach a resource
+        grid. Implies group_major. The default is None (every level).
+    group_parts : int, optional
+        Number of group blocks of each downsample block in progress shards. The default
+        is default_group_parts (one shard per downsample block), which does not depend
+        on the machine so that a run can be resumed on another one. More parts spread
+        a block over the workers, at the cost of one file per part.
 
     Returns
     -------
@@ -266,183 +2136,412 @@ def Bootstrap(df, group_on, bs_params_list, progress_dir=None):
     df_list : List[str]
         List of strings pointing to files with portions of bootstrapped_results
     """
-    if type(df) == list:
-        if type(df)[0] == pd.DataFrame:
-            df = pd.concat(df, ignore_index=True)
-        elif type(df)[0] == str:
-            df = pd.concat([pd.read_pickle(df_str) for df_str in df], ignore_index=True)
-    elif type(df) == str:
-        df = pd.read_pickle(df)
+    df = _read_input(df)
+
+    if progress_dir is not None:
+        return _bootstrap_progress(
+            df,
+            group_on,
+            bs_params_list,
+            progress_dir,
+            group_major=group_major,
+            shared_memory=shared_memory,
+            grid_levels=grid_levels,
+            group_parts=group_parts,
+        )
 
-    if type(df) != pd.DataFrame:
-        logger.error("Unsupported type as bootstrap input")
+    if group_major or grid_levels is not None:
+        return Bootstrap_group_major(
+            df,
+            group_on,
+            bs_params_list,
+            shared_memory=shared_memory,
+            grid_levels=grid_levels,
+        )
+
+    if shared_memory:
+        bs_params_list = list(bs_params_list)
+        if len(bs_params_list) == 0:
+            return pd.DataFrame()
+        bs_params = bs_params_list[0]
+        columns = _shared_columns(bs_params)
+        plan = _compile_shared_plan(df, group_on, bs_params)
+        with SharedGroups(df, group_on, columns, bs_params.keep_cols) as shared:
+            return _bootstrap_shared(shared, bs_params_list, plan)
+
+    bs_params_list = list(bs_params_list)
+    if len(bs_params_list) == 0:
+        return pd.DataFrame()
+    plan = BootstrapPlan.compile(bs_params_list[0], df.groupby(group_on), group_on)
 
     def f(bs_params):
-        if progress_dir is not None:
-            filename = os.path.join(
-                progress_dir,
-                "bootstrapped_results_boots={}.pkl".format(bs_params.downsample),
+        temp_df = (
+            df.groupby(group_on)
+            .progress_apply(
+                lambda df: BootstrapSingle(
+                    _with_group_key(df, df.name), bs_params, plan
+                )
             )
-            if os.path.exists(filename):
-                temp_df = pd.read_pickle(filename)
-                return temp_df
+            .reset_index()
+        )
+        temp_df.drop("level_{}".format(len(group_on)), axis=1, inplace=True)
+        temp_df["boots"] = bs_params.downsample
+        return temp_df
+
+    return _imap_concat(f, bs_params_list)
 
+
+def race(df, group_on, bs_params_list, race_params, manifest=None, **kwargs):
+    """
+    Racing pre-screen: bootstrap every group cheaply and drop the parameter sets that
+    are dominated with high confidence on every instance (see RaceParameters).
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        DataFrame containing the data (or any input accepted by Bootstrap).
+    group_on : List[str]
+        Column names to group on.
+    bs_params_list: list or iterator of bootstrap parameters
+        Bootstrap parameters of the full run, one per downsample level. The pre-screen
+        uses race_params.bootstrap_iterations and race_params.confidence_level instead.
+    race_params : RaceParameters
+        Parameters of the pre-screen.
+    manifest : str, optional
+        JSON file to record the dropped parameter sets and the pre-screen settings to.
+        If it already exists, the parameter sets it records are dropped and the
+        pre-screen is not run again, so a resumed run (e.g., from progress shards) keeps
+        the same contenders. The default is None.
+    **kwargs
+        Passed to Bootstrap (e.g., group_major, shared_memory, grid_levels).
+
+    Returns
+    -------
+    contenders : pandas.DataFrame
+        Rows of df of the parameter sets that are kept.
+    dropped : pandas.DataFrame
+        Dropped parameter sets, one row each with the race_params.parameter_names columns.
+    """
+    df = _read_input(df)
+    if manifest is not None and os.path.exists(manifest):
+        with open(manifest) as f:
+            record = json.load(f)
+        logger.info("Reusing the parameter sets dropped in %s.", manifest)
+        dropped = pd.DataFrame(record["dropped"], columns=race_params.parameter_names)
+        return _drop_parameter_sets(df, dropped, race_params.parameter_names), dropped
+
+    screen_list = []
+    for bs_params in bs_params_list:
+        screen = copy.copy(bs_params)
+        screen.shared_args = dict(
+            bs_params.shared_args, confidence_level=race_params.confidence_level
+        )
+        screen.bootstrap_iterations = race_params.bootstrap_iterations
+        screen.adaptive = False
+        screen_list.append(screen)
+    screen_df = Bootstrap(df, group_on, screen_list, **kwargs)
+    dropped = race_params(screen_df)
+    logger.info(
+        "Racing dropped %s of %s parameter sets.",
+        len(dropped),
+        len(df[race_params.parameter_names].drop_duplicates()),
+    )
+
+    if manifest is not None:
+        record = {
+            "metric": race_params.metric,
+            "bootstrap_iterations": race_params.bootstrap_iterations,
+            "confidence_level": race_params.confidence_level,
+            "dropped": json.loads(dropped.to_json(orient="records")),
+        }
+
+        def write(tmp_filename):
+            with open(tmp_filename, "w") as f:
+                json.dump(record, f, indent=1)
+
+        _write_atomic(write, manifest)
+
+    return _drop_parameter_sets(df, dropped, race_params.parameter_names), dropped
+
+
+def _drop_parameter_sets(df, dropped, parameter_names):
+    """
+    Rows of df whose parameter set is not in dropped
+    """
+    if len(dropped) == 0:
+        return df
+    keep = ~pd.MultiIndex.from_frame(df[parameter_names]).isin(
+        pd.MultiIndex.from_frame(dropped.astype(df[parameter_names].dtypes))
+    )
+    return df[keep]
+
+
+def _bootstrap_upper_group(
+    df_group,
+    group_on,
+    bs_params_list,
+    group_major=False,
+    shared_memory=False,
+    grid_levels=None,
+):
+    """
+    Bootstrap the lower groups of a single upper group (one results file).
+    """
+    if group_major or grid_levels is not None:
+        return Bootstrap_group_major(
+            df_group,
+            group_on,
+            bs_params_list,
+            shared_memory=shared_memory,
+            grid_levels=grid_levels,
+        )
+    if shared_memory:
+        columns = _shared_columns(bs_params_list[0])
+        plan = _compile_shared_plan(df_group, group_on, bs_params_list[0])
+        with SharedGroups(
+            df_group, group_on, columns, bs_params_list[0].keep_cols
+        ) as shared:
+            return _bootstrap_shared(shared, bs_params_list, plan)
+
+    plan = BootstrapPlan.compile(
+        bs_params_list[0], df_group.groupby(group_on), group_on
+    )
+
+    def bs_params_eval(bs_params):
         temp_df = (
-            df.groupby(group_on)
-            .progress_apply(lambda df: BootstrapSingle(df, bs_params))
+            df_group.groupby(group_on)
+            .progress_apply(
+                lambda df: BootstrapSingle(
+                    _with_group_key(df, df.name), bs_params, plan
+                )
+            )
             .reset_index()
         )
         temp_df.drop("level_{}".format(len(group_on)), axis=1, inplace=True)
         temp_df["boots"] = bs_params.downsample
         return temp_df
 
-    with Pool() as p:
-        df_list = p.map(f, bs_params_list)
-    return pd.concat(df_list)
+    return _imap_concat(bs_params_eval, bs_params_list)
 
 
-def Bootstrap_reduce_mem(df, group_on, bs_params_list, bootstrap_dir, name_fcn=None):
+_worker_groups = {}  # Lower groups of the upper group loaded by this worker
+
+
+def _load_worker_groups(filename, group_on):
+    """
+    Lower groups of the upper group pickled in filename, loaded at most once while the
+    worker is on it.
+    """
+    if filename not in _worker_groups:
+        _worker_groups.clear()  # Only one upper group is held per worker
+        _worker_groups[filename] = list(pd.read_pickle(filename).groupby(group_on))
+    return _worker_groups[filename]
+
+
+def _bootstrap_reduce_mem_global(
+    sources,
+    filenames,
+    group_on,
+    bs_params_list,
+    group_major=False,
+    group_parts=None,
+    grid_levels=None,
+    run_length=False,
+):
+    """
+    Bootstrap every upper group with a single persistent worker pool.
+
+    Work is split in (upper group, group part, downsample block) tasks that idle
+    workers pull from a shared queue, so small upper groups do not leave workers idle
+    while large ones run. Tasks only carry the pickle filename of their upper group
+    (upper groups given as DataFrames are pickled to a temporary directory first), and
+    workers load each upper group once and keep it while they work on its tasks, so a
+    worker holds a single upper group at a time. Each results file is written as soon
+    as all of its tasks are done.
+    """
+    if group_parts is None:
+        group_parts = os.cpu_count() or 1
+    todo = [i for i, filename in enumerate(filenames) if not os.path.exists(filename)]
+    if len(todo) == 0 or len(bs_params_list) == 0:
+        return
+    group_major = group_major or grid_levels is not None
+    if group_major:
+        blocks = [bs_params_list]
+    else:
+        blocks = [[bs_params] for bs_params in bs_params_list]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_files = {}
+        for i in todo:
+            source = sources[i]
+            if type(source) == str:
+                source_files[i] = source
+            else:
+                source_files[i] = os.path.join(tmp_dir, "upper_group_{}.pkl".format(i))
+                source.to_pickle(source_files[i])
+        _bootstrap_upper_tasks(
+            source_files,
+            filenames,
+            group_on,
+            blocks,
+            group_major,
+            group_parts,
+            grid_levels,
+            run_length,
+        )
+
+
+def _bootstrap_upper_tasks(
+    source_files,
+    filenames,
+    group_on,
+    blocks,
+    group_major,
+    group_parts,
+    grid_levels,
+    run_length,
+):
+    """
+    Run the (upper group, group part, downsample block) tasks of the upper groups
+    pickled in source_files (by upper group index) and write their results files.
+    """
+    tasks = [
+        (source_files[i], i, b, part)
+        for i in source_files
+        for b in range(len(blocks))
+        for part in range(group_parts)
+    ]
+
+    def task_f(task):
+        source_file, i, b, part = task
+        groups = _load_worker_groups(source_file, group_on)[part::group_parts]
+        return task[1:], _bootstrap_groups(
+            groups, group_on, blocks[b], group_major, grid_levels
+        )
+
+    spools = {}  # Finished pieces of the upper groups in progress, spooled to disk
+    remaining = {i: len(blocks) * group_parts for i in source_files}
+    _worker_groups.clear()  # Forked workers start without an upper group
+    with Pool() as p:
+        for task, res in p.imap_unordered(task_f, tasks):
+            i = task[0]
+            if i not in spools:
+                spools[i] = df_utils.FrameSpool()
+            spools[i].append(res, task[1:])
+            del res
+            remaining[i] -= 1
+            if remaining[i] == 0:
+                with spools.pop(i) as spool:
+                    df_utils.save_results(
+                        spool.to_frame(), filenames[i], group_on, "boots", run_length
+                    )
+                logger.info("wrote bootstrapped results to %s", filenames[i])
+
+
+def Bootstrap_reduce_mem(
+    df,
+    group_on,
+    bs_params_list,
+    bootstrap_dir,
+    name_fcn=None,
+    group_major=False,
+    shared_memory=False,
+    persistent_pool=False,
+    group_parts=None,
+    grid_levels=None,
+    run_length=False,
+):
     """
     Bootstrap function with reduced memory usage.
 
     Parameters
     ----------
-    df : pandas.DataFrame
-        DataFrame containing the data.
+    df : pandas.DataFrame, str or list
+        DataFrame containing the data (or the filename of its pickle), split into upper
+        groups with group_on[0]. A list of DataFrames or pickle filenames is used as the
+        upper groups directly.
     group_on : List[str]
-        Column name to group on.
+        Column names to group on. For a single DataFrame,
+        group_on = [upper_group_on, lower_group_on].
     bs_params_list: list or iterator of bootstrap parameters
         Number of bootstraps.
     bootstrap_dir : str
         Directory to write progress to.
     name_fcn : function, optional
         Function to generate the name of the group. The default is None.
+    group_major : bool, optional
+        Resample each group once for all downsample levels (see Bootstrap_group_major)
+        instead of once per level. The default is False.
+    shared_memory : bool, optional
+        Pass the numeric columns of each upper group to the workers through shared
+        memory (see SharedGroups). Unused with persistent_pool, where workers load the
+        upper groups themselves. The default is False.
+    persistent_pool : bool, optional
+        Use a single worker pool for all upper groups, scheduling
+        (upper group, group part, downsample block) tasks across every file instead of
+        starting a pool per file. The default is False.
+    group_parts : int, optional
+        Number of parts the lower groups of each upper group are split in with
+        persistent_pool. The default is the number of CPUs.
+    grid_levels : GridLevels, optional
+        Only evaluate the downsample levels of each group needed to reach a resource
+        grid. Implies group_major. The default is None (every level).
+    run_length : bool, optional
+        Run-length encode the plateaus of the results files along boots (see
+        df_utils.compress_runs). The default is False.
 
     Returns
     -------
-    bs_df : pandas.DataFrame
-        DataFrame containing the bootstrap results.
+    bs_filenames : List[str]
+        Files with the bootstrap results of each upper group.
     """
     bs_params_list = list(bs_params_list)
 
-    if (type(df) == pd.DataFrame) or (type(df) == str):
-        if type(df) == str:
-            df = pd.read_pickle(df)
-        lower_group_on = group_on[1]
-        group_on = group_on[0]
-
-        def upper_f(df_upper_group, bs_params_list):
-            group_name = name_fcn(df_upper_group[0])
-            df_group = df_upper_group[1]
-            filename = os.path.join(
-                bootstrap_dir, "bootstrapped_results_{}.pkl".format(group_name)
-            )  # TODO fix filename
-
-            if not os.path.exists(filename):
-
-                def bs_all_par(par_group):
-                    bs_params = par_group[0]
-                    lower_group_df = par_group[1]
-                    return BootstrapSingle(lower_group_df[1], bs_params)
-
-                def bs_params_eval(bs_params):
-                    temp_df = (
-                        df_group.groupby(group_on)
-                        .progress_apply(lambda df: BootstrapSingle(df, bs_params))
-                        .reset_index()
-                    )
-                    temp_df.drop("level_{}".format(len(group_on)), axis=1, inplace=True)
-                    temp_df["boots"] = bs_params.downsample
-                    return temp_df
-
-                # par_group = product(bs_params_list, df_group.groupby(group_on))
-                # with Pool() as p:
-                #     df_list = p.imap(bs_all_par, par_group)
-
-                with Pool() as p:
-                    df_list = p.map(bs_params_eval, bs_params_list)
-
-                res = pd.concat(df_list, ignore_index=True)
-                res.to_pickle(filename)
-            return filename
-
+    if type(df) == str:
+        df = pd.read_pickle(df)
+    if type(df) == pd.DataFrame:
+        upper_group_on, group_on = group_on
+        sources = []
+        group_names = []
+        for key, df_group in df.groupby(upper_group_on):
+            sources.append(df_group)
+            group_names.append(name_fcn(key))
     elif type(df) == list:
-        if type(df[0]) == str:
-            logger.debug("calling list of names method")
-
-            def upper_f(upper_group_filename, bs_params_list):
-                df_group = pd.read_pickle(upper_group_filename)
-                group_name = name_fcn(upper_group_filename)
-                logger.info("evaluation bs for %s", group_name)
-                filename = os.path.join(
-                    bootstrap_dir, "bootstrapped_results_{}.pkl".format(group_name)
-                )  # TODO fix filename
-                if not os.path.exists(filename):
-
-                    def bs_all_par(par_group):
-                        bs_params = par_group[0]
-                        lower_group_df = par_group[1]
-                        return BootstrapSingle(lower_group_df[1], bs_params)
-
-                    def bs_params_eval(bs_params):
-                        temp_df = (
-                            df_group.groupby(group_on)
-                            .progress_apply(lambda df: BootstrapSingle(df, bs_params))
-                            .reset_index()
-                        )
-                        temp_df.drop(
-                            "level_{}".format(len(group_on)), axis=1, inplace=True
-                        )
-                        temp_df["boots"] = bs_params.downsample
-                        return temp_df
-
-                    # par_group = product(bs_params_list, df_group.groupby(group_on))
-                    # with Pool() as p:
-                    #     df_list = p.imap(bs_all_par, par_group)
-
-                    with Pool() as p:
-                        df_list = p.map(bs_params_eval, bs_params_list)
-
-                    res = pd.concat(df_list, ignore_index=True)
-                    res.to_pickle(filename)
-                return filename
-
-        elif type(df[0]) == pd.DataFrame:
-
-            def upper_f(df_group, bs_params_list):
-                group_name = name_fcn(df_group)
-                filename = os.path.join(
-                    bootstrap_dir, "bootstrapped_results_{}.pkl".format(group_name)
-                )  # TODO fix filename
-                if not os.path.exists(filename):
-
-                    def bs_all_par(par_group):
-                        bs_params = par_group[0]
-                        lower_group_df = par_group[1]
-                        return BootstrapSingle(lower_group_df[1], bs_params)
-
-                    def bs_params_eval(bs_params):
-                        temp_df = (
-                            df_group.groupby(group_on)
-                            .progress_apply(lambda df: BootstrapSingle(df, bs_params))
-                            .reset_index()
-                        )
-                        temp_df.drop(
-                            "level_{}".format(len(group_on)), axis=1, inplace=True
-                        )
-                        temp_df["boots"] = bs_params.downsample
-                        return temp_df
-
-                    # par_group = product(bs_params_list, df_group.groupby(group_on))
-                    # with Pool() as p:
-                    #     df_list = p.imap(bs_all_par, par_group)
-
-                    with Pool() as p:
-                        df_list = p.map(bs_params_eval, bs_params_list)
-
-                    res = pd.concat(df_list, ignore_index=True)
-                    res.to_pickle(filename)
-                return filename
-
-    bs_filenames = [upper_f(df_group, bs_params_list) for df_group in df]
+        logger.debug("calling list of upper groups method")
+        sources = df
+        group_names = [name_fcn(source) for source in sources]
+    else:
+        logger.error("Unsupported type as bootstrap input")
+        return []
+
+    bs_filenames = [
+        os.path.join(bootstrap_dir, "bootstrapped_results_{}.pkl".format(group_name))
+        for group_name in group_names
+    ]  # TODO fix filename
+
+    if persistent_pool:
+        _bootstrap_reduce_mem_global(
+            sources,
+            bs_filenames,
+            group_on,
+            bs_params_list,
+            group_major,
+            group_parts,
+            grid_levels,
+            run_length,
+        )
+        return bs_filenames
+
+    for source, group_name, filename in zip(sources, group_names, bs_filenames):
+        if os.path.exists(filename):
+            continue
+        if type(source) == str:
+            logger.info("evaluation bs for %s", group_name)
+            df_group = pd.read_pickle(source)
+        else:
+            df_group = source
+        res = _bootstrap_upper_group(
+            df_group, group_on, bs_params_list, group_major, shared_memory, grid_levels
+        )
+        df_utils.save_results(res, filename, group_on, "boots", run_length)
     return bs_filenames
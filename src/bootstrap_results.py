@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+
+import names
+
+bounds = ["center", "lower", "upper"]  # Last axis of BootstrapResults.values
+
+
+def metric_columns(metric):
+    """
+    Names of the center, lower and upper confidence interval columns of a metric
+    """
+    return (
+        names.param2filename({"Key": metric}, ""),
+        names.param2filename({"Key": metric, "ConfInt": "lower"}, ""),
+        names.param2filename({"Key": metric, "ConfInt": "upper"}, ""),
+    )
+
+
+class BootstrapResults:
+    """
+    Bootstrap results as a dense (group, level, metric, bound) array.
+
+    The level axis holds the downsample levels of the bootstrap (or the resource values
+    after interpolation) and the bound axis the center, lower and upper confidence
+    interval values of each metric. Groups do not need to have every level: valid marks
+    the (group, level) entries that exist.
+
+    Attributes
+    ----------
+    keys : pd.DataFrame
+        One row per group with the group columns and the columns that are constant
+        within a group (e.g., keep_cols)
+    group_on : list[str]
+        Columns of keys that identify a group
+    levels : np.array
+        Sorted values of the level axis
+    level_name : str
+        Column name of the level axis ('boots' or 'resource')
+    metrics : list[str]
+        Metric names, e.g. 'PerfRatio'
+    values : np.array
+        (group, level, metric, bound) float array
+    valid : np.array
+        (group, level) boolean array of the entries that exist
+    extra : dict
+        (group, level) arrays of the other numeric columns, by name
+
+    Methods
+    -------
+    __init__(keys, group_on, levels, level_name, metrics, values, valid, extra=None)
+        Constructor for BootstrapResults class
+    from_frame(df, group_on, level_name='boots')
+        Build from a long frame of bootstrap results
+    ngroups()
+        Number of groups
+    metric(name)
+        (group, level, bound) view of the values of a metric
+    take_groups(index)
+        Results of a subset of groups
+    level_range(lower=None, upper=None)
+        Results of the levels in [lower, upper]
+    to_frame()
+        Long frame with one row per valid (group, level), as returned by Bootstrap
+    """
+
+    def __init__(
+        self, keys, group_on, levels, level_name, metrics, values, valid, extra=None
+    ):
+        self.keys = keys.reset_index(drop=True)
+        self.group_on = list(group_on)
+        self.levels = np.asarray(levels)
+        self.level_name = level_name
+        self.metrics = list(metrics)
+        self.values = values
+        self.valid = valid
+        self.extra = {} if extra is None else extra
+
+    @classmethod
+    def from_frame(cls, df, group_on, level_name="boots"):
+        """
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Bootstrap results with group_on, level_name and the Key=/ConfInt= columns
+            of each metric
+        group_on : list[str]
+            Columns that identify a group
+        level_name : str
+            Column of the levels
+
+        Returns
+        -------
+        BootstrapResults
+        """
+        group_on = list(group_on)
+        df = df.reset_index(drop=True)
+        codes = df.groupby(group_on, sort=True).ngroup().values
+        ngroups = codes.max() + 1 if len(codes) else 0
+        levels = np.unique(df[level_name].values)
+        level_idx = np.searchsorted(levels, df[level_name].values)
+
+        metrics = []
+        for col in df.columns:
+            if not str(col).startswith("Key="):
+                continue
+            metric = col[len("Key=") :]
+            if all(c in df.columns for c in metric_columns(metric)):
+                metrics.append(metric)
+        metric_cols = [c for metric in metrics for c in metric_columns(metric)]
+
+        values = np.full((ngroups, len(levels), len(metrics), len(bounds)), np.nan)
+        for m, metric in enumerate(metrics):
+            for b, col in enumerate(metric_columns(metric)):
+                values[codes, level_idx, m, b] = df[col].values
+        valid = np.zeros((ngroups, len(levels)), dtype=bool)
+        valid[codes, level_idx] = True
+
+        first_rows = np.zeros(ngroups, dtype=int)
+        first_rows[codes[::-1]] = np.arange(len(df))[::-1]
+        key_cols = list(group_on)
+        extra = {}
+        others = [
+            col
+            for col in df.columns
+            if col not in group_on and col != level_name and col not in metric_cols
+        ]
+        if len(others) > 0:
+            constant = df.groupby(codes)[others].nunique(dropna=False).max() <= 1
+        for col in others:
+            if constant[col]:
+                key_cols.append(col)
+            elif np.issubdtype(df[col].dtype, np.number):
+                extra[col] = np.zeros((ngroups, len(levels)), dtype=df[col].dtype)
+                extra[col][codes, level_idx] = df[col].values
+            else:
+                raise ValueError(
+                    "Column {} varies within groups and is not numeric".format(col)
+                )
+        keys = df[key_cols].iloc[first_rows]
+        return cls(keys, group_on, levels, level_name, metrics, values, valid, extra)
+
+    def ngroups(self):
+        return len(self.keys)
+
+    def metric(self, name):
+        return self.values[:, :, self.metrics.index(name)]
+
+    def take_groups(self, index):
+        """
+        Parameters
+        ----------
+        index : slice, array of int or boolean mask
+            Groups to keep, by position in keys
+
+        Returns
+        -------
+        BootstrapResults
+        """
+        if isinstance(index, slice):
+            index = np.arange(self.ngroups())[index]
+        return BootstrapResults(
+            self.keys.iloc[index],
+            self.group_on,
+            self.levels,
+            self.level_name,
+            self.metrics,
+            self.values[index],
+            self.valid[index],
+            {col: values[index] for col, values in self.extra.items()},
+        )
+
+    def level_range(self, lower=None, upper=None):
+        """
+        Parameters
+        ----------
+        lower, upper : float, optional
+            Bounds of the levels to keep. The default is no bound.
+
+        Returns
+        -------
+        BootstrapResults
+        """
+        start = 0 if lower is None else np.searchsorted(self.levels, lower, "left")
+        stop = (
+            len(self.levels)
+            if upper is None
+            else np.searchsorted(self.levels, upper, "right")
+        )
+        index = slice(start, stop)
+        return BootstrapResults(
+            self.keys,
+            self.group_on,
+            self.levels[index],
+            self.level_name,
+            self.metrics,
+            self.values[:, index],
+            self.valid[:, index],
+            {col: values[:, index] for col, values in self.extra.items()},
+        )
+
+    def to_frame(self):
+        """
+        Returns
+        -------
+        pd.DataFrame
+            One row per valid (group, level), ordered by group and level, with the
+            columns of keys, the level column, the metric columns and the extra columns
+        """
+        g_idx, l_idx = np.nonzero(self.valid)
+        df = self.keys.iloc[g_idx].reset_index(drop=True)
+        df[self.level_name] = self.levels[l_idx]
+        columns = {}
+        for m, metric in enumerate(self.metrics):
+            for b, col in enumerate(metric_columns(metric)):
+                columns[col] = self.values[g_idx, l_idx, m, b]
+        for col, values in self.extra.items():
+            columns[col] = values[g_idx, l_idx]
+        return pd.concat([df, pd.DataFrame(columns)], axis=1)
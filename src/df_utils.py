@@ -3,6 +3,8 @@ from multiprocess import Pool
 import os
 import logging
 import pandas as pd
+import pickle
+import tempfile
 import names
 import numpy as np
 
@@ -140,7 +142,37 @@ def eval_cumm(df, group_on, resource_col, response_col, opt_sense):
     return cumm_df
 
 
-def read_exp_raw(exp_raw_dir, name_params=[]):
+def compress_counts(df, outcome_cols, count_col="count"):
+    """
+    Compress raw data to one row per distinct outcome with the number of reads.
+
+    Solvers that return a small set of distinct outcomes over many reads are compressed
+    to (outcome, count) rows, which the bootstrap takes as agg=count_col.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe with one row per read (or already compressed with count_col)
+    outcome_cols : list[str]
+        Columns that define a distinct outcome, e.g. parameters, instance, response and
+        resource columns. Other columns are dropped.
+    count_col : str
+        Name of the count column. Existing counts in count_col are summed.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Dataframe with one row per distinct outcome
+    """
+    grouped = df.groupby(outcome_cols, sort=False, dropna=False)
+    if count_col in df.columns:
+        counts = grouped[count_col].sum()
+    else:
+        counts = grouped.size()
+    return counts.reset_index(name=count_col)
+
+
+def read_exp_raw(exp_raw_dir, name_params=[], outcome_cols=None, count_col="count"):
     """
     Generates a combined dataframe of all experiments in exp_raw_dir
 
@@ -150,6 +182,11 @@ def read_exp_raw(exp_raw_dir, name_params=[]):
         directory of raw data files, parameter names that should be extracted from filename
     name_params : list
         list of parameter names
+    outcome_cols : list, optional
+        If given, each file is compressed with compress_counts on these columns (after
+        expanding name_params) as it is read
+    count_col : str
+        Name of the count column of compressed data
 
 
     Returns
@@ -167,6 +204,8 @@ def read_exp_raw(exp_raw_dir, name_params=[]):
             params_dict = names.filename2param(os.path.basename(f))
             for p in name_params:
                 temp_df[p] = params_dict[p]
+        if outcome_cols is not None:
+            temp_df = compress_counts(temp_df, outcome_cols, count_col)
         df_list.append(temp_df)
     if len(df_list) == 0:
         raise Exception("No raw data found at: {}".format(exp_raw_dir))
@@ -174,6 +213,249 @@ def read_exp_raw(exp_raw_dir, name_params=[]):
     return df_all
 
 
+def compress_runs(df, group_on, level_col="boots", count_col="run_length"):
+    """
+    Run-length encode the plateaus of results along the level axis.
+
+    Consecutive levels of a group with identical values in every other column (e.g.,
+    once PerfRatio and SuccProb saturate) are stored as a single row holding the first
+    level of the run and the number of levels in count_col. Runs only span levels that
+    follow each other in the sorted levels of df, so they decode exactly with
+    expand_runs, which load_results applies on load.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Bootstrapped or interpolated results. Index levels are stored as columns and
+        restored on decoding.
+    group_on : list[str]
+        Columns that identify a group
+    level_col : str
+        Column of the levels, e.g. 'boots' or 'resource'
+    count_col : str
+        Name of the run length column
+
+    Returns
+    -------
+    df : pd.DataFrame
+        One row per run, sorted by group and level
+    """
+    index_names = [name for name in df.index.names if name is not None]
+    if len(index_names) > 0:
+        df = df.reset_index()
+    df = df.sort_values(list(group_on) + [level_col], kind="stable")
+    df = df.reset_index(drop=True)
+    levels = np.unique(df[level_col].values)
+    position = np.searchsorted(levels, df[level_col].values)
+    codes = df.groupby(list(group_on), sort=False).ngroup().values
+
+    same = np.zeros(len(df), dtype=bool)
+    same[1:] = (codes[1:] == codes[:-1]) & (position[1:] == position[:-1] + 1)
+    for col in df.columns:
+        if col == level_col or col in group_on:
+            continue
+        values = df[col].values
+        equal = values[1:] == values[:-1]
+        equal |= pd.isna(values[1:]) & pd.isna(values[:-1])
+        same[1:] &= equal
+    starts = np.flatnonzero(~same)
+
+    runs = df.iloc[starts].reset_index(drop=True)
+    runs[count_col] = np.diff(np.append(starts, len(df)))
+    runs.attrs["run_length"] = {
+        "level_col": level_col,
+        "count_col": count_col,
+        "levels": levels,
+        "index": index_names,
+    }
+    return runs
+
+
+def is_run_encoded(df):
+    return "run_length" in df.attrs
+
+
+def expand_runs(df, endpoints=False):
+    """
+    Decode run-length encoded results (see compress_runs). Other frames are returned
+    unchanged.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Results, possibly run-length encoded
+    endpoints : bool
+        Only expand the first and last level of each run. Linear interpolation along
+        the levels is the same as on the full results, as values are constant in a run.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Decoded results
+    """
+    if not is_run_encoded(df):
+        return df
+    info = df.attrs["run_length"]
+    counts = df[info["count_col"]].values
+    start = np.searchsorted(info["levels"], df[info["level_col"]].values)
+    nrows = np.minimum(counts, 2) if endpoints else counts
+    rows = np.repeat(np.arange(len(df)), nrows)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(nrows) - nrows, nrows)
+    if endpoints:
+        offsets = offsets * (counts[rows] - 1)  # 0 or the last level of the run
+
+    out = df.iloc[rows].drop(columns=info["count_col"]).reset_index(drop=True)
+    out[info["level_col"]] = info["levels"][start[rows] + offsets]
+    out.attrs = {k: v for k, v in df.attrs.items() if k != "run_length"}
+    if len(info["index"]) > 0:
+        out = out.set_index(info["index"])
+    return out
+
+
+def save_results(df, filename, group_on, level_col="boots", run_length=False):
+    """
+    Pickle results, run-length encoded along level_col if run_length
+    """
+    if run_length:
+        df = compress_runs(df, group_on, level_col)
+    df.to_pickle(filename)
+
+
+def load_results(filename):
+    """
+    Read pickled results, decoding them if they are run-length encoded
+    """
+    return expand_runs(pd.read_pickle(filename))
+
+
+def frame_dtypes(df):
+    """
+    Column dtypes of df that concat_frames can allocate (extension dtypes become object)
+    """
+    return {
+        col: dtype if isinstance(dtype, np.dtype) else np.dtype(object)
+        for col, dtype in df.dtypes.items()
+    }
+
+
+def _concat_dtype(dtypes, missing):
+    if missing:
+        dtypes = dtypes + [np.dtype(float)]  # Filled with NaN
+    if all(dtype == dtypes[0] for dtype in dtypes):
+        return dtypes[0]
+    if all(dtype.kind in "iuf" for dtype in dtypes):
+        return np.result_type(*dtypes)
+    return np.dtype(object)
+
+
+def concat_frames(frames, nrows, dtypes):
+    """
+    Concatenate DataFrames while holding at most one of them besides the result.
+
+    The columns of the result are allocated from the row counts and dtypes of the
+    frames, which are then consumed one at a time (e.g., read from disk).
+
+    Parameters
+    ----------
+    frames : iterable of pd.DataFrame
+        Frames to concatenate, consumed in order
+    nrows : list[int]
+        Number of rows of each frame
+    dtypes : list[dict]
+        Column dtypes of each frame (see frame_dtypes)
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Concatenation of the frames, with a default index. Columns missing from a
+        frame are NaN in its rows.
+    """
+    total = sum(nrows)
+    column_names = list(
+        dict.fromkeys(col for d, n in zip(dtypes, nrows) if n for col in d)
+    )
+    if len(column_names) == 0:
+        return pd.DataFrame()
+    columns = {}
+    for col in column_names:
+        col_dtypes = [d[col] for d, n in zip(dtypes, nrows) if n and col in d]
+        missing = len(col_dtypes) < sum(1 for n in nrows if n)
+        columns[col] = np.empty(total, dtype=_concat_dtype(col_dtypes, missing))
+    start = 0
+    for df, n in zip(frames, nrows):
+        if n == 0:
+            continue
+        for col, values in columns.items():
+            if col in df.columns:
+                values[start : start + n] = df[col].values
+            else:
+                values[start : start + n] = np.nan
+        start += n
+        del df
+    return pd.DataFrame(columns, copy=False)
+
+
+class FrameSpool:
+    """
+    Append-only spool of DataFrames on disk.
+
+    Frames are pickled to a (temporary) file as they are produced, e.g. as pool results
+    arrive, and read back as a single DataFrame with concat_frames, so only one frame
+    besides the result is held in memory.
+
+    Attributes
+    ----------
+    file : file object
+        Binary file the frames are written to
+    records : dict
+        (offset, rows, dtypes) of each frame, by position
+
+    Methods
+    -------
+    __init__(file=None)
+        Spool to file, or to a new temporary file
+    append(df, position=None)
+        Write df, at position in the output (the default appends it last)
+    frames()
+        Frames in position order
+    to_frame()
+        Concatenation of every frame
+    close()
+        Close the file
+    """
+
+    def __init__(self, file=None):
+        self.file = tempfile.TemporaryFile() if file is None else file
+        self.records = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, df, position=None):
+        if position is None:
+            position = len(self.records)
+        self.file.seek(0, os.SEEK_END)
+        self.records[position] = (self.file.tell(), len(df), frame_dtypes(df))
+        pickle.dump(df, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def frames(self):
+        for position in sorted(self.records):
+            self.file.seek(self.records[position][0])
+            yield pickle.load(self.file)
+
+    def to_frame(self):
+        records = [self.records[position] for position in sorted(self.records)]
+        return concat_frames(
+            self.frames(), [r[1] for r in records], [r[2] for r in records]
+        )
+
+    def close(self):
+        self.file.close()
+
+
 def parameter_set(df, param_names):
     """
     Obtain the list of parameter settings in columns param_names from a dataframe and create 'params' column in it
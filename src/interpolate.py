@@ -7,6 +7,9 @@ from typing import Callable
 import itertools
 from utils_ws import *
 
+from bootstrap_results import BootstrapResults
+import df_utils
+
 tqdm.pandas()
 
 default_ninterp = 100
@@ -139,13 +142,88 @@ def InterpolateSingle(
     return df_out
 
 
+def InterpolateResults(results: BootstrapResults, interp_params: InterpolationParameters):
+    """
+    Interpolates BootstrapResults onto the resource values, group by group.
+
+    Works like InterpolateSingle on the arrays of the results: the resource of every
+    (group, level) is computed from a frame of the group keys and levels only, and the
+    metric bounds and extra columns are interpolated without building frames.
+
+    Parameters
+    ----------
+    results : BootstrapResults
+        Results to interpolate.
+    interp_params : InterpolationParameters
+        Parameters for interpolation.
+
+    Returns
+    -------
+    BootstrapResults
+        Interpolated results, with a 'resource' level axis. The former levels are kept
+        as an extra column.
+    """
+    g_idx, l_idx = np.nonzero(results.valid)
+    level_df = results.keys.iloc[g_idx].reset_index(drop=True)
+    level_df[results.level_name] = results.levels[l_idx]
+    generateResourceColumn(level_df, interp_params)
+    resources = np.full(results.valid.shape, np.nan)
+    resources[g_idx, l_idx] = level_df["resource"].values
+    resource_values = interp_params.resource_values
+
+    ngroups, nlevels = results.valid.shape
+    extra = {results.level_name: np.broadcast_to(results.levels, (ngroups, nlevels))}
+    extra.update(results.extra)
+    values = np.full((ngroups, len(resource_values)) + results.values.shape[2:], np.nan)
+    valid = np.zeros((ngroups, len(resource_values)), dtype=bool)
+    extra_out = {col: np.full(valid.shape, np.nan) for col in extra}
+    for g in range(ngroups):
+        levels = np.flatnonzero(results.valid[g])
+        if len(levels) == 0:
+            continue
+        x = resources[g, levels]
+        x, first = np.unique(x, return_index=True)
+        if len(x) < len(levels):
+            warn_str = "Dataframe has duplicate resources. Dropping duplicates, but consider re-running bootstrap"
+            warnings.warn(warn_str)
+        levels = levels[first]
+        in_range = (resource_values <= take_closest(resource_values, x.max())) & (
+            resource_values >= take_closest(resource_values, x.min())
+        )
+        valid[g] = in_range
+        interpolate_resource = resource_values[in_range]
+
+        y = results.values[g, levels].reshape(len(levels), -1)
+        interpolated = np.empty((len(interpolate_resource), y.shape[1]))
+        for j in range(y.shape[1]):
+            interpolated[:, j] = np.interp(interpolate_resource, x, y[:, j], left=np.nan)
+        values[g, in_range] = interpolated.reshape(
+            (len(interpolate_resource),) + results.values.shape[2:]
+        )
+        for col, col_values in extra.items():
+            extra_out[col][g, in_range] = np.interp(
+                interpolate_resource, x, col_values[g, levels], left=np.nan
+            )
+
+    return BootstrapResults(
+        results.keys,
+        results.group_on,
+        resource_values,
+        "resource",
+        results.metrics,
+        values,
+        valid,
+        extra_out,
+    )
+
+
 def Interpolate(df: pd.DataFrame, interp_params: InterpolationParameters, group_on):
     """
     Complete interpolation function to include preparation, resource columns and actual interpolation.
 
     Parameters
     ----------
-    df : pd.DataFrame
+    df : pd.DataFrame or BootstrapResults
         Dataframe to interpolate.
     interp_params : InterpolationParameters
         Parameters for interpolation.
@@ -155,8 +233,11 @@ def Interpolate(df: pd.DataFrame, interp_params: InterpolationParameters, group_
     Returns
     -------
     pd.DataFrame
-        Interpolated dataframe.
+        Interpolated dataframe. BootstrapResults are interpolated with
+        InterpolateResults and returned as BootstrapResults.
     """
+    if isinstance(df, BootstrapResults):
+        return InterpolateResults(df, interp_params)
     generateResourceColumn(df, interp_params)
 
     def dfInterp(df):
@@ -175,7 +256,9 @@ def Interpolate_reduce_mem(
     Parameters
     ----------
     df_list : list[str]
-        list of bootstrapped results to interpolate on
+        list of bootstrapped results (pickled frames or BootstrapResults) to
+        interpolate on. Run-length encoded frames (see df_utils.compress_runs) are
+        interpolated from the endpoints of their runs.
     interp_params : InterpolationParameters
         Parameters for interpolation.
     group_on : str
@@ -189,6 +272,13 @@ def Interpolate_reduce_mem(
     df_interp_list = []
     for df_name in df_list:
         df = pd.read_pickle(df_name)
+        if isinstance(df, BootstrapResults):
+            df_interp_list.append(InterpolateResults(df, interp_params).to_frame())
+            continue
+        # Resource values from the data need every level, log spaced ones only the range
+        df = df_utils.expand_runs(
+            df, endpoints=interp_params.resource_value_type != "data"
+        )
         generateResourceColumn(df, interp_params)
         temp_df_interp = df.groupby(group_on).progress_apply(
             lambda df: InterpolateSingle(df, interp_params, group_on),
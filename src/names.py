@@ -17,6 +17,7 @@ class paths:
             if not os.path.exists(path):
                 os.makedirs(path)
         self.bootstrap = os.path.join(self.checkpoints, "bootstrapped_results.pkl")
+        self.race_manifest = os.path.join(self.checkpoints, "race_manifest.json")
         self.interpolate = os.path.join(self.checkpoints, "interpolated_results.pkl")
         self.training_stats = os.path.join(self.checkpoints, "training_stats.pkl")
         self.testing_stats = os.path.join(self.checkpoints, "testing_stats.pkl")
@@ -8,6 +8,7 @@ from utils_ws import *
 
 import stats
 import names
+from seeding import stream
 
 
 @dataclass
@@ -33,6 +34,10 @@ class RandomSearchParameters:
         Indicates the response column
     stat_measure : stats.StatsMeasure
         How the experimental results should be aggregated over experiments
+    seed : int
+        Root seed of the experiments. Each experiment samples from its own stream, keyed
+        by its exploration parameters and number (see seeding.stream). None uses the
+        global NumPy random state.
     """
 
     budgets: list = field(
@@ -49,6 +54,7 @@ class RandomSearchParameters:
     key: str = "PerfRatio"
     restrict: str = str()
     stat_measure: stats.StatsMeasure = stats.Mean()
+    seed: int = None
 
 
 def prepare_search(stats_df: pd.DataFrame, rsParams: RandomSearchParameters):
@@ -123,6 +129,7 @@ def single_experiment(
     budget: float,
     explore_frac: float,
     tau: int,
+    experiment: int = 0,
 ):
     """
     Runs experiment on df_stats for a single setting of the exploration parameters (budget, explore_frac, and tau)
@@ -138,6 +145,8 @@ def single_experiment(
         Fraction of budget to use exploring
     tau : int
         Timesteps to use at each exploration step
+    experiment : int
+        Number of the experiment, which selects its random stream when rsParams.seed is set
 
     Returns
     -------
@@ -155,7 +164,14 @@ def single_experiment(
         df_tau = df_stats[
             (df_stats["resource"] == tau) & (df_stats[rsParams.restrict] == True)
         ].copy()
-    df_tau = df_tau.sample(n=int(explore_budget / tau), replace=True)
+    rng = stream(
+        rsParams.seed, "random_exploration", budget, explore_frac, tau, experiment
+    )
+    df_tau = df_tau.sample(
+        n=int(explore_budget / tau),
+        replace=True,
+        random_state=None if rsParams.seed is None else rng,
+    )
     
     if rsParams.optimization_dir == 1:
         best_pars = df_tau.loc[[df_tau[rsParams.key].idxmax()]]
@@ -233,7 +249,9 @@ def run_experiments(df_stats: pd.DataFrame, rsParams: RandomSearchParameters):
         total=total,
     )
     for budget, explore_frac, tau, experiment in pbar:
-        df_experiment = single_experiment(df_stats, rsParams, budget, explore_frac, tau)
+        df_experiment = single_experiment(
+            df_stats, rsParams, budget, explore_frac, tau, experiment
+        )
         if df_experiment is None:
             continue
         df_experiment["Experiment"] = experiment
@@ -281,7 +299,7 @@ def apply_allocations(
         explore_frac = float(explore_budget) / float(budget)
         for experiment in range(rsParams.Nexperiments):
             df_experiment = single_experiment(
-                df_stats, rsParams, budget, explore_frac, tau
+                df_stats, rsParams, budget, explore_frac, tau, experiment
             )
             if df_experiment is None:
                 continue
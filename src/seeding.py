@@ -0,0 +1,62 @@
+import hashlib
+
+import numpy as np
+
+
+def _normalize(key):
+    """
+    Canonical form of a stream key: NumPy scalars become Python scalars, arrays are
+    hashed and 1-tuples are unwrapped (pandas reports single-column group keys either
+    way).
+    """
+    if isinstance(key, (tuple, list)):
+        key = tuple(_normalize(k) for k in key)
+        return key[0] if len(key) == 1 else key
+    if isinstance(key, np.ndarray):
+        return hashlib.sha256(np.ascontiguousarray(key).tobytes()).hexdigest()
+    if isinstance(key, np.generic):
+        return key.item()
+    return key
+
+
+def key_hash(key):
+    """
+    SHA-256 digest of a key in its canonical form, which does not depend on the process
+    (unlike hash()). Tuples, NumPy scalars and arrays are accepted.
+    """
+    return hashlib.sha256(repr(_normalize(key)).encode()).digest()
+
+
+def _key_words(key):
+    """
+    Spawn key of a stream key: its hash as 32-bit words
+    """
+    return tuple(int(w) for w in np.frombuffer(key_hash(key), dtype=np.uint32))
+
+
+def stream(seed, *key):
+    """
+    Random stream of a piece of work, identified by key.
+
+    The stream is the child of np.random.SeedSequence(seed) with a spawn key derived
+    from key (e.g., the group and downsample level of a bootstrap), so it only depends
+    on the seed and on what is computed - not on the process, the pool size or the
+    order in which the work is scheduled.
+
+    Parameters
+    ----------
+    seed : int or None
+        Root seed. None uses the global NumPy random state.
+    key :
+        Identity of the work. Tuples, NumPy scalars and arrays are accepted.
+
+    Returns
+    -------
+    np.random.RandomState or module
+        Random state with the legacy np.random API (randint, choice, multinomial, ...),
+        or the np.random module if seed is None.
+    """
+    if seed is None:
+        return np.random
+    seed_seq = np.random.SeedSequence(seed, spawn_key=_key_words(key))
+    return np.random.RandomState(np.random.PCG64(seed_seq))
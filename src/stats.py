@@ -8,7 +8,10 @@ from tqdm import tqdm
 from typing import List, Tuple, Union, DefaultDict
 import warnings
 
+from bootstrap_results import BootstrapResults
+import df_utils
 import names
+from seeding import stream
 
 EPSILON = 1e-10
 
@@ -233,11 +236,12 @@ class Percentile(StatsMeasure):
         Computes the confidence intervals of the stats measure Percentile
     """
 
-    def __init__(self, q, nboots, confidence_level: float = 68):
+    def __init__(self, q, nboots, confidence_level: float = 68, seed=None):
         self.q = q
         self.name = "{}Percentile".format(q)
         self.nboots = int(nboots)
         self.confidence_level = confidence_level
+        self.seed = seed  # Bootstrap streams are keyed by the data (see seeding.stream)
 
     def __call__(self, base: pd.DataFrame):
         return base.quantile(self.q / 100.0)
@@ -282,9 +286,12 @@ class Percentile(StatsMeasure):
         
         """
         cent = base.quantile(self.q / 100.0)
+        rng = stream(
+            self.seed, "percentile", self.q, base.values, lower.values, upper.values
+        )
         boot_dist = []
         for i in range(self.nboots):
-            resampler = np.random.randint(
+            resampler = rng.randint(
                 0, len(base), len(base), dtype=np.intp
             )  # intp is indexing dtype
             # Check the following, in original code sample_ci_lower = x[key_string + '_conf_interval_upper'].values.take(resampler, axis=0)
@@ -293,7 +300,7 @@ class Percentile(StatsMeasure):
             sample_ci_upper = upper.values.take(resampler, axis=0)
             sample_ci_lower = lower.values.take(resampler, axis=0)
             sample_std = (sample_ci_upper - sample_ci_lower) / 2.0
-            sample_error = np.random.normal(0, sample_std, len(sample))
+            sample_error = rng.normal(0, sample_std, len(sample))
             boot_dist.append(pd.Series(sample + sample_error).quantile(self.q / 100.0))
         p = 0.50 - self.confidence_level / (2 * 100.0), 0.50 + self.confidence_level / (
             2.0 * 100.0
@@ -526,14 +533,158 @@ def applyBounds(df: pd.DataFrame, stat_params: StatsParameters):
     return
 
 
+def StatsResults(results: BootstrapResults, stats_params: StatsParameters, group_on):
+    """
+    Compute statistics of BootstrapResults, like Stats on their frame
+
+    The metric bounds of each group are read from the results array, so no frame of the
+    results is built.
+
+    Parameters
+    ----------
+    results: BootstrapResults
+        Results with the metric to be analyzed
+    stats_params: StatsParameters
+        Parameters for the statistics
+    group_on: list
+        List of columns to group on, among the columns of results.keys and its level
+        column (e.g., parameters and 'resource')
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe with the statistics
+    """
+    key_cols = [col for col in group_on if col != results.level_name]
+    per_level = results.level_name in group_on
+    if len(key_cols) > 0:
+        codes = results.keys.groupby(key_cols, sort=True).ngroup().values
+    else:
+        codes = np.zeros(results.ngroups(), dtype=int)
+    metric_idx = [results.metrics.index(key) for key in stats_params.metrics]
+
+    rows = []
+    for code in range(codes.max() + 1 if len(codes) else 0):
+        groups = np.flatnonzero(codes == code)
+        key_row = results.keys.iloc[groups[0]]
+        if per_level:
+            selections = [
+                (results.levels[l], np.s_[groups, l], results.valid[groups, l])
+                for l in range(len(results.levels))
+            ]
+        else:
+            selections = [(None, np.s_[groups], results.valid[groups])]
+        for level, index, valid in selections:
+            if valid.sum() <= 1:
+                continue
+            row = {
+                col: level if col == results.level_name else key_row[col]
+                for col in group_on
+            }
+            selected = results.values[index][valid]  # (rows, metric, bound)
+            for sm in stats_params.stats_measures:
+                for key, m in zip(stats_params.metrics, metric_idx):
+                    bounds = selected[:, m]
+                    base, CIlower, CIupper = sm.ConfInts(
+                        pd.Series(bounds[:, 0]),
+                        pd.Series(bounds[:, 1]),
+                        pd.Series(bounds[:, 2]),
+                    )
+                    metric_basename = names.param2filename(
+                        {"Key": key, "Metric": sm.name}, ""
+                    )
+                    metric_CIlower_name = names.param2filename(
+                        {"Key": key, "Metric": sm.name, "ConfInt": "lower"}, ""
+                    )
+                    metric_CIupper_name = names.param2filename(
+                        {"Key": key, "Metric": sm.name, "ConfInt": "upper"}, ""
+                    )
+                    row[metric_basename] = base
+                    row[metric_CIlower_name] = CIlower
+                    row[metric_CIupper_name] = CIupper
+                    row["count"] = len(bounds)
+            rows.append(row)
+
+    df_stats = pd.DataFrame(rows)
+    applyBounds(df_stats, stats_params)
+    return df_stats
+
+
+def StatsRuns(df: pd.DataFrame, stats_params: StatsParameters, group_on):
+    """
+    Compute statistics of run-length encoded results (see df_utils.compress_runs), like
+    Stats on the decoded frame
+
+    The runs covering a level only change where a run starts or ends, so the statistics
+    of a group are computed once per such breakpoint and repeated over the levels up to
+    the next one.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        Run-length encoded results
+    stats_params: StatsParameters
+        Parameters for the statistics
+    group_on: list
+        List of columns to group on
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe with the statistics
+    """
+    info = df.attrs["run_length"]
+    level_col = info["level_col"]
+    if level_col not in group_on:
+        return Stats(df_utils.expand_runs(df), stats_params, group_on)
+    levels = np.asarray(info["levels"])
+    key_cols = [col for col in group_on if col != level_col]
+    df = df.reset_index(drop=True)
+    start = np.searchsorted(levels, df[level_col].values)
+    stop = start + df[info["count_col"]].values
+
+    if len(key_cols) > 0:
+        grouped = df.groupby(key_cols, sort=True)
+    else:
+        grouped = [((), df)]
+    df_list = []
+    for key, df_key in grouped:
+        run_start = start[df_key.index.values]
+        run_stop = stop[df_key.index.values]
+        breaks = np.unique(np.concatenate([run_start, run_stop]))
+        for begin, end in zip(breaks[:-1], breaks[1:]):
+            active = (run_start <= begin) & (begin < run_stop)
+            if active.sum() <= 1:
+                continue
+            df_stats_single = StatsSingle(df_key[active], stats_params)
+            df_stats_single = df_stats_single.loc[
+                df_stats_single.index.repeat(end - begin)
+            ].reset_index(drop=True)
+            for col, val in zip(key_cols, key):
+                df_stats_single[col] = val
+            df_stats_single[level_col] = levels[begin:end]
+            df_list.append(df_stats_single)
+
+    if len(df_list) == 0:
+        return pd.DataFrame()
+    df_stats = pd.concat(df_list, ignore_index=True)
+    df_stats = df_stats[
+        group_on + [col for col in df_stats.columns if col not in group_on]
+    ]
+    df_stats = df_stats.sort_values(group_on, kind="stable", ignore_index=True)
+    applyBounds(df_stats, stats_params)
+    return df_stats
+
+
 def Stats(df: pd.DataFrame, stats_params: StatsParameters, group_on):
     """
     Compute statistics for a dataframe
 
     Parameters
     ----------
-    df: pd.DataFrame
-        Dataframe with the metric to be analyzed
+    df: pd.DataFrame or BootstrapResults
+        Dataframe with the metric to be analyzed. BootstrapResults are passed to
+        StatsResults and run-length encoded frames to StatsRuns.
     stats_params: StatsParameters
         Parameters for the statistics
     group_on: list
@@ -544,6 +695,10 @@ def Stats(df: pd.DataFrame, stats_params: StatsParameters, group_on):
     pd.DataFrame
         Dataframe with the statistics
     """
+    if isinstance(df, BootstrapResults):
+        return StatsResults(df, stats_params, group_on)
+    if df_utils.is_run_encoded(df):
+        return StatsRuns(df, stats_params, group_on)
 
     def dfSS(df):
         return StatsSingle(df, stats_params)
@@ -1217,6 +1217,11 @@ class stochastic_benchmark:
         Whether to reduce memory usage by converting columns to appropriate types
     smooth : bool
         Whether to smooth the response values
+    seed : int
+        Root seed of the train/test split. None uses the global NumPy random state.
+    run_length : bool
+        Whether bootstrapped and interpolated checkpoints are stored run-length encoded
+        along boots/resource (see df_utils.compress_runs). They are decoded on load.
     bs_results : pd.DataFrame
         Dataframe of bootstrap results
     interp_results : pd.DataFrame
@@ -1236,6 +1241,10 @@ class stochastic_benchmark:
         Run bootstrap
     set_Bootstrap(bs_results)
         Set bootstrap results
+    ingest(batch_df, bsParams_iter)
+        Update the bootstrap results with a batch of raw results
+    save_checkpoint(df, filename, level_col)
+        Write bootstrapped or interpolated results
     run_Interpolate(iParams)
         Run interpolation
     run_Stats(stat_params, train_test_split)
@@ -1272,6 +1281,8 @@ class stochastic_benchmark:
         recover=True,
         reduce_mem=True,
         smooth=True,
+        seed=None,
+        run_length=False,
     ):
         # Needed at initialization (for everything)
         self.here = names.paths(here)
@@ -1281,12 +1292,15 @@ class stochastic_benchmark:
         self.recover = recover
         self.reduce_mem = reduce_mem
         self.smooth = smooth
+        self.seed = seed
+        self.run_length = run_length
 
         self.response_key = response_key
         self.response_dir = response_dir
 
         ## Dataframes needed for experiments and baselines
         self.bs_results = None
+        self.online_bootstrap = None
         self.interp_results = None
         self.training_stats = None
         self.testing_stats = None
@@ -1332,7 +1346,47 @@ class stochastic_benchmark:
             self.populate_interp_results()
             # self.populate_bs_results()
 
-    def run_Bootstrap(self, bsParams_iter, group_name_fcn=None):
+    def run_Bootstrap(
+        self,
+        bsParams_iter,
+        group_name_fcn=None,
+        group_major=False,
+        shared_memory=False,
+        persistent_pool=False,
+        grid_levels=None,
+        race=None,
+        progress=False,
+    ):
+        """
+        Runs or recovers the bootstrapped results
+
+        Parameters
+        ----------
+        bsParams_iter : iterator
+            Iterator that yields bootstrap parameters, one per downsample level
+        group_name_fcn : callable, optional
+            Maps raw data filenames to group names, needed for the reduced memory version
+        group_major : bool, optional
+            Resample each group once for all downsample levels, by default False
+        shared_memory : bool, optional
+            Pass the raw data to the bootstrap workers through shared memory, by default False
+        persistent_pool : bool, optional
+            Schedule every raw data file on a single worker pool in the reduced memory
+            version, by default False
+        grid_levels : bootstrap.GridLevels, optional
+            Only bootstrap the downsample levels needed to reach a resource grid, by
+            default None
+        race : bootstrap.RaceParameters, optional
+            Pre-screen the parameter sets with a cheap bootstrap and only fully
+            bootstrap those that are not dominated (see bootstrap.race). The dropped
+            parameter sets are recorded in the race manifest of the checkpoints, and
+            reused by later runs so that resumed progress shards keep the same
+            contenders. Not supported by the reduced memory version, by default None
+        progress : bool, optional
+            Write resumable progress shards to the progress directory, so an
+            interrupted run only bootstraps the missing ones (see bootstrap.Bootstrap).
+            Not used by the reduced memory version, by default False
+        """
         if self.bs_results is not None:
             logger.info("Bootstrapped results is already populated: doing nothing.")
             return
@@ -1384,19 +1438,28 @@ class stochastic_benchmark:
                     return
 
                 group_on = self.parameter_names + self.instance_cols
+                if race is not None:
+                    logger.warning(
+                        "Racing is not supported by the reduced memory version: ignoring it."
+                    )
                 self.bs_results = bootstrap.Bootstrap_reduce_mem(
                     self.raw_data,
                     group_on,
                     bsParams_iter,
                     self.here.checkpoints,
                     group_name_fcn,
+                    group_major=group_major,
+                    shared_memory=shared_memory,
+                    persistent_pool=persistent_pool,
+                    grid_levels=grid_levels,
+                    run_length=self.run_length,
                 )
         else:
             if os.path.exists(self.here.bootstrap) and self.recover:
                 logger.info(
                     "All bootstrapped results are already found in checkpoints: reading results."
                 )
-                self.bs_results = pd.read_pickle(self.here.bootstrap)
+                self.bs_results = df_utils.load_results(self.here.bootstrap)
                 return
 
             logger.info("Running bootstrapped results")
@@ -1411,7 +1474,9 @@ class stochastic_benchmark:
                         logger.info(
                             "Raw data missing but bootstrap pickle found: reading results."
                         )
-                        self.bs_results = pd.read_pickle(self.here.bootstrap)
+                        self.bs_results = df_utils.load_results(
+                            self.here.bootstrap
+                        )
                         return
                     raise Exception(
                         "No raw data found at {} and no bootstrap pickle present".format(
@@ -1419,21 +1484,73 @@ class stochastic_benchmark:
                         )
                     )
 
-            progress_dir = os.path.join(self.here.progress, "bootstrap/")
-            if not os.path.exists(progress_dir):
-                os.makedirs(progress_dir)
+            progress_dir = None
+            if progress:
+                progress_dir = os.path.join(self.here.progress, "bootstrap/")
+                if not os.path.exists(progress_dir):
+                    os.makedirs(progress_dir)
+
+            bs_data = self.raw_data
+            if race is not None:
+                bsParams_iter = list(bsParams_iter)
+                bs_data, _ = bootstrap.race(
+                    self.raw_data,
+                    group_on,
+                    bsParams_iter,
+                    race,
+                    manifest=self.here.race_manifest,
+                    group_major=group_major,
+                    shared_memory=shared_memory,
+                    grid_levels=grid_levels,
+                )
 
             self.bs_results = bootstrap.Bootstrap(
-                self.raw_data, group_on, bsParams_iter, progress_dir
+                bs_data,
+                group_on,
+                bsParams_iter,
+                progress_dir,
+                group_major=group_major,
+                shared_memory=shared_memory,
+                grid_levels=grid_levels,
             )
-            self.bs_results.to_pickle(self.here.bootstrap)
+            self.save_checkpoint(self.bs_results, self.here.bootstrap, "boots")
+
+    def ingest(self, batch_df, bsParams_iter=None):
+        """
+        Updates the bootstrapped results with a new batch of raw results
+
+        Uses a Poisson-weighted online bootstrap (see bootstrap.OnlineBootstrap), so each
+        batch only updates and re-evaluates the groups it contains, at a cost of
+        O((batch + max downsample) * bootstrap_iterations) per group.
+
+        Parameters
+        ----------
+        batch_df : pd.DataFrame
+            New raw results
+        bsParams_iter : iterator, optional
+            Iterator that yields bootstrap parameters, one per downsample level. Needed
+            on the first call if initAll has not set bsParams_iter
+
+        Returns
+        -------
+        pd.DataFrame
+            Bootstrapped results of all ingested data
+        """
+        if self.online_bootstrap is None:
+            if bsParams_iter is None:
+                bsParams_iter = self.bsParams_iter
+            group_on = self.parameter_names + self.instance_cols
+            self.online_bootstrap = bootstrap.OnlineBootstrap(group_on, bsParams_iter)
+        self.online_bootstrap.ingest(batch_df)
+        self.bs_results = self.online_bootstrap.evaluate()
+        return self.bs_results
 
     def set_Bootstrap(self, bs_results):
         """
         Sets bootstrap results without doing anything
         """
         if type(bs_results) == str:
-            self.bs_results = pd.read_pickle(bs_results)
+            self.bs_results = df_utils.load_results(bs_results)
         elif type(bs_results) == pd.DataFrame:
             self.bs_results = bs_results
         elif type(bs_results) == list:
@@ -1442,6 +1559,19 @@ class stochastic_benchmark:
             elif type(bs_results[0]) == str:
                 self.bs_results = bs_results
 
+    def save_checkpoint(self, df, filename, level_col):
+        """
+        Writes bootstrapped or interpolated results, run-length encoded along level_col
+        if self.run_length
+        """
+        df_utils.save_results(
+            df,
+            filename,
+            self.parameter_names + self.instance_cols,
+            level_col,
+            self.run_length,
+        )
+
     def run_Interpolate(self, iParams):
         if self.interp_results is not None:
             logger.info("Interpolated results is already populated: doing nothing.")
@@ -1449,7 +1579,7 @@ class stochastic_benchmark:
 
         if os.path.exists(self.here.interpolate) and self.recover:
             logger.info("Interpolated results are found in checkpoints: reading results.")
-            self.interp_results = pd.read_pickle(self.here.interpolate)
+            self.interp_results = df_utils.load_results(self.here.interpolate)
             return
 
         if self.bs_results is None:
@@ -1478,7 +1608,7 @@ class stochastic_benchmark:
         self.interp_results.dropna(subset=[base, CIlower, CIupper], inplace=True)
 
         # self.interp_results = training.split_train_test(self.interp_results, self.instance_cols, self.train_test_split)
-        self.interp_results.to_pickle(self.here.interpolate)
+        self.save_checkpoint(self.interp_results, self.here.interpolate, "resource")
         self.bs_results = None
 
     def run_Stats(self, stat_params, train_test_split=0.5):
@@ -1490,9 +1620,9 @@ class stochastic_benchmark:
 
         if "train" not in self.interp_results.columns:
             self.interp_results = training.split_train_test(
-                self.interp_results, self.instance_cols, train_test_split
+                self.interp_results, self.instance_cols, train_test_split, self.seed
             )
-            self.interp_results.to_pickle(self.here.interpolate)
+            self.save_checkpoint(self.interp_results, self.here.interpolate, "resource")
 
         if self.training_stats is None:
             if os.path.exists(self.here.training_stats) and self.recover:
@@ -1577,12 +1707,17 @@ class stochastic_benchmark:
         """
         if self.interp_results is None:
             if os.path.exists(self.here.interpolate) and self.recover:
-                self.interp_results = pd.read_pickle(self.here.interpolate)
+                self.interp_results = df_utils.load_results(self.here.interpolate)
                 if "train" not in self.interp_results.columns:
                     self.interp_results = training.split_train_test(
-                        self.interp_results, self.instance_cols, self.train_test_split
+                        self.interp_results,
+                        self.instance_cols,
+                        self.train_test_split,
+                        self.seed,
+                    )
+                    self.save_checkpoint(
+                        self.interp_results, self.here.interpolate, "resource"
                     )
-                    self.interp_results.to_pickle(self.here.interpolate)
 
             elif self.bs_results is not None:
                 # print(self.bs_results)
@@ -1613,9 +1748,14 @@ class stochastic_benchmark:
                 )
 
                 self.interp_results = training.split_train_test(
-                    self.interp_results, self.instance_cols, self.train_test_split
+                    self.interp_results,
+                    self.instance_cols,
+                    self.train_test_split,
+                    self.seed,
+                )
+                self.save_checkpoint(
+                    self.interp_results, self.here.interpolate, "resource"
                 )
-                self.interp_results.to_pickle(self.here.interpolate)
                 self.bs_results = None
             else:
                 self.populate_bs_results(self.bsParams_iter, self.group_name_fcn)
@@ -1682,20 +1822,21 @@ class stochastic_benchmark:
         resource_col = bs_params.shared_args["resource_col"]
         response_col = bs_params.shared_args["response_col"]
         agg = bs_params.agg
+        plan = bootstrap.BootstrapPlan(bs_params, group_on=group_on)
 
         def evaluate_single(df_single):
-            bs_params.update_rule(bs_params, df_single)
+            fused = plan.bind(df_single, df_single.name)
             resources = df_single[resource_col].values
             responses = df_single[response_col].values
-            resources = np.repeat(resources, df_single[agg])
-            responses = np.repeat(responses, df_single[agg])
-
-            bs_df = pd.DataFrame()
-            for metric_ref in bs_params.success_metrics:
-                metric = metric_ref(
-                    bs_params.shared_args, bs_params.metric_args[metric_ref.__name__]
-                )
-                metric.evaluate(bs_df, responses, resources)
+            if agg is None:
+                counts = np.ones(len(df_single), dtype=np.int64)
+            else:
+                counts = df_single[agg].values
+            # The data itself is a single count-based resample of all reads
+            stats = success_metrics.CountStats(
+                responses, resources, counts[None, None, :], [counts.sum()]
+            )
+            bs_df = fused.evaluate(stats.boots, None, None, stats=stats)
             for col in bs_params.keep_cols:
                 if col in df_single.columns:
                     val = df_single[col].iloc[0]
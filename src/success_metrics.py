@@ -1,11 +1,808 @@
+from collections import defaultdict
+import functools
+from itertools import product
 import numpy as np
+import pandas as pd
+import warnings
 import names
 import matplotlib.pyplot as plt
 from scipy.special import erfinv
+from scipy.stats import binom
 
 EPSILON = 1e-10
 
 
+def success_threshold(shared_args, gap):
+    """
+    Response value that a read has to beat to count as a success
+
+    Parameters
+    ----------
+    shared_args : dict
+        Shared arguments with 'random_value', 'best_value' and 'response_dir'
+    gap : float
+        Allowed gap (in percent) to the best value
+
+    Returns
+    -------
+    success_thresh : float
+    """
+    random_value = shared_args["random_value"]
+    best_value = shared_args["best_value"]
+    if shared_args["response_dir"] == -1:
+        return random_value - (1.0 - gap / 100.0) * (random_value - best_value)
+    else:  # Maximization
+        return (1.0 - gap / 100.0) * (best_value - random_value) - random_value
+
+
+def success_mask(responses, shared_args, gap):
+    """
+    Boolean mask of the responses that count as a success
+    """
+    success_thresh = success_threshold(shared_args, gap)
+    if shared_args["response_dir"] == -1:
+        return responses < success_thresh
+    else:  # Maximization
+        return responses > success_thresh
+
+
+def success_probability(responses, weights, shared_args, gap):
+    """
+    (Weighted) fraction of the responses that count as a success
+    """
+    mask = success_mask(np.asarray(responses), shared_args, gap)
+    if weights is None:
+        return np.mean(mask)
+    return np.sum(weights * mask) / np.sum(weights)
+
+
+def response_args(args, response_col):
+    """
+    Arguments of a single response column. Entries given as a dict keyed by response
+    column (e.g., {'energy': -1, 'ratio': 1}) take the entry of response_col.
+    """
+    resolved = {
+        k: v[response_col] if isinstance(v, dict) and response_col in v else v
+        for k, v in args.items()
+    }
+    if "response_col" in resolved:
+        resolved["response_col"] = response_col
+    return resolved
+
+
+def success_probabilities(responses, weights, shared_args, gaps):
+    """
+    (Weighted) fraction of the responses that count as a success for every gap.
+
+    The responses are sorted once and the success count of every threshold is read
+    from the cumulative weights with np.searchsorted.
+    """
+    responses = np.asarray(responses, dtype=float)
+    if weights is None:
+        weights = np.ones(len(responses))
+    order = np.argsort(responses, kind="stable")
+    sorted_responses = responses[order]
+    cum = np.concatenate([[0.0], np.cumsum(np.asarray(weights, dtype=float)[order])])
+    thresholds = success_threshold(shared_args, np.asarray(gaps, dtype=float))
+    if shared_args["response_dir"] == -1:  # Responses below the threshold
+        successes = cum[np.searchsorted(sorted_responses, thresholds, side="left")]
+    else:  # Responses above the threshold
+        successes = cum[-1] - cum[np.searchsorted(sorted_responses, thresholds, "right")]
+    return successes / cum[-1]
+
+
+def dirichlet_means(values, weights, boots, iterations, rng=np.random, memory_budget=None):
+    """
+    Bayesian bootstrap means of values for every downsample level.
+
+    The mean of n draws with replacement is replaced by the mean under Dirichlet(n * p)
+    weights over the distinct values (p their empirical probabilities), which has the
+    same expectation and covariance up to a factor n / (n + 1), and no resample is
+    gathered. The Dirichlet weights are normalized gamma draws, and gamma shapes add up,
+    so the levels are nested like the rows of a resample: each level only draws the
+    increment of its shapes over the previous level and keeps the running W @ x and
+    W.sum() of every iteration. At most (iterations, distinct values) gammas are held at
+    once, or fewer with memory_budget.
+
+    Parameters
+    ----------
+    values : np.array
+        Values of the group (e.g., resources)
+    weights : np.array or None
+        Weight of each value (e.g., aggregated counts). Uniform if None
+    boots : np.array
+        Downsample levels (all positive)
+    iterations : int
+        Number of bootstrap iterations
+    rng : np.random.RandomState or module, optional
+        Random state of the group
+    memory_budget : int, optional
+        Approximate memory in bytes of the gammas drawn at once. The iterations are
+        drawn in blocks that fit it. None draws every iteration of a level at once.
+
+    Returns
+    -------
+    np.array
+        (levels, iterations) array of means
+    """
+    support, inverse = np.unique(np.asarray(values, dtype=float), return_inverse=True)
+    probs = np.bincount(inverse.ravel(), weights=weights, minlength=len(support))
+    probs = probs / probs.sum()
+    boots = np.asarray(boots, dtype=float)
+    order = np.argsort(boots, kind="stable")
+    increments = np.diff(boots[order], prepend=0.0)
+
+    size = iterations
+    if memory_budget is not None:
+        size = max(1, int(memory_budget // (np.dtype(float).itemsize * len(support))))
+    means = np.empty((len(boots), iterations))
+    for start in range(0, iterations, size):
+        block = min(size, iterations - start)
+        sums = np.zeros(block)  # Running G @ support
+        totals = np.zeros(block)  # Running G.sum()
+        for j, increment in zip(order, increments):
+            if increment > 0:
+                gammas = rng.standard_gamma(increment * probs, size=(block, len(support)))
+                sums += gammas @ support
+                totals += gammas.sum(axis=-1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[j, start : start + block] = sums / totals
+    return means
+
+
+def sweep(args, keys):
+    """
+    Every combination of the arguments keys, some of which may be given as lists
+    (e.g., several gaps).
+
+    Yields
+    ------
+    values : dict
+        Value of every key for the combination
+    swept : dict
+        Values of the keys given as lists, which qualify the result columns
+    """
+    swept_keys = [k for k in keys if np.ndim(args[k]) > 0]
+    for combination in product(*[np.atleast_1d(args[k]).tolist() for k in keys]):
+        values = dict(zip(keys, combination))
+        yield values, {k: values[k] for k in swept_keys}
+
+
+def metric_names(key, swept=None):
+    """
+    Names of the center, upper and lower confidence interval columns of a metric,
+    qualified by the swept argument values (e.g., Key=SuccProb_gap=1.0)
+    """
+    params = {"Key": key}
+    params.update({} if swept is None else swept)
+    return (
+        names.param2filename(params, ""),
+        names.param2filename(dict(params, ConfInt="upper"), ""),
+        names.param2filename(dict(params, ConfInt="lower"), ""),
+    )
+
+
+def discrete_percentile(values, weights, q):
+    """
+    Percentiles of the discrete distribution with atoms values and probabilities weights
+    """
+    order = np.argsort(values)
+    values = values[order]
+    cdf = np.cumsum(weights[order])
+    idx = np.searchsorted(cdf, np.asarray(q) / 100.0 * cdf[-1], side="left")
+    return values[np.minimum(idx, len(values) - 1)]
+
+
+@functools.lru_cache(maxsize=4096)
+def rtt_table(downsample, s, size=1000):
+    """
+    RTT with unit scale of the success probabilities k/downsample, k = 1, ..., downsample
+
+    Follows RTT.evaluate_single. The table only depends on the downsample level and the
+    target probability s, so it is shared by every group.
+    """
+    probs = np.arange(1, downsample + 1) / downsample
+    probs[-1] = (1 - 1 / 10) / size  # success_probability == 1
+    table = np.log(1.0 - s) / np.log(1 - probs)
+    table.flags.writeable = False
+    return table
+
+
+def best_of_n_distribution(values, weights, boots, opt_sense):
+    """
+    Exact distribution of the best of n draws with replacement, for every n in boots
+
+    With F the (weighted) empirical CDF, the best of n draws is worse than x with
+    probability (1 - F(x))^n, where "worse" follows opt_sense.
+
+    Parameters
+    ----------
+    values : np.array
+        Responses of the group
+    weights : np.array or None
+        Weight of each response (e.g., aggregated counts). Uniform if None
+    boots : np.array
+        Number of draws n for each level
+    opt_sense : int
+        Minimization (-1) or maximization (1)
+
+    Returns
+    -------
+    support : np.array
+        Distinct responses ordered from best to worst
+    pmf : np.array
+        (len(boots), len(support)) array with the probability of each response being the best
+    """
+    values = np.asarray(values)
+    if weights is None:
+        weights = np.ones(len(values))
+    support, inverse = np.unique(values, return_inverse=True)
+    probs = np.bincount(inverse.ravel(), weights=weights, minlength=len(support))
+    probs = probs / probs.sum()
+    if opt_sense != -1:  # Maximization
+        support = support[::-1]
+        probs = probs[::-1]
+
+    tail = np.clip(1.0 - np.cumsum(probs), 0.0, 1.0)
+    tail_pow = np.power(tail[None, :], np.asarray(boots)[:, None])
+    prev_tail_pow = np.concatenate([np.ones((len(tail_pow), 1)), tail_pow[:, :-1]], axis=1)
+    return support, prev_tail_pow - tail_pow
+
+
+class ResampleStats:
+    """
+    Intermediate values of a resample shared by the success metrics.
+
+    Values are computed on first use and cached, so metrics that need the same quantity
+    (e.g., SuccessProb and RTT both need the success counts) only compute it once.
+
+    Attributes
+    ----------
+    responses : np.array
+        (downsample, bootstrap_iterations) array of resampled responses, with a
+        trailing axis of one entry per response column for several responses
+    resources : np.array
+        (downsample, bootstrap_iterations) array of resampled resources, or None if
+        mean_resources is given
+    boots : np.array
+        Downsample levels, level n uses the first n rows of the resample
+    mean_resources : np.array
+        (levels, bootstrap_iterations) mean resource of each resample (e.g., from
+        dirichlet_means). Computed from resources if None
+
+    Methods
+    -------
+    best(opt_sense)
+        Best response of each resample for every level
+    success_prob(shared_args, gap)
+        Success probability of each resample for every level
+    success_probs(shared_args, gaps)
+        Success probability of each resample for every level and every gap
+    mean_resource()
+        Mean resource of each resample for every level
+    level(j)
+        (responses, resources) resample arrays of level j
+    response(j)
+        Stats of response column j of a resample of several responses
+    compact()
+        Drop the resample arrays and keep the cached intermediate values
+    """
+
+    def __init__(self, responses, resources, boots, mean_resources=None):
+        self.responses = responses
+        self.resources = resources
+        self.boots = np.asarray(boots)
+        self._cache = {}
+        if mean_resources is not None:
+            self._cache[("mean_resource",)] = mean_resources
+
+    def _levels(self, values, ufunc, dtype=None):
+        # ufunc reduction over the first n rows for every level n
+        if len(self.boots) == 1 and self.boots[0] == len(values):
+            return ufunc.reduce(values, axis=0, dtype=dtype)[None, :]
+        return ufunc.accumulate(values, axis=0, dtype=dtype)[self.boots - 1]
+
+    def best(self, opt_sense):
+        key = ("best", opt_sense)
+        if key not in self._cache:
+            if opt_sense == -1:  # Minimization
+                best = self._levels(self.responses, np.minimum)
+            else:  # Maximization
+                best = self._levels(self.responses, np.maximum)
+            # Statistics of the levels are computed in float64
+            self._cache[key] = best.astype(np.float64, copy=False)
+        return self._cache[key]
+
+    def success_prob(self, shared_args, gap):
+        key = (
+            "success_prob",
+            shared_args["response_dir"],
+            success_threshold(shared_args, gap),
+        )
+        if key not in self._cache:
+            mask = success_mask(self.responses, shared_args, gap)
+            counts = self._levels(mask, np.add, dtype=np.int64)
+            self._cache[key] = counts / self.boots[:, None]
+        return self._cache[key]
+
+    def success_probs(self, shared_args, gaps):
+        """
+        (gaps, levels, bootstrap_iterations) success probabilities. The levels of a
+        resample are prefixes of its rows, so every gap gets its own (cached) mask.
+        """
+        return np.stack([self.success_prob(shared_args, gap) for gap in gaps])
+
+    def mean_resource(self):
+        key = ("mean_resource",)
+        if key not in self._cache:
+            sums = self._levels(self.resources, np.add, dtype=np.float64)
+            self._cache[key] = sums / self.boots[:, None]
+        return self._cache[key]
+
+    def level(self, j):
+        n = self.boots[j]
+        return self.responses[:n], self.resources[:n]
+
+    def response(self, j):
+        key = ("response", j)
+        if key not in self._cache:
+            self._cache[key] = ResampleStats(
+                self.responses[..., j],
+                self.resources,
+                self.boots,
+                self._cache.get(("mean_resource",)),
+            )
+        return self._cache[key]
+
+    def compact(self):
+        """
+        Drop the resample arrays once the metrics have read what they need from them
+        (e.g., after a first evaluation), so only the (levels, bootstrap_iterations)
+        intermediate values are kept. level(j) and uncached values are then unavailable.
+        """
+        self.responses = None
+        self.resources = None
+        for key, value in self._cache.items():
+            if key[0] == "response":
+                value.compact()
+
+
+class CountStats(ResampleStats):
+    """
+    Intermediate values of a count-based resample shared by the success metrics.
+
+    Resamples are stored as the number of times each distinct (response, resource)
+    outcome was drawn, so the per-read resample arrays are never built and the work
+    scales with the number of distinct outcomes instead of the number of reads.
+
+    Attributes
+    ----------
+    values : np.array
+        Distinct responses, sorted in increasing order. For several responses, a
+        (outcomes, responses) array of the distinct outcomes in any order
+    value_resources : np.array
+        Resource of each distinct response
+    counts : np.array
+        (levels, bootstrap_iterations, len(values)) number of draws of each outcome
+    boots : np.array
+        Downsample levels, boots[j] == counts[j].sum(axis=-1)
+    mean_resources : np.array
+        (levels, bootstrap_iterations) mean resource of each resample. Computed from
+        the counts if None
+
+    Methods
+    -------
+    best(opt_sense)
+        Best response of each resample for every level
+    success_prob(shared_args, gap)
+        Success probability of each resample for every level
+    success_probs(shared_args, gaps)
+        Success probability of each resample for every level and every gap
+    mean_resource()
+        Mean resource of each resample for every level
+    level(j)
+        (responses, resources) arrays of level j, for metrics without count support
+    response(j)
+        Stats of response column j of a resample of several responses
+    compact()
+        Drop the counts and keep the cached intermediate values
+    """
+
+    def __init__(self, values, value_resources, counts, boots, mean_resources=None):
+        values = np.asarray(values)
+        order = np.arange(len(values))
+        if values.ndim == 1:
+            order = np.argsort(values, kind="stable")
+        self.values = values[order]
+        self.value_resources = np.asarray(value_resources)[order]
+        self.counts = np.asarray(counts)[..., order]
+        # Resample arrays are not built
+        ResampleStats.__init__(self, None, None, boots, mean_resources)
+
+    def best(self, opt_sense):
+        key = ("best", opt_sense)
+        if key not in self._cache:
+            drawn = self.counts > 0
+            if opt_sense == -1:  # Minimization
+                idx = np.argmax(drawn, axis=-1)
+            else:  # Maximization
+                idx = drawn.shape[-1] - 1 - np.argmax(drawn[..., ::-1], axis=-1)
+            self._cache[key] = self.values[idx].astype(np.float64, copy=False)
+        return self._cache[key]
+
+    def success_prob(self, shared_args, gap):
+        key = (
+            "success_prob",
+            shared_args["response_dir"],
+            success_threshold(shared_args, gap),
+        )
+        if key not in self._cache:
+            mask = success_mask(self.values, shared_args, gap)
+            self._cache[key] = (self.counts @ mask) / self.boots[:, None]
+        return self._cache[key]
+
+    def success_probs(self, shared_args, gaps):
+        """
+        (gaps, levels, bootstrap_iterations) success probabilities, read for every gap
+        from the cumulative counts over the sorted values with np.searchsorted
+        """
+        thresholds = success_threshold(shared_args, np.asarray(gaps, dtype=float))
+        key = ("success_probs", shared_args["response_dir"], tuple(thresholds))
+        if key not in self._cache:
+            cum = np.cumsum(self.counts, axis=-1)
+            cum = np.concatenate([np.zeros(cum.shape[:-1] + (1,), cum.dtype), cum], -1)
+            if shared_args["response_dir"] == -1:  # Values below the threshold
+                idx = np.searchsorted(self.values, thresholds, side="left")
+                successes = cum[..., idx]
+            else:  # Values above the threshold
+                idx = np.searchsorted(self.values, thresholds, side="right")
+                successes = cum[..., -1:] - cum[..., idx]
+            self._cache[key] = np.moveaxis(successes, -1, 0) / self.boots[:, None]
+        return self._cache[key]
+
+    def mean_resource(self):
+        key = ("mean_resource",)
+        if key not in self._cache:
+            sums = self.counts @ self.value_resources
+            self._cache[key] = sums / self.boots[:, None]
+        return self._cache[key]
+
+    def level(self, j):
+        counts = self.counts[j]
+        idx = np.stack(
+            [np.repeat(np.arange(len(self.values)), c) for c in counts], axis=1
+        )
+        return self.values[idx], self.value_resources[idx]
+
+    def response(self, j):
+        key = ("response", j)
+        if key not in self._cache:
+            self._cache[key] = CountStats(
+                self.values[:, j],
+                self.value_resources,
+                self.counts,
+                self.boots,
+                self._cache.get(("mean_resource",)),
+            )
+        return self._cache[key]
+
+    def compact(self):
+        ResampleStats.compact(self)
+        self.counts = None
+
+
+class StackedStats(ResampleStats):
+    """
+    Intermediate values of a resample drawn in blocks of bootstrap iterations.
+
+    Every block keeps its own cache and the values are concatenated along the iterations
+    axis, so adding a block does not recompute the earlier ones.
+
+    Attributes
+    ----------
+    blocks : list[ResampleStats]
+        Blocks of the resample, all with the same downsample levels
+    boots : np.array
+        Downsample levels
+
+    Methods
+    -------
+    best(opt_sense)
+        Best response of each resample for every level
+    success_prob(shared_args, gap)
+        Success probability of each resample for every level
+    success_probs(shared_args, gaps)
+        Success probability of each resample for every level and every gap
+    mean_resource()
+        Mean resource of each resample for every level
+    level(j)
+        (responses, resources) resample arrays of level j
+    response(j)
+        Stats of response column j of a resample of several responses
+    """
+
+    def __init__(self, blocks):
+        self.blocks = list(blocks)
+        ResampleStats.__init__(self, None, None, self.blocks[0].boots)
+
+    def best(self, opt_sense):
+        return np.concatenate([block.best(opt_sense) for block in self.blocks], axis=1)
+
+    def success_prob(self, shared_args, gap):
+        return np.concatenate(
+            [block.success_prob(shared_args, gap) for block in self.blocks], axis=1
+        )
+
+    def success_probs(self, shared_args, gaps):
+        return np.concatenate(
+            [block.success_probs(shared_args, gaps) for block in self.blocks], axis=2
+        )
+
+    def mean_resource(self):
+        return np.concatenate([block.mean_resource() for block in self.blocks], axis=1)
+
+    def level(self, j):
+        levels = [block.level(j) for block in self.blocks]
+        return (
+            np.concatenate([responses for responses, _ in levels], axis=1),
+            np.concatenate([resources for _, resources in levels], axis=1),
+        )
+
+    def response(self, j):
+        return StackedStats([block.response(j) for block in self.blocks])
+
+
+def stats_success_probs(stats, shared_args, gaps):
+    """
+    Success probabilities of every gap in gaps read from a ResampleStats, as a list of
+    (levels, bootstrap_iterations) arrays for a single gap
+    """
+    if len(gaps) == 1:
+        return [stats.success_prob(shared_args, gaps[0])]
+    return stats.success_probs(shared_args, gaps)
+
+
+class MetricColumns(dict):
+    """
+    NumPy columns that success metrics write to in place of a DataFrame.
+
+    Metrics read and write whole columns (one value per level) with the same bs_df[col]
+    syntax, without the overhead of inserting into a DataFrame one column at a time.
+    The columns are turned into a single DataFrame by to_frame.
+    """
+
+    @property
+    def columns(self):
+        return list(self.keys())
+
+    def to_frame(self):
+        if len(self) == 0:
+            return pd.DataFrame()
+        return pd.DataFrame(
+            {col: np.atleast_1d(values) for col, values in self.items()}
+        )
+
+
+class FusedMetrics:
+    """
+    Evaluates several success metrics in a single pass over a resample.
+
+    Metric objects are built once, their intermediate values are shared through a
+    ResampleStats and every result is written to MetricColumns.
+
+    Attributes
+    ----------
+    metrics : list[SuccessMetrics]
+        Metric objects, evaluated in order (PerfRatio reads the Response columns)
+    exact : list[bool]
+        Whether each metric is evaluated from its closed-form distribution
+
+    Methods
+    -------
+    __init__(shared_args, metric_args, metric_refs, exact=False)
+        Constructor for FusedMetrics class
+    needs_resample()
+        Whether any metric needs the resample arrays
+    needs_resources()
+        Whether any metric reads the resampled resources (and not only their means)
+    cache(stats)
+        Compute the intermediate values of stats read by the metrics
+    evaluate(boots, responses, resources, group=None, stats=None)
+        Evaluate every metric and return the results as a DataFrame
+    """
+
+    def __init__(self, shared_args, metric_args, metric_refs, exact=False):
+        self.metrics = [
+            metric_ref(shared_args, metric_args[metric_ref.__name__])
+            for metric_ref in metric_refs
+        ]
+        self.exact = [
+            exact and isinstance(metric, SuccessMetrics) and metric.exact
+            for metric in self.metrics
+        ]
+
+    def needs_resample(self):
+        return not all(self.exact)
+
+    def needs_resources(self):
+        return any(
+            not exact
+            and (
+                not isinstance(metric, SuccessMetrics)
+                or type(metric).evaluate_stats is SuccessMetrics.evaluate_stats
+            )
+            for metric, exact in zip(self.metrics, self.exact)
+        )
+
+    def cache(self, stats):
+        """
+        Compute the intermediate values of stats that evaluate reads, without
+        evaluating the metrics (e.g., before stats.compact() drops a block of a
+        StackedStats). Metrics without evaluate_stats are left out (see
+        needs_resources).
+        """
+        for metric, exact in zip(self.metrics, self.exact):
+            if not exact and isinstance(metric, SuccessMetrics):
+                metric.cache_stats(stats)
+
+    def evaluate(self, boots, responses, resources, group=None, stats=None):
+        """
+        Parameters
+        ----------
+        boots : np.array
+            Downsample levels (all positive)
+        responses : np.array
+            Resampled responses with at least max(boots) rows, or None if not needed
+        resources : np.array
+            Resampled resources with at least max(boots) rows, or None if not needed
+        group : tuple, optional
+            (responses, resources, weights) of the group, needed by exact metrics
+        stats : ResampleStats, optional
+            Resample to evaluate (e.g., a CountStats). Built from responses and resources
+            if None
+
+        Returns
+        -------
+        bs_df : pd.DataFrame
+            One row per level and the columns written by the metrics
+        """
+        boots = np.asarray(boots)
+        if stats is None:
+            stats = ResampleStats(responses, resources, boots)
+        bs_cols = MetricColumns()
+        for metric, exact in zip(self.metrics, self.exact):
+            if exact:
+                metric.evaluate_exact(bs_cols, *group, boots)
+            elif isinstance(metric, SuccessMetrics):
+                metric.evaluate_stats(bs_cols, stats)
+            elif len(boots) == 1:
+                metric.evaluate(bs_cols, *stats.level(0))
+            else:
+                SuccessMetrics.evaluate_stats(metric, bs_cols, stats)
+        return bs_cols.to_frame()
+
+
+class ResponseMetrics:
+    """
+    Evaluates the success metrics of several response columns on the same resample.
+
+    shared_args['response_col'] is a list of response columns, and the responses of a
+    resample have a trailing axis with one entry per column, so they are all drawn with
+    the same resample indices. Every response is evaluated by its own FusedMetrics and
+    its result columns are qualified with the response, e.g.
+    Key=PerfRatio_Response=energy (the metric name is 'PerfRatio_Response=energy').
+    Arguments given as a dict keyed by response column (e.g., best_value or
+    response_dir in shared_args, opt_sense in metric_args) take the entry of each
+    response (see response_args).
+
+    Attributes
+    ----------
+    response_cols : list[str]
+        Response columns, in the order of the trailing axis of the responses
+    fused : list[FusedMetrics]
+        Metrics of each response
+
+    Methods
+    -------
+    __init__(shared_args, metric_args, metric_refs, exact=False)
+        Constructor for ResponseMetrics class
+    needs_resample()
+        Whether any metric needs the resample arrays
+    needs_resources()
+        Whether any metric reads the resampled resources (and not only their means)
+    cache(stats)
+        Compute the intermediate values of stats read by the metrics of every response
+    evaluate(boots, responses, resources, group=None, stats=None)
+        Evaluate every metric of every response and return the results as a DataFrame
+    """
+
+    def __init__(self, shared_args, metric_args, metric_refs, exact=False):
+        self.shared_args = shared_args
+        self.metric_args = metric_args
+        self.response_cols = list(shared_args["response_col"])
+        self._args = []  # (shared_args, metric_args) of each response, read by its metrics
+        self.fused = []
+        for _ in self.response_cols:
+            response_metric_args = defaultdict(lambda: None)
+            for metric_ref in metric_refs:
+                if isinstance(metric_args[metric_ref.__name__], dict):
+                    response_metric_args[metric_ref.__name__] = {}
+            self._args.append(({}, response_metric_args))
+        self._refresh()
+        for shared, metric in self._args:
+            self.fused.append(FusedMetrics(shared, metric, metric_refs, exact=exact))
+
+    def _refresh(self):
+        # Resolve the arguments of each response in place, after the reference values
+        # of a group were written to shared_args and metric_args
+        for col, (shared, metric) in zip(self.response_cols, self._args):
+            shared.clear()
+            shared.update(response_args(self.shared_args, col))
+            for name, args in metric.items():
+                if args is None:
+                    continue
+                args.clear()
+                args.update(response_args(self.metric_args[name], col))
+
+    def needs_resample(self):
+        return any(fused.needs_resample() for fused in self.fused)
+
+    def needs_resources(self):
+        return any(fused.needs_resources() for fused in self.fused)
+
+    def cache(self, stats):
+        self._refresh()
+        for j, fused in enumerate(self.fused):
+            fused.cache(stats.response(j))
+
+    def evaluate(self, boots, responses, resources, group=None, stats=None):
+        """
+        Parameters
+        ----------
+        boots : np.array
+            Downsample levels (all positive)
+        responses : np.array
+            Resampled responses with at least max(boots) rows and a trailing response
+            axis, or None if not needed
+        resources : np.array
+            Resampled resources with at least max(boots) rows, or None if not needed
+        group : tuple, optional
+            (responses, resources, weights) of the group, with (rows, responses)
+            responses, needed by exact metrics
+        stats : ResampleStats, optional
+            Resample of every response to evaluate. Built from responses and resources
+            if None
+
+        Returns
+        -------
+        bs_df : pd.DataFrame
+            One row per level and the columns written by the metrics of every response
+        """
+        self._refresh()
+        if stats is None and responses is not None:
+            stats = ResampleStats(responses, resources, boots)
+        bs_cols = MetricColumns()
+        for j, (col, fused) in enumerate(zip(self.response_cols, self.fused)):
+            response_group = None
+            if group is not None:
+                response_group = (group[0][:, j], group[1], group[2])
+            bs_df = fused.evaluate(
+                boots,
+                None,
+                None,
+                group=response_group,
+                stats=None if stats is None else stats.response(j),
+            )
+            for metric_col in bs_df.columns:
+                if "Key=" in metric_col:
+                    bs_cols["{}_Response={}".format(metric_col, col)] = bs_df[
+                        metric_col
+                    ].values
+                else:
+                    bs_cols[metric_col] = bs_df[metric_col].values
+        return bs_cols.to_frame()
+
+
 class SuccessMetrics:
     """
     Parent class for success metrics. Saves shared arguments for all success metrics.
@@ -16,8 +813,19 @@ class SuccessMetrics:
         Constructor for SuccessMetrics class
     evaluate(bs_df, responses, resources)
         Template function for evaluating a success metric
+    evaluate_levels(bs_df, responses, resources, boots)
+        Evaluate every downsample level in boots from a single resample.
+    evaluate_stats(bs_df, stats)
+        Evaluate every level of a ResampleStats, sharing its intermediate values.
+    cache_stats(stats)
+        Compute the intermediate values of a ResampleStats read by evaluate_stats.
+    evaluate_exact(bs_df, responses, resources, weights, boots)
+        Evaluate every downsample level in boots without resampling. Only
+        available for subclasses with exact = True.
     """
 
+    exact = False  # Whether evaluate_exact is available
+
     def __init__(self, shared_args):
         self.shared_args = shared_args  # confidence level, best_value, random_values
 
@@ -38,6 +846,83 @@ class SuccessMetrics:
             "Evaluate should be overriden by a subclass of SuccessMetrics"
         )
 
+    def evaluate_levels(self, bs_df, responses, resources, boots):
+        """
+        Evaluate the success metric for several downsample levels at once.
+
+        Level n uses the first n rows of the resample matrices, so a single
+        (max(boots), bootstrap_iterations) resample serves every level.
+
+        Parameters
+        ----------
+        bs_df : pd.DataFrame
+            Dataframe with one row per level to write the corresponding results to
+        responses : np.array
+            Array of responses with at least max(boots) rows
+        resources : np.array
+            Array of resources with at least max(boots) rows
+        boots : np.array
+            Downsample levels (all positive)
+        """
+        self.evaluate_stats(bs_df, ResampleStats(responses, resources, boots))
+
+    def evaluate_stats(self, bs_df, stats):
+        """
+        Evaluate the success metric for every level of a ResampleStats.
+
+        Subclasses read shared intermediate values from stats. This fallback calls
+        evaluate once per level.
+
+        Parameters
+        ----------
+        bs_df : pd.DataFrame or MetricColumns
+            Columns with one row per level to write the corresponding results to
+        stats : ResampleStats
+            Resample and its cached intermediate values
+        """
+        level_dfs = []
+        for j in range(len(stats.boots)):
+            level_df = pd.DataFrame(index=[0])
+            self.evaluate(level_df, *stats.level(j))
+            level_dfs.append(level_df)
+        level_df = pd.concat(level_dfs, ignore_index=True)
+        for col in level_df.columns:
+            bs_df[col] = level_df[col].values
+
+    def cache_stats(self, stats):
+        """
+        Compute the intermediate values of stats that evaluate_stats reads, without
+        writing any column. Metrics derived from other columns (or evaluated level by
+        level) read none.
+
+        Parameters
+        ----------
+        stats : ResampleStats
+            Resample whose intermediate values are cached
+        """
+
+    def evaluate_exact(self, bs_df, responses, resources, weights, boots):
+        """
+        Template function for evaluating a success metric from the closed-form
+        distribution of its resamples
+
+        Parameters
+        ----------
+        bs_df : pd.DataFrame
+            Dataframe with one row per level to write the corresponding results to
+        responses : np.array
+            Responses of the group (not resampled)
+        resources : np.array
+            Resources of the group (not resampled)
+        weights : np.array or None
+            Weight of each row (e.g., aggregated counts). Uniform if None
+        boots : np.array
+            Downsample levels (all positive)
+        """
+        raise NotImplementedError(
+            "{} does not support exact evaluation".format(type(self).__name__)
+        )
+
 
 class Response(SuccessMetrics):
     """
@@ -49,8 +934,16 @@ class Response(SuccessMetrics):
         Constructor for Response class
     evaluate(bs_df, responses, resources)
         Compute the response of each bootstrap samples and its corresponding confidence interval based on the resamples.
+    evaluate_stats(bs_df, stats)
+        Evaluate every level of a ResampleStats from its shared intermediate values.
+    cache_stats(stats)
+        Compute the intermediate values of a ResampleStats read by evaluate_stats.
+    evaluate_exact(bs_df, responses, resources, weights, boots)
+        Evaluate every downsample level in boots from the exact best-of-n distribution.
     """
 
+    exact = True
+
     def __init__(self, shared_args, metric_args):
         SuccessMetrics.__init__(self, shared_args)
         self.name = "Response"
@@ -75,6 +968,41 @@ class Response(SuccessMetrics):
         bs_df[CIlower] = mean_val - fact * std_dev
         bs_df[CIupper] = mean_val + fact * std_dev
 
+    def cache_stats(self, stats):
+        stats.best(self.opt_sense)
+
+    def evaluate_stats(self, bs_df, stats):
+        response_dist = stats.best(self.opt_sense)
+        key = self.name
+        basename = names.param2filename({"Key": key}, "")
+        CIupper = names.param2filename({"Key": key, "ConfInt": "upper"}, "")
+        CIlower = names.param2filename({"Key": key, "ConfInt": "lower"}, "")
+
+        confidence_level = self.shared_args["confidence_level"]
+        mean_val = np.mean(response_dist, axis=1)
+        std_dev = np.nanstd(response_dist, axis=1)
+        fact = erfinv(confidence_level / 100.0) * np.sqrt(2.0)
+
+        bs_df[basename] = mean_val
+        bs_df[CIlower] = mean_val - fact * std_dev
+        bs_df[CIupper] = mean_val + fact * std_dev
+
+    def evaluate_exact(self, bs_df, responses, resources, weights, boots):
+        support, pmf = best_of_n_distribution(responses, weights, boots, self.opt_sense)
+        key = self.name
+        basename = names.param2filename({"Key": key}, "")
+        CIupper = names.param2filename({"Key": key, "ConfInt": "upper"}, "")
+        CIlower = names.param2filename({"Key": key, "ConfInt": "lower"}, "")
+
+        confidence_level = self.shared_args["confidence_level"]
+        mean_val = pmf @ support
+        std_dev = np.sqrt(np.clip(pmf @ support**2 - mean_val**2, 0.0, None))
+        fact = erfinv(confidence_level / 100.0) * np.sqrt(2.0)
+
+        bs_df[basename] = mean_val
+        bs_df[CIlower] = mean_val - fact * std_dev
+        bs_df[CIupper] = mean_val + fact * std_dev
+
 
 class PerfRatio(SuccessMetrics):
     """
@@ -86,8 +1014,14 @@ class PerfRatio(SuccessMetrics):
         Constructor for PerfRatio class
     evaluate(bs_df, responses, resources)
         Compute the performance ratio of each bootstrap samples and its corresponding confidence interval based on the resamples.
+    evaluate_stats(bs_df, stats)
+        Evaluate every level of a ResampleStats from its shared intermediate values.
+    evaluate_exact(bs_df, responses, resources, weights, boots)
+        Evaluate every downsample level in boots from the exact best-of-n distribution.
     """
 
+    exact = True
+
     def __init__(self, shared_args, metric_args):
         SuccessMetrics.__init__(self, shared_args)
         self.name = "PerfRatio"
@@ -116,9 +1050,17 @@ class PerfRatio(SuccessMetrics):
             - bs_df[names.param2filename({"Key": "Response", "ConfInt": "lower"}, "")]
         ) / (random_value - best_value)
 
-        bs_df[basename] = bs_df[basename].clip(lower=lower, upper=upper)
-        bs_df[CIlower] = bs_df[CIlower].clip(lower=lower, upper=upper)
-        bs_df[CIupper] = bs_df[CIupper].clip(lower=lower, upper=upper)
+        bs_df[basename] = np.clip(bs_df[basename], lower, upper)
+        bs_df[CIlower] = np.clip(bs_df[CIlower], lower, upper)
+        bs_df[CIupper] = np.clip(bs_df[CIupper], lower, upper)
+
+    def evaluate_stats(self, bs_df, stats):
+        # Derived column-wise from the Response columns, which already hold every level
+        self.evaluate(bs_df, stats.responses, stats.resources)
+
+    def evaluate_exact(self, bs_df, responses, resources, weights, boots):
+        # Derived column-wise from the Response columns, which already hold every level
+        self.evaluate(bs_df, responses, resources)
 
 
 class InvPerfRatio(SuccessMetrics):
@@ -131,8 +1073,14 @@ class InvPerfRatio(SuccessMetrics):
         Constructor for InvPerfRatio class
     evaluate(bs_df, responses, resources)
         Compute the inverse performance ratio of each bootstrap samples and its corresponding confidence interval based on the resamples.
+    evaluate_stats(bs_df, stats)
+        Evaluate every level of a ResampleStats from its shared intermediate values.
+    evaluate_exact(bs_df, responses, resources, weights, boots)
+        Evaluate every downsample level in boots from the exact best-of-n distribution.
     """
 
+    exact = True
+
     def __init__(self, shared_args, metric_args):
         SuccessMetrics.__init__(self, shared_args)
         self.name = "InvPerfRatio"
@@ -178,19 +1126,38 @@ class InvPerfRatio(SuccessMetrics):
             + EPSILON
         )
 
+    def evaluate_stats(self, bs_df, stats):
+        # Derived column-wise from the Response columns, which already hold every level
+        self.evaluate(bs_df, stats.responses, stats.resources)
+
+    def evaluate_exact(self, bs_df, responses, resources, weights, boots):
+        # Derived column-wise from the Response columns, which already hold every level
+        self.evaluate(bs_df, responses, resources)
+
 
 class SuccessProb(SuccessMetrics):
     """
     Compute the success probability of each bootstrap samples and its corresponding confidence interval based on the resamples.
 
+    metric_args['gap'] can be a list of gaps, evaluated in a single pass with one set of
+    columns per gap (e.g., Key=SuccProb_gap=1.0).
+
     Methods
     -------
     __init__(shared_args, metric_args)
         Constructor for SuccessProb class
     evaluate(bs_df, responses, resources)
         Compute the success probability of each bootstrap samples and its corresponding confidence interval based on the resamples.
+    evaluate_stats(bs_df, stats)
+        Evaluate every level of a ResampleStats from its shared intermediate values.
+    cache_stats(stats)
+        Compute the intermediate values of a ResampleStats read by evaluate_stats.
+    evaluate_exact(bs_df, responses, resources, weights, boots)
+        Evaluate every downsample level in boots from the binomial distribution of the success count.
     """
 
+    exact = True
+
     def __init__(self, shared_args, metric_args):
         SuccessMetrics.__init__(self, shared_args)
         self.name = "SuccProb"
@@ -198,44 +1165,75 @@ class SuccessProb(SuccessMetrics):
         self.args = metric_args  # gap to count as success, response_dir is if the underlying col should be max or min
 
     def evaluate(self, bs_df, responses, resources):
-        key = self.name
-        basename = names.param2filename({"Key": key}, "")
-        CIupper = names.param2filename({"Key": key, "ConfInt": "upper"}, "")
-        CIlower = names.param2filename({"Key": key, "ConfInt": "lower"}, "")
-
         downsample = responses.shape[0]
         random_value = self.shared_args["random_value"]
         best_value = self.shared_args["best_value"]
         confidence_level = self.shared_args["confidence_level"]
 
-        if self.shared_args["response_dir"] == -1:
-            success_thresh = random_value - (1.0 - self.args["gap"] / 100.0) * (
-                random_value - best_value
+        for values, swept in sweep(self.args, ["gap"]):
+            if self.shared_args["response_dir"] == -1:
+                success_thresh = random_value - (1.0 - values["gap"] / 100.0) * (
+                    random_value - best_value
+                )
+                success_prob_dist = np.apply_along_axis(
+                    func1d=lambda x: np.sum(x < success_thresh) / downsample,
+                    axis=0,
+                    arr=responses,
+                )
+
+            else:  # Maximization
+                success_thresh = (1.0 - values["gap"] / 100.0) * (
+                    best_value - random_value
+                ) - random_value
+                success_prob_dist = np.apply_along_axis(
+                    func1d=lambda x: np.sum(x > success_thresh) / downsample,
+                    axis=0,
+                    arr=responses,
+                )
+
+            basename, CIupper, CIlower = metric_names(self.name, swept)
+
+            bs_df[basename] = np.mean(success_prob_dist)
+            bs_df[CIlower] = np.nanpercentile(
+                success_prob_dist, 50 - confidence_level / 2
             )
-            success_prob_dist = np.apply_along_axis(
-                func1d=lambda x: np.sum(x < success_thresh) / downsample,
-                axis=0,
-                arr=responses,
+            bs_df[CIupper] = np.nanpercentile(
+                success_prob_dist, 50 + confidence_level / 2
             )
 
-        else:  # Maximization
-            success_thresh = (1.0 - self.args["gap"] / 100.0) * (
-                best_value - random_value
-            ) - random_value
-            success_prob_dist = np.apply_along_axis(
-                func1d=lambda x: np.sum(x > success_thresh) / downsample,
-                axis=0,
-                arr=responses,
+    def cache_stats(self, stats):
+        gaps = np.atleast_1d(self.args["gap"]).tolist()
+        stats_success_probs(stats, self.shared_args, gaps)
+
+    def evaluate_stats(self, bs_df, stats):
+        confidence_level = self.shared_args["confidence_level"]
+        gaps = np.atleast_1d(self.args["gap"]).tolist()
+        success_prob_dists = stats_success_probs(stats, self.shared_args, gaps)
+
+        for (values, swept), success_prob_dist in zip(
+            sweep(self.args, ["gap"]), success_prob_dists
+        ):
+            basename, CIupper, CIlower = metric_names(self.name, swept)
+            bs_df[basename] = np.mean(success_prob_dist, axis=1)
+            bs_df[CIlower] = np.nanpercentile(
+                success_prob_dist, 50 - confidence_level / 2, axis=1
+            )
+            bs_df[CIupper] = np.nanpercentile(
+                success_prob_dist, 50 + confidence_level / 2, axis=1
             )
 
-        key = self.name
-        basename = names.param2filename({"Key": key}, "")
-        CIupper = names.param2filename({"Key": key, "ConfInt": "upper"}, "")
-        CIlower = names.param2filename({"Key": key, "ConfInt": "lower"}, "")
+    def evaluate_exact(self, bs_df, responses, resources, weights, boots):
+        # The success count of a resample with n draws is Binomial(n, p)
+        boots = np.asarray(boots)
+        confidence_level = self.shared_args["confidence_level"]
+        gaps = np.atleast_1d(self.args["gap"]).tolist()
+        probs = success_probabilities(responses, weights, self.shared_args, gaps)
 
-        bs_df[basename] = np.mean(success_prob_dist)
-        bs_df[CIlower] = np.nanpercentile(success_prob_dist, 50 - confidence_level / 2)
-        bs_df[CIupper] = np.nanpercentile(success_prob_dist, 50 + confidence_level / 2)
+        for (values, swept), p in zip(sweep(self.args, ["gap"]), probs):
+            basename, CIupper, CIlower = metric_names(self.name, swept)
+            bs_df[basename] = np.full(len(boots), p)
+            bs_df[CIlower] = binom.ppf(0.5 - confidence_level / 200.0, boots, p) / boots
+            bs_df[CIupper] = binom.ppf(0.5 + confidence_level / 200.0, boots, p) / boots
 
 
 # This one is kind of weird
@@ -249,6 +1247,10 @@ class Resource(SuccessMetrics):
         Constructor for Resource class
     evaluate(bs_df, responses, resources)
         Compute the resource of each bootstrap samples and its corresponding confidence interval based on the resamples.
+    evaluate_stats(bs_df, stats)
+        Evaluate every level of a ResampleStats from its shared intermediate values.
+    cache_stats(stats)
+        Compute the intermediate values of a ResampleStats read by evaluate_stats.
     """
 
     def __init__(self, shared_args, metric_args):
@@ -258,7 +1260,7 @@ class Resource(SuccessMetrics):
         self.name = "MeanTime"
 
     def evaluate(self, bs_df, responses, resources):
-        resource_dist = np.apply_along_axis(func1d=np.mean, axis=0, arr=resources)
+        resource_dist = np.mean(resources, axis=0, dtype=np.float64)
 
         key = self.name
         basename = names.param2filename({"Key": key}, "")
@@ -271,83 +1273,190 @@ class Resource(SuccessMetrics):
         bs_df[CIlower] = np.nanpercentile(resource_dist, 50 - confidence_level / 2)
         bs_df[CIupper] = np.nanpercentile(resource_dist, 50 + confidence_level / 2)
 
+    def cache_stats(self, stats):
+        stats.mean_resource()
+
+    def evaluate_stats(self, bs_df, stats):
+        resource_dist = stats.mean_resource()
+
+        key = self.name
+        basename = names.param2filename({"Key": key}, "")
+        CIupper = names.param2filename({"Key": key, "ConfInt": "upper"}, "")
+        CIlower = names.param2filename({"Key": key, "ConfInt": "lower"}, "")
+
+        confidence_level = self.shared_args["confidence_level"]
+
+        bs_df[basename] = np.mean(resource_dist, axis=1)
+        bs_df[CIlower] = np.nanpercentile(
+            resource_dist, 50 - confidence_level / 2, axis=1
+        )
+        bs_df[CIupper] = np.nanpercentile(
+            resource_dist, 50 + confidence_level / 2, axis=1
+        )
+
 
 class RTT(SuccessMetrics):
     """
     Compute the RTT of each bootstrap samples and its corresponding confidence interval based on the resamples.
 
+    metric_args['gap'] and metric_args['s'] can be lists, evaluated in a single pass
+    with one set of columns per (gap, s) combination (e.g., Key=RTT_gap=1.0_s=0.99).
+
     Methods
     -------
     __init__(shared_args, metric_args)
         Constructor for RTT class
     evaluate(bs_df, responses, resources)
         Compute the RTT of each bootstrap samples and its corresponding confidence interval based on the resamples.
+    evaluate_stats(bs_df, stats)
+        Evaluate every level of a ResampleStats from its shared intermediate values.
+    cache_stats(stats)
+        Compute the intermediate values of a ResampleStats read by evaluate_stats.
+    evaluate_exact(bs_df, responses, resources, weights, boots)
+        Evaluate every downsample level in boots from the binomial distribution of the success count.
     """
 
+    exact = True
+
     def __init__(self, shared_args, metric_args):
         SuccessMetrics.__init__(self, shared_args)
         self.name = "RTT"
         self.args = metric_args  # fail_value, RTT_factor
         self.opt_set = -1
-        self.evaluate_vectorized = np.vectorize(self.evaluate_single, excluded=(2, 3))
+        self.evaluate_vectorized = np.vectorize(
+            self.evaluate_single, excluded=(2, 3, "s")
+        )
 
     def evaluate(self, bs_df, responses, resources):
-        key = self.name
-        basename = names.param2filename({"Key": key}, "")
-        CIupper = names.param2filename({"Key": key, "ConfInt": "upper"}, "")
-        CIlower = names.param2filename({"Key": key, "ConfInt": "lower"}, "")
-
         downsample = responses.shape[0]
         random_value = self.shared_args["random_value"]
         best_value = self.shared_args["best_value"]
         confidence_level = self.shared_args["confidence_level"]
 
-        if self.shared_args["response_dir"] == -1:
-            success_thresh = random_value - (1.0 - self.args["gap"] / 100.0) * (
-                random_value - best_value
-            )
-            success_prob_dist = np.apply_along_axis(
-                func1d=lambda x: np.sum(x < success_thresh) / downsample,
-                axis=0,
-                arr=responses,
+        for values, swept in sweep(self.args, ["gap", "s"]):
+            basename, CIupper, CIlower = metric_names(self.name, swept)
+            if self.shared_args["response_dir"] == -1:
+                success_thresh = random_value - (1.0 - values["gap"] / 100.0) * (
+                    random_value - best_value
+                )
+                success_prob_dist = np.apply_along_axis(
+                    func1d=lambda x: np.sum(x < success_thresh) / downsample,
+                    axis=0,
+                    arr=responses,
+                )
+
+            else:  # Maximization
+                success_thresh = (1.0 - values["gap"] / 100.0) * (
+                    best_value - random_value
+                ) - random_value
+                success_prob_dist = np.apply_along_axis(
+                    func1d=lambda x: np.sum(x > success_thresh) / downsample,
+                    axis=0,
+                    arr=responses,
+                )
+            rtt_dist = self.evaluate_vectorized(
+                success_prob_dist, scale=self.args["RTT_factor"], s=values["s"]
             )
+            # Question: should we scale the RTT with the number of bootstrapping we do, intuition says we don't need to
+            rtt = np.mean(rtt_dist)
 
-        else:  # Maximization
-            success_thresh = (1.0 - self.args["gap"] / 100.0) * (
-                best_value - random_value
-            ) - random_value
-            success_prob_dist = np.apply_along_axis(
-                func1d=lambda x: np.sum(x > success_thresh) / downsample,
-                axis=0,
-                arr=responses,
+            bs_df[basename] = rtt
+            if np.isinf(rtt) or np.isnan(rtt) or rtt == self.args["fail_value"]:
+                bs_df[CIlower] = self.args["fail_value"]
+                bs_df[CIupper] = self.args["fail_value"]
+            else:
+                bs_df[CIlower] = np.nanpercentile(rtt_dist, 50 - confidence_level / 2)
+                bs_df[CIupper] = np.nanpercentile(rtt_dist, 50 + confidence_level / 2)
+
+    def cache_stats(self, stats):
+        gaps = np.atleast_1d(self.args["gap"]).tolist()
+        stats_success_probs(stats, self.shared_args, gaps)
+
+    def evaluate_stats(self, bs_df, stats):
+        confidence_level = self.shared_args["confidence_level"]
+        fail_value = self.args["fail_value"]
+        gaps = np.atleast_1d(self.args["gap"]).tolist()
+        success_prob_dists = stats_success_probs(stats, self.shared_args, gaps)
+
+        for values, swept in sweep(self.args, ["gap", "s"]):
+            basename, CIupper, CIlower = metric_names(self.name, swept)
+            success_prob_dist = success_prob_dists[gaps.index(values["gap"])]
+            rtt_dist = self.evaluate_array(
+                success_prob_dist, scale=self.args["RTT_factor"], s=values["s"]
             )
-        #         print(len(success_prob_dist))
-        #         print(self.args['RTT_factor'])
-        rtt_dist = self.evaluate_vectorized(
-            success_prob_dist, scale=self.args["RTT_factor"]
-        )
-        # Question: should we scale the RTT with the number of bootstrapping we do, intuition says we don't need to
-        rtt = np.mean(rtt_dist)
+            rtt = np.mean(rtt_dist, axis=1)
 
-        bs_df[basename] = rtt
-        if np.isinf(rtt) or np.isnan(rtt) or rtt == self.args["fail_value"]:
-            bs_df[CIlower] = self.args["fail_value"]
-            bs_df[CIupper] = self.args["fail_value"]
-        else:
-            # rtt_conf_interval = computeRTT_vectorized(
-            #     success_prob_conf_interval, s=0.99, scale=1e-6*df_default_samples['runtime (us)'].sum())
-            bs_df[CIlower] = np.nanpercentile(rtt_dist, 50 - confidence_level / 2)
-            bs_df[CIupper] = np.nanpercentile(rtt_dist, 50 + confidence_level / 2)
+            failed = np.isinf(rtt) | np.isnan(rtt) | (rtt == fail_value)
+            # Levels whose resampled RTTs are all NaN fall under failed (their mean is NaN)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                rtt_lower = np.nanpercentile(rtt_dist, 50 - confidence_level / 2, axis=1)
+                rtt_upper = np.nanpercentile(rtt_dist, 50 + confidence_level / 2, axis=1)
 
-    def evaluate_single(self, success_probability, scale=1.0, size=1000):
+            bs_df[basename] = rtt
+            bs_df[CIlower] = np.where(failed, fail_value, rtt_lower)
+            bs_df[CIupper] = np.where(failed, fail_value, rtt_upper)
+
+    def evaluate_exact(self, bs_df, responses, resources, weights, boots):
+        """
+        RTT of every level from the Binomial(n, p) distribution of the success count.
+
+        Outcomes without successes take fail_value like in evaluate, so a NaN or
+        infinite fail_value propagates to the mean and the level fails as soon as it
+        can draw no success.
+        """
+        confidence_level = self.shared_args["confidence_level"]
+        fail_value = self.args["fail_value"]
+        scale = self.args["RTT_factor"]
+        gaps = np.atleast_1d(self.args["gap"]).tolist()
+        probs = success_probabilities(responses, weights, self.shared_args, gaps)
+
+        for values, swept in sweep(self.args, ["gap", "s"]):
+            basename, CIupper, CIlower = metric_names(self.name, swept)
+            p = probs[gaps.index(values["gap"])]
+            rtt = np.full(len(boots), np.nan)
+            rtt_lower = np.full(len(boots), np.nan)
+            rtt_upper = np.full(len(boots), np.nan)
+            for i, n in enumerate(boots):
+                pmf = binom.pmf(np.arange(n + 1), n, p)
+                rtt_dist = np.concatenate([[fail_value], scale * rtt_table(n, values["s"])])
+                keep = pmf > 0
+                rtt_dist = rtt_dist[keep]
+                pmf = pmf[keep] / pmf[keep].sum()
+                rtt[i] = pmf @ rtt_dist
+                if np.isnan(rtt[i]) or np.isinf(rtt[i]):
+                    continue  # Failed level
+                rtt_lower[i], rtt_upper[i] = discrete_percentile(
+                    rtt_dist, pmf, [50 - confidence_level / 2, 50 + confidence_level / 2]
+                )
+
+            failed = np.isinf(rtt) | np.isnan(rtt) | (rtt == fail_value)
+            bs_df[basename] = rtt
+            bs_df[CIlower] = np.where(failed, fail_value, rtt_lower)
+            bs_df[CIupper] = np.where(failed, fail_value, rtt_upper)
+
+    def evaluate_single(self, success_probability, scale=1.0, size=1000, s=None):
+        s = self.args["s"] if s is None else s
         if success_probability == 0:
             return self.args["fail_value"]
         elif success_probability == 1:
             # Consider continuous RTT and RTT scaled by assuming success_probability=1 as success_probability=1/size*(1-1/10)
-            return (
-                scale * np.log(1.0 - self.args["s"]) / np.log(1 - (1 - 1 / 10) / size)
-            )
+            return scale * np.log(1.0 - s) / np.log(1 - (1 - 1 / 10) / size)
         else:
-            return (
-                scale * np.log(1.0 - self.args["s"]) / np.log(1 - success_probability)
-            )
+            return scale * np.log(1.0 - s) / np.log(1 - success_probability)
+
+    def evaluate_array(self, success_probability, scale=1.0, size=1000, s=None):
+        """
+        Vectorized version of evaluate_single for an array of success probabilities
+        """
+        s = self.args["s"] if s is None else s
+        success_probability = np.asarray(success_probability, dtype=float)
+        log_fail = np.log(1.0 - s)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rtt = scale * log_fail / np.log(1 - success_probability)
+        rtt = np.where(
+            success_probability == 1,
+            scale * log_fail / np.log(1 - (1 - 1 / 10) / size),
+            rtt,
+        )
+        return np.where(success_probability == 0, self.args["fail_value"], rtt)
@@ -7,6 +7,7 @@ from typing import List, Tuple, Union
 import warnings
 
 import df_utils
+from seeding import stream
 
 check_split_validity = True  # While splitting instances into test and train sets, ensure that each set is non-empty
 
@@ -113,7 +114,9 @@ def virtual_best(
     return vb
 
 
-def split_train_test(df: pd.DataFrame, split_on: List[str], ptrain: float):
+def split_train_test(
+    df: pd.DataFrame, split_on: List[str], ptrain: float, seed: int = None
+):
     """
     Create column, 'train' that splits training and testing instances
 
@@ -125,6 +128,10 @@ def split_train_test(df: pd.DataFrame, split_on: List[str], ptrain: float):
         List of columns that define an instance (i.e., if they match on all columns in split_on, they will have the same label)
     ptrain : float
         Fraction of instances should be a training instance
+    seed : int, optional
+        Root seed of the split. Each instance draws from its own stream (see
+        seeding.stream), so its label does not depend on the other instances.
+        None uses the global NumPy random state.
 
     Returns
     -------
@@ -136,7 +143,7 @@ def split_train_test(df: pd.DataFrame, split_on: List[str], ptrain: float):
             df.groupby(split_on)
             .apply(
                 lambda df: pd.DataFrame.from_dict(
-                    {"train": [np.random.binomial(1, ptrain)]}
+                    {"train": [stream(seed, "split", df.name, 0).binomial(1, ptrain)]}
                 ),
                 include_groups=False
             )
@@ -144,12 +151,19 @@ def split_train_test(df: pd.DataFrame, split_on: List[str], ptrain: float):
         )
     else:
         valid_split = False
+        attempt = 0
         while not valid_split:
             df = (
                 df.groupby(split_on)
                 .apply(
                     lambda df: pd.DataFrame.from_dict(
-                        {"train": [np.random.binomial(1, ptrain)]}
+                        {
+                            "train": [
+                                stream(seed, "split", df.name, attempt).binomial(
+                                    1, ptrain
+                                )
+                            ]
+                        }
                     ),
                     include_groups=False
                 )
@@ -159,6 +173,7 @@ def split_train_test(df: pd.DataFrame, split_on: List[str], ptrain: float):
             if 1 not in train_col or 0 not in train_col:
                 # delete train column, and redo
                 del df["train"]
+                attempt += 1
                 raise Warning(
                     "Testing and training sets are not both non-empty. Redoing split. To remove this warning, set training.check_split_validity=False"
                 )
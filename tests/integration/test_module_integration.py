@@ -243,8 +243,8 @@ class TestWorkflowIntegration:
             )
             
             # Create a mock success metric that actually populates the DataFrame
-            with patch.object(success_metrics.Response, 'evaluate') as mock_evaluate:
-                def mock_evaluate_func(df, responses, resources):
+            with patch.object(success_metrics.Response, 'evaluate_stats') as mock_evaluate:
+                def mock_evaluate_func(df, stats):
                     # Add multiple rows to ensure StatsSingle doesn't return empty
                     # Use correct column names that match names.param2filename format
                     df['Key=Response'] = [90.0, 85.0]  # Main response values
@@ -301,6 +301,49 @@ class TestWorkflowIntegration:
             assert param_sets[0] == ('0.5', '10')
 
 
+class TestOnlineIngestIntegration:
+    """Test feeding batches of raw results to stochastic_benchmark."""
+
+    def test_ingest_updates_bs_results(self):
+        """Test that every batch updates the bootstrapped results."""
+        import stochastic_benchmark
+        from collections import defaultdict
+
+        shared_args = {
+            'response_col': 'energy',
+            'resource_col': 'time',
+            'response_dir': -1,
+            'confidence_level': 68,
+            'random_value': 0.0,
+            'best_value': -10.0,
+        }
+        metric_args = defaultdict(lambda: None)
+        metric_args['Response'] = {'opt_sense': -1}
+        bs_params = bootstrap.BootstrapParameters(
+            shared_args=shared_args,
+            update_rule=lambda bs_params, df: None,
+            metric_args=metric_args,
+            success_metrics=[success_metrics.Response, success_metrics.Resource],
+            bootstrap_iterations=50,
+        )
+        bs_params_list = list(bootstrap.BSParams_range_iter()(bs_params, [1, 4]))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sb = stochastic_benchmark.stochastic_benchmark(['sweep'], here=tmp_dir)
+            batch = pd.DataFrame({
+                'energy': [-1.0, -2.0, -3.0],
+                'time': [1.0, 1.0, 1.0],
+                'sweep': [10, 10, 20],
+                'instance': [0, 0, 0],
+            })
+            first = sb.ingest(batch, bs_params_list)
+            assert len(first) == 4
+            second = sb.ingest(batch.assign(instance=1))
+            assert len(second) == 8
+            assert sb.bs_results is second
+            assert list(second.columns[:2]) == ['sweep', 'instance']
+
+
 class TestPathsIntegration:
     """Test that paths class integrates well with file operations."""
     
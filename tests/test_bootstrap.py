@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import tempfile
 import os
+import json
 from collections import defaultdict
 from unittest.mock import patch, MagicMock
 import copy
@@ -19,12 +20,24 @@ from bootstrap import (
     BSParams_range_iter,
     initBootstrap,
     BootstrapSingle,
+    BootstrapSingleLevels,
+    BootstrapPlan,
+    ReferenceTable,
     Bootstrap,
+    Bootstrap_group_major,
     Bootstrap_reduce_mem,
+    SharedGroups,
+    AliasTable,
+    OnlineBootstrap,
+    GridLevels,
+    RaceParameters,
+    race,
     EPSILON,
     confidence_level,
     gap
 )
+import bootstrap
+import names
 import success_metrics
 
 
@@ -392,6 +405,53 @@ class TestInitBootstrap:
         update_rule_mock.assert_called_once_with(params, df)
 
 
+class TestAliasSampler:
+    """Test class for the alias-method weighted sampler."""
+
+    def test_alias_table_distribution(self):
+        """Test that draws follow the normalized weights."""
+        weights = np.array([5.0, 0.0, 1.0, 3.0, 1.0])
+        np.random.seed(0)
+        draws = AliasTable(weights).draw((200, 500))
+        assert draws.shape == (200, 500)
+        freqs = np.bincount(draws.ravel(), minlength=5) / draws.size
+        np.testing.assert_allclose(freqs, weights / weights.sum(), atol=0.005)
+        assert freqs[1] == 0.0
+
+    def test_alias_table_uniform(self):
+        """Test that equal weights keep every column."""
+        table = AliasTable(np.full(4, 2.0))
+        np.testing.assert_array_equal(table.prob, np.ones(4))
+
+    def test_alias_table_cached_across_levels(self):
+        """Test that the table of a group is built once for every downsample level."""
+        df = pd.DataFrame({'energy': [1.0, 2.0, 3.0], 'time': [1.0, 1.0, 1.0], 'count': [7, 1, 2]})
+        shared_args = {'response_col': 'energy', 'resource_col': 'time'}
+        with patch('bootstrap.AliasTable', wraps=AliasTable) as mock_table, \
+                patch('numpy.random.choice') as mock_choice:
+            for downsample in [1, 2, 5]:
+                params = BootstrapParameters(
+                    shared_args=shared_args,
+                    update_rule=dummy_update_rule,
+                    agg='count',
+                    sampler='alias',
+                    downsample=downsample,
+                    bootstrap_iterations=4,
+                )
+                responses, _ = initBootstrap(df, params)
+                assert responses.shape == (downsample, 4)
+        mock_table.assert_called_once()
+        mock_choice.assert_not_called()
+
+    def test_unsupported_sampler_warns(self):
+        """Test that an unknown sampler falls back to choice."""
+        with pytest.warns(UserWarning, match="Unsupported sampler"):
+            params = BootstrapParameters(
+                shared_args={}, update_rule=dummy_update_rule, sampler='bogus'
+            )
+        assert params.sampler == 'choice'
+
+
 class TestBootstrapSingle:
     """Test class for BootstrapSingle function."""
     
@@ -494,6 +554,1431 @@ class TestBootstrapSingle:
             mock_instance2.evaluate.assert_called_once()
 
 
+def serial_pool():
+    """Pool replacement that maps in the calling process."""
+    pool = MagicMock()
+    pool.return_value.__enter__.return_value.map.side_effect = lambda f, it: list(map(f, it))
+    pool.return_value.__enter__.return_value.imap_unordered.side_effect = (
+        lambda f, it, chunksize=1: map(f, it)
+    )
+    return pool
+
+
+def serial_pool_with_initializer():
+    """Pool replacement that runs the initializer and maps in the calling process."""
+    def make_pool(*args, initializer=None, initargs=(), **kwargs):
+        if initializer is not None:
+            initializer(*initargs)
+        pool = MagicMock()
+        pool.__enter__.return_value.imap_unordered.side_effect = (
+            lambda f, it, chunksize=1: map(f, it)
+        )
+        return pool
+    return MagicMock(side_effect=make_pool)
+
+
+def level_params(**kwargs):
+    """Bootstrap parameters with every default metric for level tests."""
+    shared_args = {
+        'response_col': 'energy',
+        'resource_col': 'time',
+        'response_dir': -1,
+        'confidence_level': 68,
+        'random_value': 0.0,
+        'best_value': -10.0,
+    }
+    metric_args = {
+        'Response': {'opt_sense': -1},
+        'SuccessProb': {'gap': 10.0},
+        'RTT': {'fail_value': np.nan, 'RTT_factor': 1.0, 'gap': 10.0, 's': 0.99},
+    }
+    sms = [
+        success_metrics.Response,
+        success_metrics.PerfRatio,
+        success_metrics.InvPerfRatio,
+        success_metrics.SuccessProb,
+        success_metrics.Resource,
+        success_metrics.RTT,
+    ]
+    return BootstrapParameters(
+        shared_args=shared_args,
+        update_rule=dummy_update_rule,
+        metric_args=metric_args,
+        success_metrics=sms,
+        **kwargs
+    )
+
+
+def params_range(boots, params=None, **kwargs):
+    """Parameters of every downsample level in boots, from params or level_params(**kwargs)."""
+    if params is None:
+        params = level_params(**kwargs)
+    return list(BSParams_range_iter()(params, boots))
+
+
+def make_reads(seed, size, energies=None, times=None, sweeps=None, instances=None, **cols):
+    """
+    Seeded reads for bootstrap tests.
+
+    Energies are drawn from the negated energies (integers 0 to 10 by default) and times
+    from times (uniform in [1, 2) by default, or a constant). sweeps are repeated and
+    range(instances) tiled over the rows. Extra cols are values or functions of the rng,
+    drawn in order.
+    """
+    rng = np.random.default_rng(seed)
+    if energies is None:
+        energy = -rng.integers(0, 11, size=size).astype(float)
+    else:
+        energy = -rng.choice(energies, size=size)
+    if times is None:
+        time = rng.uniform(1, 2, size=size)
+    else:
+        time = np.full(size, times, dtype=float)
+    df = pd.DataFrame({'energy': energy, 'time': time})
+    if sweeps is not None:
+        df['sweep'] = np.repeat(sweeps, size // len(sweeps))
+    if instances is not None:
+        df['instance'] = np.tile(np.arange(instances), size // instances)
+    for col, values in cols.items():
+        df[col] = values(rng) if callable(values) else values
+    return df
+
+
+class TestBootstrapSingleLevels:
+    """Test class for BootstrapSingleLevels function."""
+
+    def test_levels_match_bootstrap_single_on_shared_resample(self):
+        """Test that every level equals BootstrapSingle on the first rows of the resample."""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'energy': -rng.integers(0, 11, size=50).astype(float),
+            'time': rng.uniform(1, 2, size=50),
+        })
+        resamples = rng.integers(0, len(df), size=(8, 40))
+        boots = [1, 2, 5, 8]
+        params = level_params(bootstrap_iterations=40)
+
+        with patch('numpy.random.randint', return_value=resamples):
+            levels_df = BootstrapSingleLevels(df, params, boots)
+
+        assert list(levels_df['boots']) == boots
+        for i, n in enumerate(boots):
+            single_params = level_params(bootstrap_iterations=40, downsample=n)
+            with patch('numpy.random.randint', return_value=resamples[:n]):
+                single_df = BootstrapSingle(df, single_params)
+            for col in single_df.columns:
+                np.testing.assert_allclose(
+                    levels_df[col].iloc[i], single_df[col].iloc[0], err_msg=col
+                )
+
+    def test_levels_skip_zero_downsample(self):
+        """Test that levels without draws are skipped."""
+        df = pd.DataFrame({'energy': [-1.0, -2.0, -3.0], 'time': [1.0, 1.0, 1.0]})
+        params = level_params(bootstrap_iterations=5)
+
+        levels_df = BootstrapSingleLevels(df, params, [0, 1, 3])
+        assert list(levels_df['boots']) == [1, 3]
+
+        assert BootstrapSingleLevels(df, params, [0]).empty
+
+    def test_levels_keep_cols(self):
+        """Test that keep_cols are copied to every level."""
+        df = pd.DataFrame({
+            'energy': [-1.0, -2.0, -3.0],
+            'time': [1.0, 1.0, 1.0],
+            'param1': ['A', 'A', 'A'],
+        })
+        params = level_params(bootstrap_iterations=5, keep_cols=['param1'])
+
+        levels_df = BootstrapSingleLevels(df, params, [1, 2, 3])
+        assert list(levels_df['param1']) == ['A', 'A', 'A']
+
+
+class TestBootstrapPlan:
+    """Test class for BootstrapPlan."""
+
+    def make_df(self):
+        return pd.DataFrame({
+            'energy': [-1.0, -3.0, -2.0, -5.0, -4.0, -4.0],
+            'time': [1.0, 2.0, 1.0, 1.0, 3.0, 1.0],
+            'group': ['A', 'A', 'B', 'B', 'C', 'C'],
+        })
+
+    @staticmethod
+    def best_value_rule(bs_params, df):
+        bs_params.shared_args['best_value'] = df['energy'].min()
+        bs_params.metric_args['RTT']['RTT_factor'] = df['time'].sum()
+
+    def test_compile_reference_table(self):
+        """Test that the table holds the reference values of every group."""
+        params = level_params(bootstrap_iterations=5)
+        params.update_rule = self.best_value_rule
+        plan = BootstrapPlan.compile(params, self.make_df().groupby(['group']))
+
+        assert set(plan.reference) == {'A', 'B', 'C'}
+        shared_args, metric_args = plan.reference['B']
+        assert shared_args['best_value'] == -5.0
+        assert metric_args['RTT']['RTT_factor'] == 2.0
+        # The parameters of the run are left untouched
+        assert params.shared_args['best_value'] == -10.0
+        assert params.metric_args['RTT']['RTT_factor'] == 1.0
+
+    def test_bind_updates_metric_objects(self):
+        """Test that binding a group swaps its values into the same metric objects."""
+        params = level_params(bootstrap_iterations=5)
+        params.update_rule = self.best_value_rule
+        df = self.make_df()
+        plan = BootstrapPlan.compile(params, df.groupby(['group']))
+        fused = plan.fused
+
+        for key, df_single in df.groupby(['group']):
+            assert plan.bind(df_single, key) is fused
+            rtt = [m for m in fused.metrics if isinstance(m, success_metrics.RTT)][0]
+            assert rtt.shared_args['best_value'] == df_single['energy'].min()
+            assert rtt.args['RTT_factor'] == df_single['time'].sum()
+
+    def test_update_rule_once_per_group(self):
+        """Test that a per-level bootstrap applies update_rule once per group."""
+        df = self.make_df()
+        calls = []
+
+        def update_rule(bs_params, df_single):
+            calls.append(df_single['group'].iloc[0])
+            self.best_value_rule(bs_params, df_single)
+
+        params = level_params(bootstrap_iterations=5, seed=3)
+        params.update_rule = update_rule
+        params_list = params_range([1, 2, 3], params)
+        with patch('bootstrap.Pool', serial_pool()):
+            result = Bootstrap(df, ['group'], params_list)
+
+        assert sorted(calls) == ['A', 'B', 'C']
+        assert len(result) == 9
+
+    def test_matches_uncompiled_bootstrap(self):
+        """Test that a compiled plan gives the results of a per-group update_rule."""
+        df = self.make_df()
+        params = level_params(bootstrap_iterations=20, seed=5, downsample=2)
+        params.update_rule = self.best_value_rule
+        plan = BootstrapPlan.compile(params, df.groupby(['group']))
+
+        for key, df_single in df.groupby(['group']):
+            df_single = bootstrap._with_group_key(df_single, key)
+            compiled = BootstrapSingle(df_single, params, plan)
+            uncompiled = BootstrapSingle(df_single, copy.deepcopy(params))
+            pd.testing.assert_frame_equal(compiled, uncompiled)
+
+    @pytest.mark.parametrize("make_iter", [
+        lambda params: BSParams_range_iter()(params, [1, 2]),
+        lambda params: BSParams_iter()(params, 2),
+    ])
+    def test_iterators_copy_arguments(self, make_iter):
+        """Test that every level owns its argument dicts."""
+        params = level_params()
+        params.shared_args['best_value'] = 1.0
+        params.metric_args['RTT'] = {'fail_value': np.nan, 'RTT_factor': 1.0}
+        first, second = list(make_iter(params))
+        assert first.shared_args == params.shared_args
+        assert first.metric_args['RTT'] == params.metric_args['RTT']
+
+        first.shared_args['best_value'] = 2.0
+        first.metric_args['RTT']['RTT_factor'] = 2.0
+        first.default_update(make_reads(0, 10))
+        assert second.shared_args['best_value'] == 1.0
+        assert second.metric_args['RTT']['RTT_factor'] == 1.0
+        assert params.shared_args['best_value'] == 1.0
+        assert params.metric_args['RTT']['RTT_factor'] == 1.0
+
+
+class TestReferenceTable:
+    """Test class for ReferenceTable."""
+
+    def make_df(self):
+        return make_reads(2, 24, energies=[1.0, 4.0, 8.0], sweeps=[10, 100], instances=3)
+
+    def test_from_data_matches_default_update(self):
+        """Test that a table keyed by the group columns holds the values of default_update."""
+        df = self.make_df()
+        params = level_params()
+        group_on = ['sweep', 'instance']
+        table = ReferenceTable.from_data(df, group_on, params.shared_args, group_on=group_on)
+
+        for key, df_single in df.groupby(group_on):
+            params.default_update(df_single)
+            row = table.row(key)
+            assert row['best_value'] == params.shared_args['best_value']
+            assert row['RTT_factor'] == pytest.approx(params.metric_args['RTT']['RTT_factor'])
+
+    def test_from_data_by_instance(self):
+        """Test that a table keyed by instance holds the best of every parameter set."""
+        df = self.make_df()
+        params = level_params()
+        table = ReferenceTable.from_data(df, ['instance'], params.shared_args)
+        assert list(table.values.columns) == ['best_value']
+
+        by_group = ReferenceTable.from_data(
+            df, ['instance'], params.shared_args, group_on=['sweep', 'instance']
+        )
+        for instance, df_single in df.groupby('instance'):
+            row = by_group.row((instance,))
+            assert row['best_value'] == table.row((instance,))['best_value']
+            assert row['best_value'] == df_single['energy'].min()
+            # The mean resource of a group, not the sum over both sweeps
+            group_factors = 1e-6 * df_single.groupby('sweep')['time'].sum()
+            assert row['RTT_factor'] == pytest.approx(group_factors.mean())
+
+    def test_from_data_rejects_other_columns(self):
+        """Test that RTT_factor needs the table columns to be group columns."""
+        df = self.make_df()
+        with pytest.raises(ValueError, match="not group columns"):
+            ReferenceTable.from_data(
+                df, ['instance'], level_params().shared_args, group_on=['sweep']
+            )
+
+    def test_from_data_multi_response(self):
+        """Test best values of several responses, keyed by response column."""
+        df = self.make_df()
+        df['ratio'] = df['energy'] / -8.0
+        params = level_params()
+        params.shared_args['response_col'] = ['energy', 'ratio']
+        params.shared_args['response_dir'] = {'energy': -1, 'ratio': 1}
+        table = ReferenceTable.from_data(df, ['instance'], params.shared_args)
+
+        for instance, df_single in df.groupby('instance'):
+            params.default_update(df_single)
+            assert table.row((instance,))['best_value'] == params.shared_args['best_value']
+
+    def test_from_data_weights_agg(self):
+        """Test that compressed rows weigh the total resource by their read counts."""
+        df = self.make_df()
+        params = level_params()
+        compressed = (
+            df.groupby(['energy', 'time', 'sweep', 'instance']).size().reset_index(name='count')
+        )
+        group_on = ['sweep', 'instance']
+        expected = ReferenceTable.from_data(df, ['instance'], params.shared_args, group_on=group_on)
+        table = ReferenceTable.from_data(
+            pd.concat([compressed] * 2), ['instance'], params.shared_args, agg='count',
+            group_on=group_on,
+        )
+        for instance in range(3):
+            row, expected_row = table.row((instance,)), expected.row((instance,))
+            assert row['best_value'] == expected_row['best_value']
+            assert row['RTT_factor'] == pytest.approx(2 * expected_row['RTT_factor'])
+
+    def test_from_file(self):
+        """Test reading ground truth values from a pickle or csv file."""
+        gt = pd.DataFrame({'instance': [0, 1], 'GTMinEnergy': [-9.0, -7.0], 'other': [1, 2]})
+        with tempfile.TemporaryDirectory() as tmp:
+            for filename in ['gt.pkl', 'gt.csv']:
+                filename = os.path.join(tmp, filename)
+                if filename.endswith('.csv'):
+                    gt.to_csv(filename, index=False)
+                else:
+                    gt.to_pickle(filename)
+                table = ReferenceTable.from_file(
+                    filename, ['instance'], {'GTMinEnergy': 'best_value'}
+                )
+                assert list(table.values.columns) == ['best_value']
+                assert table.row((1,)) == {'best_value': -7.0}
+
+    def test_missing_instance(self):
+        """Test that instances without reference values raise a KeyError."""
+        table = ReferenceTable(['instance'], pd.DataFrame({'instance': [0], 'best_value': [1.0]}))
+        with pytest.raises(KeyError):
+            table.row((5,))
+
+    def test_apply(self):
+        """Test that metric columns go to their metric and the others to shared_args."""
+        params = level_params()
+        table = ReferenceTable(['instance'], pd.DataFrame({'instance': [0]}))
+        table.apply(params, {'best_value': -3.0, 'RTT_factor': 2.0})
+        assert params.shared_args['best_value'] == -3.0
+        assert params.metric_args['RTT']['RTT_factor'] == 2.0
+
+    @pytest.mark.parametrize("kwargs", [{}, {'group_major': True}, {'shared_memory': True}])
+    def test_bootstrap_matches_update_rule(self, kwargs):
+        """Test that a reference table gives the results of the equivalent update_rule."""
+        df = self.make_df()
+        group_on = ['sweep', 'instance']
+        results = []
+        for use_table in [False, True]:
+            params = level_params(bootstrap_iterations=20, seed=1)
+            if use_table:
+                params.reference = ReferenceTable.from_data(df, ['instance'], params.shared_args)
+            else:
+                def update_rule(bs_params, df_single):
+                    instance = df_single.attrs['group_key'][1]
+                    best_value = df.loc[df['instance'] == instance, 'energy'].min()
+                    bs_params.shared_args['best_value'] = best_value
+                params.update_rule = update_rule
+            params_list = params_range([1, 3], params)
+            with patch('bootstrap.Pool', serial_pool()):
+                results.append(Bootstrap(df, group_on, params_list, **kwargs))
+        pd.testing.assert_frame_equal(results[0], results[1])
+
+
+    def test_group_table_matches_default_update(self):
+        """Test that a table keyed by the group columns reproduces default_update."""
+        df = self.make_df()
+        group_on = ['sweep', 'instance']
+        results = []
+        for use_table in [False, True]:
+            params = level_params(bootstrap_iterations=20, seed=1)
+            if use_table:
+                params.reference = ReferenceTable.from_data(
+                    df, group_on, params.shared_args, group_on=group_on
+                )
+            else:
+                params.update_rule = lambda bs_params, df_single: bs_params.default_update(df_single)
+            params_list = params_range([1, 3], params)
+            with patch('bootstrap.Pool', serial_pool()):
+                results.append(Bootstrap(df, group_on, params_list, group_major=True))
+        pd.testing.assert_frame_equal(results[0], results[1])
+
+
+class TestMultiResponse:
+    """Test class for bootstraps of several response columns."""
+
+    def make_df(self):
+        df = make_reads(6, 40, energies=[1.0, 4.0, 8.0], instances=2)
+        df['ratio'] = df['energy'] / -8.0
+        return df
+
+    def params(self, response_col, **kwargs):
+        params = level_params(bootstrap_iterations=30, seed=2, **kwargs)
+        params.shared_args['response_col'] = response_col
+        if isinstance(response_col, list):
+            params.shared_args['response_dir'] = {'energy': -1, 'ratio': 1}
+            params.shared_args['best_value'] = {'energy': -8.0, 'ratio': 1.0}
+            params.metric_args['Response']['opt_sense'] = {'energy': -1, 'ratio': 1}
+        elif response_col == 'energy':
+            params.shared_args['best_value'] = -8.0
+        elif response_col == 'ratio':
+            params.shared_args['response_dir'] = 1
+            params.shared_args['best_value'] = 1.0
+            params.metric_args['Response']['opt_sense'] = 1
+        return params
+
+    @pytest.mark.parametrize("method", ['resample', 'exact', 'multinomial'])
+    def test_matches_single_responses(self, method):
+        """Test that each response gets the results of its own bootstrap."""
+        df = self.make_df()
+        group_on = ['instance']
+        with patch('bootstrap.Pool', serial_pool()):
+            multi = Bootstrap(
+                df, group_on,
+                params_range([1, 4], self.params(['energy', 'ratio'], method=method)),
+                group_major=True,
+            )
+            # Multinomial counts follow the order of the distinct outcomes, which is
+            # only the same for the first response
+            cols = ['energy'] if method == 'multinomial' else ['energy', 'ratio']
+            for col in cols:
+                single = Bootstrap(
+                    df, group_on,
+                    params_range([1, 4], self.params(col, method=method)),
+                    group_major=True,
+                )
+                for single_col in single.columns:
+                    multi_col = single_col
+                    if 'Key=' in single_col:
+                        multi_col = '{}_Response={}'.format(single_col, col)
+                    np.testing.assert_allclose(
+                        multi[multi_col].values.astype(float),
+                        single[single_col].values.astype(float),
+                        err_msg=multi_col,
+                    )
+
+    def test_per_level_shares_resample(self):
+        """Test that the per-level bootstrap draws one resample for every response."""
+        df = self.make_df()
+        params_list = params_range([3], self.params(['energy', 'ratio']))
+        with patch('bootstrap.Pool', serial_pool()):
+            result = Bootstrap(df, ['instance'], params_list)
+        # ratio is a decreasing function of energy, so its best is the energy's best
+        np.testing.assert_allclose(
+            result['Key=Response_Response=ratio'], result['Key=Response_Response=energy'] / -8.0
+        )
+
+    def test_default_update(self):
+        """Test that default_update sets the best value of every response."""
+        df = self.make_df()
+        params = self.params(['energy', 'ratio'])
+        params.default_update(df)
+        assert params.shared_args['best_value'] == {'energy': -8.0, 'ratio': 1.0}
+
+
+class TestExactMethod:
+    """Test the exact bootstrap method."""
+
+    def test_unsupported_method_warns(self):
+        """Test that an unknown method falls back to resampling."""
+        with pytest.warns(UserWarning):
+            params = level_params(method='bogus')
+        assert params.method == 'resample'
+
+    def test_exact_levels_skip_resampling(self):
+        """Test that no resample is drawn when every metric is exact."""
+        df = pd.DataFrame({'energy': [-1.0, -5.0, -10.0], 'time': [1.0, 1.0, 1.0]})
+        params = level_params(method='exact')
+        params.success_metrics = [success_metrics.Response, success_metrics.PerfRatio]
+
+        with patch('bootstrap._resample_indices') as mock_resample:
+            levels_df = BootstrapSingleLevels(df, params, [1, 2])
+        mock_resample.assert_not_called()
+
+        response = levels_df[names.param2filename({"Key": "Response"}, "")]
+        np.testing.assert_allclose(response, [-16 / 3, -(1 + 5 * 3 + 10 * 5) / 9])
+
+    def test_exact_levels_mixed_metrics(self):
+        """Test that metrics without an exact form still use the resample."""
+        df = pd.DataFrame({'energy': [-1.0, -5.0, -10.0], 'time': [1.0, 2.0, 3.0]})
+        params = level_params(method='exact', bootstrap_iterations=20)
+
+        levels_df = BootstrapSingleLevels(df, params, [1, 3])
+        assert names.param2filename({"Key": "MeanTime"}, "") in levels_df.columns
+        assert names.param2filename({"Key": "PerfRatio"}, "") in levels_df.columns
+
+    def test_bootstrap_single_exact(self):
+        """Test that BootstrapSingle evaluates its downsample level exactly."""
+        df = pd.DataFrame({'energy': [-1.0, -5.0, -10.0], 'time': [1.0, 1.0, 1.0]})
+        params = level_params(method='exact', downsample=2)
+        params.success_metrics = [success_metrics.Response]
+
+        bs_df = BootstrapSingle(df, params)
+        assert 'boots' not in bs_df.columns
+        assert bs_df[names.param2filename({"Key": "Response"}, "")].iloc[0] == pytest.approx(-66 / 9)
+
+
+class TestMultinomialMethod:
+    """Test class for the count-based multinomial bootstrap."""
+
+    def test_multinomial_counts_nested(self):
+        """Test that level counts sum to the level and grow with it."""
+        from bootstrap import _multinomial_counts
+        counts = _multinomial_counts(np.array([1.0, 3.0, 6.0]), np.array([5, 2, 9]), 20)
+        assert counts.shape == (3, 20, 3)
+        np.testing.assert_array_equal(counts.sum(axis=-1), [[5] * 20, [2] * 20, [9] * 20])
+        assert (counts[0] >= counts[1]).all() and (counts[2] >= counts[0]).all()
+
+    def test_multinomial_matches_resample(self):
+        """Test compressed counts against resampling the uncompressed reads."""
+        rng = np.random.default_rng(6)
+        reads = pd.DataFrame({
+            'energy': -rng.choice([0.0, 5.0, 9.0, 10.0], size=400, p=[0.4, 0.3, 0.2, 0.1]),
+            'time': np.ones(400),
+        })
+        compressed = (
+            reads.groupby(['energy', 'time']).size().reset_index(name='count')
+        )
+        boots = [1, 4, 16]
+
+        np.random.seed(0)
+        expected = BootstrapSingleLevels(reads, level_params(bootstrap_iterations=4000), boots)
+        np.random.seed(0)
+        result = BootstrapSingleLevels(
+            compressed,
+            level_params(bootstrap_iterations=4000, agg='count', method='multinomial'),
+            boots,
+        )
+        for key in ['Response', 'SuccProb', 'MeanTime']:
+            col = names.param2filename({'Key': key}, '')
+            np.testing.assert_allclose(result[col], expected[col], rtol=0.05, atol=0.02)
+
+    def test_bootstrap_single_multinomial(self):
+        """Test that BootstrapSingle evaluates the downsample level from counts."""
+        df = pd.DataFrame({'energy': [-10.0, -10.0], 'time': [2.0, 2.0], 'count': [3, 1]})
+        params = level_params(method='multinomial', agg='count', downsample=3)
+        result = BootstrapSingle(df, params)
+        assert 'boots' not in result.columns
+        assert result[names.param2filename({'Key': 'Response'}, '')].iloc[0] == -10.0
+        assert result[names.param2filename({'Key': 'MeanTime'}, '')].iloc[0] == 2.0
+
+    def test_default_update_weights_agg(self):
+        """Test that RTT_factor counts every read of a compressed row."""
+        df = pd.DataFrame({'energy': [-10.0, -8.0], 'time': [2.0, 5.0], 'count': [3, 1]})
+        params = level_params(method='multinomial', agg='count')
+        params.default_update(df)
+        assert params.metric_args['RTT']['RTT_factor'] == pytest.approx(1e-6 * 11.0)
+
+    @pytest.mark.parametrize("agg", [None, 'count'])
+    def test_default_update_without_repeated_reads(self, agg):
+        """Test that RTT_factor keeps its value without agg or with single-read rows."""
+        df = pd.DataFrame({'energy': [-10.0, -8.0], 'time': [2.0, 5.0], 'count': [1, 1]})
+        params = level_params(agg=agg)
+        params.default_update(df)
+        assert params.metric_args['RTT']['RTT_factor'] == pytest.approx(1e-6 * 7.0)
+
+    def test_counts_within_memory_budget(self):
+        """Test that multinomial counts are drawn in blocks that fit memory_budget."""
+        df = pd.DataFrame({
+            'energy': -np.arange(10, dtype=float),
+            'time': np.ones(10),
+            'count': np.arange(1, 11),
+        })
+        boots = [1, 4, 16]
+        # 3 levels of 11 counts and cumulative sums of 8 bytes per iteration
+        params = level_params(
+            method='multinomial', agg='count', bootstrap_iterations=100,
+            memory_budget=2 * 8 * 3 * 11 * 30,
+        )
+        with patch('bootstrap._multinomial_counts', wraps=bootstrap._multinomial_counts) as draws:
+            result = BootstrapSingleLevels(df, params, boots)
+
+        assert [c.args[2] for c in draws.call_args_list] == [30, 30, 30, 10]
+        expected = BootstrapSingleLevels(
+            df, level_params(method='multinomial', agg='count', bootstrap_iterations=100), boots
+        )
+        col = names.param2filename({'Key': 'Response'}, '')
+        np.testing.assert_allclose(result[col], expected[col], atol=1.0)
+
+
+class TestBayesianMeans:
+    """Test class for the Dirichlet-weighted mean scheme."""
+
+    def test_bayesian_matches_resample(self):
+        """Test Bayesian mean resources against resampling the resources."""
+        rng = np.random.default_rng(7)
+        df = pd.DataFrame({
+            'energy': -rng.integers(0, 11, size=200).astype(float),
+            'time': rng.exponential(2.0, size=200),
+        })
+        boots = [4, 16, 64]
+        col = names.param2filename({'Key': 'MeanTime'}, '')
+        lower = names.param2filename({'Key': 'MeanTime', 'ConfInt': 'lower'}, '')
+        upper = names.param2filename({'Key': 'MeanTime', 'ConfInt': 'upper'}, '')
+
+        np.random.seed(0)
+        expected = BootstrapSingleLevels(df, level_params(bootstrap_iterations=4000), boots)
+        np.random.seed(0)
+        result = BootstrapSingleLevels(
+            df, level_params(bootstrap_iterations=4000, mean_scheme='bayesian'), boots
+        )
+        np.testing.assert_allclose(result[col], expected[col], rtol=0.03)
+        # The Dirichlet spread is narrower by sqrt(n / (n + 1)), so skip the smallest level
+        np.testing.assert_allclose(result[lower][1:], expected[lower][1:], rtol=0.05)
+        np.testing.assert_allclose(result[upper][1:], expected[upper][1:], rtol=0.05)
+        # Metrics of the responses do not depend on the mean scheme
+        succ = names.param2filename({'Key': 'SuccProb'}, '')
+        np.testing.assert_allclose(result[succ], expected[succ])
+
+    def test_bayesian_seeded(self):
+        """Test that seeded Bayesian means are reproducible."""
+        df = pd.DataFrame({'energy': [-10.0, -5.0, 0.0], 'time': [1.0, 2.0, 4.0]})
+        params = level_params(seed=3, mean_scheme='bayesian', bootstrap_iterations=50)
+        first = BootstrapSingleLevels(df, params, [1, 3])
+        second = BootstrapSingleLevels(df, params, [1, 3])
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_bayesian_multinomial(self):
+        """Test Bayesian means of aggregated counts."""
+        df = pd.DataFrame({'energy': [-10.0, -5.0], 'time': [1.0, 3.0], 'count': [1, 3]})
+        params = level_params(
+            method='multinomial', agg='count', mean_scheme='bayesian',
+            bootstrap_iterations=4000, downsample=8,
+        )
+        np.random.seed(0)
+        result = BootstrapSingle(df, params)
+        col = names.param2filename({'Key': 'MeanTime'}, '')
+        np.testing.assert_allclose(result[col].iloc[0], 2.5, rtol=0.02)
+
+    def test_bayesian_skips_resource_gather(self):
+        """Test that only the means of the resources reach the metrics."""
+        df = pd.DataFrame({'energy': [-10.0, -5.0, 0.0], 'time': [1.0, 2.0, 4.0]})
+        params = level_params(mean_scheme='bayesian', bootstrap_iterations=10)
+        with patch('success_metrics.ResampleStats', wraps=success_metrics.ResampleStats) as stats:
+            BootstrapSingleLevels(df, params, [2])
+        assert stats.call_args.args[1] is None
+
+    def test_invalid_mean_scheme_warns(self):
+        """Test that an unknown mean scheme falls back to resample."""
+        with pytest.warns(UserWarning, match="Unsupported mean scheme"):
+            params = level_params(mean_scheme='jackknife')
+        assert params.mean_scheme == 'resample'
+
+
+class TestMemoryBudget:
+    """Test class for resamples drawn in blocks that fit a memory budget."""
+
+    def sliced_draws(self, resamples):
+        """_resample_indices replacement returning consecutive column blocks of resamples."""
+        position = [0]
+
+        def draw(df, bs_params, downsample, iterations=None, rng=None):
+            block = resamples[:downsample, position[0]:position[0] + iterations]
+            position[0] += iterations
+            return block
+        return draw
+
+    def make_df(self):
+        return make_reads(3, 50, energy2=lambda rng: rng.uniform(-5, 0, size=50))
+
+    def test_blocks_match_single_draw(self):
+        """Test that blocked evaluation equals evaluating the whole resample."""
+        df = self.make_df()
+        resamples = np.random.default_rng(0).integers(0, len(df), size=(16, 100))
+        boots = [1, 4, 16]
+
+        with patch('bootstrap._resample_indices', self.sliced_draws(resamples)):
+            expected = BootstrapSingleLevels(df, level_params(bootstrap_iterations=100), boots)
+        # 16 rows of 4 draws of 8 bytes per iteration: blocks of 7 iterations
+        params = level_params(bootstrap_iterations=100, memory_budget=16 * 4 * 8 * 7)
+        with patch('bootstrap._resample_indices', wraps=self.sliced_draws(resamples)) as draws:
+            result = BootstrapSingleLevels(df, params, boots)
+
+        assert draws.call_count == 15
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_blocks_evaluate_once(self):
+        """Test that blocks are only cached and the metrics evaluated once."""
+        df = self.make_df()
+        params = level_params(bootstrap_iterations=100, memory_budget=16 * 4 * 8 * 7)
+        evaluate = success_metrics.FusedMetrics.evaluate
+        with patch.object(
+            success_metrics.FusedMetrics, 'evaluate', autospec=True, side_effect=evaluate
+        ) as evaluations:
+            BootstrapSingleLevels(df, params, [1, 4, 16])
+        assert evaluations.call_count == 1
+        stats = evaluations.call_args.kwargs['stats']
+        assert isinstance(stats, success_metrics.StackedStats)
+        assert len(stats.blocks) == 15
+
+    def test_blocks_multi_response(self):
+        """Test blocked evaluation of several responses."""
+        df = self.make_df()
+        resamples = np.random.default_rng(1).integers(0, len(df), size=(8, 40))
+
+        def params(**extra):
+            bs_params = level_params(bootstrap_iterations=40, **extra)
+            bs_params.shared_args['response_col'] = ['energy', 'energy2']
+            bs_params.shared_args['best_value'] = {'energy': -10.0, 'energy2': -5.0}
+            return bs_params
+
+        with patch('bootstrap._resample_indices', self.sliced_draws(resamples)):
+            expected = BootstrapSingleLevels(df, params(), [2, 8])
+        with patch('bootstrap._resample_indices', self.sliced_draws(resamples)):
+            result = BootstrapSingleLevels(df, params(memory_budget=8 * 5 * 8 * 3), [2, 8])
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_bootstrap_single_memory_budget(self):
+        """Test that BootstrapSingle evaluates its level in blocks."""
+        df = self.make_df()
+        params = level_params(bootstrap_iterations=30, downsample=10, memory_budget=10 * 4 * 8)
+        with patch('bootstrap._resample_indices', wraps=bootstrap._resample_indices) as draws:
+            result = BootstrapSingle(df, params)
+        assert draws.call_count == 30
+        assert 'boots' not in result.columns
+        assert len(result) == 1
+
+    def test_invalid_memory_budget_warns(self):
+        """Test that a non-positive memory budget is disabled."""
+        with pytest.warns(UserWarning, match="Memory budget"):
+            params = level_params(memory_budget=0)
+        assert params.memory_budget is None
+
+
+    def test_level_metrics_disable_budget(self):
+        """Test that a budget is disabled with a warning for metrics without evaluate_stats."""
+
+        class LevelResponse(success_metrics.SuccessMetrics):
+            def evaluate(self, bs_df, responses, resources):
+                bs_df['Key=Level'] = np.mean(np.min(responses, axis=0))
+
+        params = level_params(memory_budget=1000)
+        assert params.memory_budget == 1000
+        with pytest.warns(UserWarning, match="cannot be honored.*LevelResponse"):
+            params = BootstrapParameters(
+                shared_args=params.shared_args,
+                update_rule=dummy_update_rule,
+                success_metrics=params.success_metrics + [LevelResponse],
+                memory_budget=1000,
+            )
+        assert params.memory_budget is None
+
+
+class TestFloat32:
+    """Test class for resamples gathered in float32."""
+
+    def make_df(self):
+        df = make_reads(5, 40, count=lambda rng: rng.integers(1, 4, size=40))
+        df['energy'] += np.linspace(0, 0.1, 40)  # Not representable in float32
+        return df
+
+    @pytest.mark.parametrize("kwargs", [{}, {'method': 'multinomial', 'agg': 'count'}])
+    def test_float32_matches_float64(self, kwargs):
+        """Test that float32 resamples give the float64 results up to its precision."""
+        df = self.make_df()
+        results = []
+        for dtype in ['float64', 'float32']:
+            params = level_params(bootstrap_iterations=200, seed=2, dtype=dtype, **kwargs)
+            results.append(BootstrapSingleLevels(df, params, [1, 5, 20]))
+        expected, result = results
+        for col in expected.columns:
+            assert result[col].dtype == expected[col].dtype, col
+            np.testing.assert_allclose(result[col], expected[col], rtol=1e-5, err_msg=col)
+
+    def test_float32_gather(self):
+        """Test that the resample arrays are float32."""
+        params = level_params(bootstrap_iterations=10, dtype='float32')
+        with patch('success_metrics.ResampleStats', wraps=success_metrics.ResampleStats) as stats:
+            BootstrapSingleLevels(self.make_df(), params, [3])
+        responses, resources = stats.call_args.args[:2]
+        assert responses.dtype == np.float32 and resources.dtype == np.float32
+
+        responses, resources = initBootstrap(self.make_df(), level_params(downsample=3, dtype='float32'))
+        assert responses.dtype == np.float32 and resources.dtype == np.float32
+
+    def test_invalid_dtype_warns(self):
+        """Test that an unsupported dtype falls back to float64."""
+        with pytest.warns(UserWarning, match="Unsupported dtype"):
+            params = level_params(dtype='float16')
+        assert params.dtype == 'float64'
+
+
+class TestAdaptiveIterations:
+    """Test class for adaptive bootstrap iterations."""
+
+    def test_converged_group_stops_early(self):
+        """Test that a group with pinned metrics stops after two blocks."""
+        df = pd.DataFrame({'energy': [-10.0] * 5, 'time': [1.0] * 5})
+        params = level_params(bootstrap_iterations=1000, adaptive=True, adaptive_block=50)
+        result = BootstrapSingleLevels(df, params, [1, 4])
+        assert (result['iterations'] == 100).all()
+
+    def test_noisy_group_uses_every_iteration(self):
+        """Test that a tolerance that is never met uses bootstrap_iterations."""
+        df = pd.DataFrame({'energy': np.linspace(-10.0, 0.0, 11), 'time': np.ones(11)})
+        params = level_params(
+            bootstrap_iterations=230, adaptive=True, adaptive_block=50, adaptive_tol=1e-12
+        )
+        np.random.seed(0)
+        result = BootstrapSingleLevels(df, params, [1, 4])
+        assert (result['iterations'] == 230).all()
+
+    def test_adaptive_multinomial(self):
+        """Test adaptive blocks of count-based resamples."""
+        df = pd.DataFrame({'energy': [-10.0, -10.0], 'time': [1.0, 1.0]})
+        params = level_params(method='multinomial', adaptive=True, adaptive_block=10)
+        result = BootstrapSingleLevels(df, params, [2])
+        assert result['iterations'].iloc[0] == 20
+
+    def test_bootstrap_single_adaptive(self):
+        """Test that BootstrapSingle records the iterations used."""
+        df = pd.DataFrame({'energy': [-10.0, -5.0, 0.0], 'time': [1.0, 1.0, 1.0]})
+        params = level_params(adaptive=True, adaptive_block=20, bootstrap_iterations=100, downsample=2)
+        result = BootstrapSingle(df, params)
+        assert 'boots' not in result.columns
+        assert 40 <= result['iterations'].iloc[0] <= 100
+
+    def test_invalid_block_warns(self):
+        """Test that a non-positive block size is reset."""
+        with pytest.warns(UserWarning, match="Adaptive block size"):
+            params = level_params(adaptive=True, adaptive_block=0)
+        assert params.adaptive_block == 100
+
+
+class TestBootstrapGroupMajor:
+    """Test class for the group-major bootstrap engine."""
+
+    def test_group_major_output(self):
+        """Test one row per group and level with the group columns first."""
+        df = pd.DataFrame({
+            'energy': [-1.0, -2.0, -3.0, -4.0, -5.0, -6.0],
+            'time': [1.0, 2.0, 1.0, 2.0, 1.0, 2.0],
+            'group': ['A', 'A', 'A', 'B', 'B', 'B'],
+        })
+        params_list = params_range([1, 2, 4], bootstrap_iterations=10)
+
+        with patch('bootstrap.Pool', serial_pool()):
+            result = Bootstrap_group_major(df, ['group'], params_list)
+
+        assert len(result) == 6
+        assert result.columns[0] == 'group'
+        assert sorted(zip(result['group'], result['boots'])) == [
+            ('A', 1), ('A', 2), ('A', 4), ('B', 1), ('B', 2), ('B', 4)
+        ]
+
+    def test_bootstrap_dispatches_group_major(self):
+        """Test that Bootstrap(group_major=True) uses the group-major engine."""
+        df = pd.DataFrame({'energy': [-1.0, -2.0], 'time': [1.0, 1.0], 'group': ['A', 'A']})
+        params = level_params(bootstrap_iterations=10)
+
+        with patch('bootstrap.Bootstrap_group_major') as mock_group_major:
+            mock_group_major.return_value = pd.DataFrame()
+            Bootstrap(df, ['group'], [params], group_major=True)
+
+        mock_group_major.assert_called_once()
+
+    def test_group_major_empty_params(self):
+        """Test that no parameters give an empty result."""
+        df = pd.DataFrame({'energy': [-1.0], 'time': [1.0], 'group': ['A']})
+        assert Bootstrap_group_major(df, ['group'], []).empty
+
+
+class TestSharedGroups:
+    """Test class for shared memory data passing."""
+
+    def make_df(self):
+        return make_reads(2, 12, group=['B', 'A', 'C'] * 4, param1=['x', 'y', 'z'] * 4)
+
+    def test_groups_match_groupby(self):
+        """Test that every group is a view of the rows of the DataFrame group."""
+        df = self.make_df()
+        with SharedGroups(df, ['group'], ['energy', 'time'], ['param1']) as shared:
+            assert shared.ngroups() == 3
+            for g, (key, df_single) in enumerate(df.groupby(['group'])):
+                assert shared.keys[g] == key
+                group_df = shared.group(g)
+                np.testing.assert_array_equal(group_df['energy'], df_single['energy'])
+                np.testing.assert_array_equal(group_df['time'], df_single['time'])
+                assert (group_df['param1'] == df_single['param1'].iloc[0]).all()
+
+    def test_pickle_ships_handles_only(self):
+        """Test that pickling does not copy the shared columns."""
+        import pickle
+        df = self.make_df()
+        with SharedGroups(df, ['group'], ['energy', 'time']) as shared:
+            state = shared.__getstate__()
+            assert state['_views'] == {} and state['_blocks'] == []
+            clone = pickle.loads(pickle.dumps(shared))
+            np.testing.assert_array_equal(clone.group(1)['energy'], shared.group(1)['energy'])
+
+    @pytest.mark.parametrize("group_major", [False, True])
+    def test_bootstrap_shared_memory_matches(self, group_major):
+        """Test that shared memory gives the same results as pickling the DataFrame."""
+        df = self.make_df()
+        params_list = params_range([1, 3], bootstrap_iterations=10, keep_cols=['param1'])
+
+        results = []
+        for shared_memory in [False, True]:
+            np.random.seed(5)
+            with patch('bootstrap.Pool', serial_pool()):
+                results.append(Bootstrap(
+                    df, ['group'], copy.deepcopy(params_list),
+                    group_major=group_major, shared_memory=shared_memory,
+                ))
+        expected, result = results
+        expected = expected.sort_values(['group', 'boots']).reset_index(drop=True)
+        result = result.sort_values(['group', 'boots']).reset_index(drop=True)
+        pd.testing.assert_frame_equal(result[expected.columns], expected)
+
+    @pytest.mark.parametrize("kwargs", [{}, {'group_major': True}, {'progress': True}])
+    def test_update_rule_reads_other_columns(self, kwargs):
+        """Test that update_rule reads columns that are not in shared memory."""
+        df = self.make_df()
+        df['GT'] = np.where(df['group'] == 'A', -12.0, -11.0)
+
+        def update_rule(bs_params, df_single):
+            bs_params.shared_args['best_value'] = df_single['GT'].iloc[0]
+
+        results = []
+        for shared_memory in [False, True]:
+            params = level_params(bootstrap_iterations=10, seed=3)
+            params.update_rule = update_rule
+            with tempfile.TemporaryDirectory() as temp_dir, \
+                    patch('bootstrap.Pool', serial_pool()):
+                results.append(Bootstrap(
+                    df, ['group'], params_range([1, 3], params),
+                    progress_dir=temp_dir if kwargs.get('progress') else None,
+                    group_major=kwargs.get('group_major', False),
+                    shared_memory=shared_memory,
+                ))
+        expected, result = [
+            r.sort_values(['group', 'boots']).reset_index(drop=True) for r in results
+        ]
+        pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
+        ratio = names.param2filename({'Key': 'PerfRatio'}, '')
+        assert not np.allclose(result[ratio], 1.0)
+
+    def test_bootstrap_shared_memory_worker_processes(self):
+        """Test that worker processes attach to the shared blocks."""
+        df = self.make_df()
+        params_list = params_range([2, 4], bootstrap_iterations=10)
+        result = Bootstrap(df, ['group'], params_list, shared_memory=True)
+        assert len(result) == 6
+        assert set(result['group']) == {'A', 'B', 'C'}
+
+
+class TestOnlineBootstrap:
+    """Test class for the Poisson-weighted online bootstrap."""
+
+    def make_batches(self, nbatches=3, size=200):
+        rng = np.random.default_rng(8)
+        return [
+            pd.DataFrame({
+                'energy': -rng.choice([0.0, 5.0, 10.0], size=size, p=[0.5, 0.3, 0.2]),
+                'time': np.ones(size),
+                'group': rng.choice(['A', 'B'], size=size),
+                'param1': 'x',
+            })
+            for _ in range(nbatches)
+        ]
+
+    def params_list(self, **kwargs):
+        return params_range([1, 5], bootstrap_iterations=2000, keep_cols=['param1'], **kwargs)
+
+    def test_online_output(self):
+        """Test one row per group and level, with the group columns first."""
+        online = OnlineBootstrap(['group'], self.params_list())
+        assert online.evaluate().empty
+        online.ingest(self.make_batches(1)[0])
+        result = online.evaluate()
+
+        assert result.columns[0] == 'group'
+        assert sorted(zip(result['group'], result['boots'])) == [
+            ('A', 1), ('A', 5), ('B', 1), ('B', 5)
+        ]
+        assert (result['param1'] == 'x').all()
+
+    def test_online_matches_offline(self):
+        """Test the online estimates against the bootstrap of all batches at once."""
+        batches = self.make_batches()
+        np.random.seed(1)
+        online = OnlineBootstrap(['group'], self.params_list())
+        for batch in batches:
+            online.ingest(batch)
+        result = online.evaluate().sort_values(['group', 'boots']).reset_index(drop=True)
+
+        with patch('bootstrap.Pool', serial_pool()):
+            expected = Bootstrap_group_major(
+                pd.concat(batches, ignore_index=True), ['group'], self.params_list()
+            ).sort_values(['group', 'boots']).reset_index(drop=True)
+        for key in ['Response', 'SuccProb', 'MeanTime']:
+            col = names.param2filename({'Key': key}, '')
+            np.testing.assert_allclose(result[col], expected[col], rtol=0.05, atol=0.03)
+
+    def test_online_default_update_matches_offline(self):
+        """Test that default_update counts every ingested read without agg."""
+        batches = self.make_batches()
+        for batch in batches:
+            batch['time'] = np.random.default_rng(2).choice([1.0, 2.0, 3.0], size=len(batch))
+
+        def params_list():
+            params = level_params(bootstrap_iterations=2000, keep_cols=['param1'])
+            params.update_rule = lambda bs_params, df: bs_params.default_update(df)
+            params.metric_args['RTT']['fail_value'] = 0.0
+            return params_range([1, 5], params)
+
+        online = OnlineBootstrap(['group'], params_list())
+        for batch in batches:
+            online.ingest(batch)
+        result = online.evaluate().sort_values(['group', 'boots']).reset_index(drop=True)
+
+        np.random.seed(1)
+        with patch('bootstrap.Pool', serial_pool()):
+            expected = Bootstrap_group_major(
+                pd.concat(batches, ignore_index=True), ['group'], params_list()
+            ).sort_values(['group', 'boots']).reset_index(drop=True)
+        # RTT of a few reads is noisy, but an unweighted RTT_factor is off by far more
+        for key, rtol in [('Response', 0.1), ('MeanTime', 0.1), ('RTT', 0.3)]:
+            col = names.param2filename({'Key': key}, '')
+            np.testing.assert_allclose(result[col], expected[col], rtol=rtol, err_msg=key)
+
+    def test_online_counts_compressed_batches(self):
+        """Test that agg counts are read counts of a row."""
+        online = OnlineBootstrap(['group'], self.params_list(agg='count'))
+        online.ingest(pd.DataFrame({
+            'energy': [-10.0, 0.0], 'time': [1.0, 1.0], 'group': ['A', 'A'], 'count': [3, 1],
+        }))
+        online.ingest(pd.DataFrame({
+            'energy': [-10.0], 'time': [1.0], 'group': ['A'], 'count': [4],
+        }))
+        state = online._groups[('A',)]
+        np.testing.assert_array_equal(state['counts'], [7, 1])
+        assert state['totals'].shape == (2000,)
+        np.testing.assert_allclose(state['totals'].mean(), 8, rtol=0.05)
+        # Resampled reads of -10.0 hold 7 of the 8 reads
+        np.testing.assert_allclose((state['responses'] == -10.0).mean(), 7 / 8, rtol=0.05)
+
+    def test_online_state_does_not_grow(self):
+        """Test that the resample state of a group keeps its size across batches."""
+        online = OnlineBootstrap(['group'], self.params_list())
+        for batch in self.make_batches(3):
+            batch['energy'] += np.random.default_rng(0).uniform(0, 0.1, size=len(batch))
+            online.ingest(batch)
+            state = online._groups[('A',)]
+            assert state['responses'].shape == (5, 2000)
+            assert state['resources'].shape == (5, 2000)
+
+    def test_weighted_rows(self):
+        """Test that rows are drawn from the weights of their replicate."""
+        from bootstrap import _weighted_rows
+        weights = np.array([[1.0, 0.0, 3.0], [0.0, 2.0, 0.0], [0.0, 0.0, 0.0]])
+        cols = np.repeat([0, 1], 4000)
+        rows = _weighted_rows(weights, weights.sum(axis=1), cols, np.random.RandomState(0))
+        assert set(rows[cols == 1]) == {1}
+        np.testing.assert_allclose((rows[cols == 0] == 2).mean(), 0.75, atol=0.03)
+        assert not (rows[cols == 0] == 1).any()
+
+    def test_online_reevaluates_updated_groups_only(self):
+        """Test that a batch only re-evaluates the groups it contains."""
+        online = OnlineBootstrap(['group'], self.params_list())
+        online.ingest(self.make_batches(1)[0])
+        online.evaluate()
+        batch = pd.DataFrame({'energy': [-10.0], 'time': [1.0], 'group': ['B'], 'param1': 'x'})
+        online.ingest(batch)
+        with patch.object(OnlineBootstrap, '_evaluate_group', wraps=online._evaluate_group) as mock_eval:
+            online.evaluate()
+        mock_eval.assert_called_once_with(('B',))
+
+
+class TestGridLevels:
+    """Test class for grid-aligned downsample levels."""
+
+    def sweep_grid(self, resource_values):
+        return GridLevels(resource_values, lambda df: df['sweep'].iloc[0])
+
+    def test_exact_and_bracketing_levels(self):
+        """Test that reachable values use one level and others their brackets."""
+        grid = self.sweep_grid([20, 50, 1000])
+        df = pd.DataFrame({'sweep': [10]})
+        # 20 -> 2, 50 -> between 4 and 8, 1000 -> above every level
+        np.testing.assert_array_equal(grid(df, [0, 1, 2, 4, 8, 16]), [2, 4, 8, 16])
+
+    def test_below_smallest_level(self):
+        """Test that values below the smallest level only use it."""
+        grid = self.sweep_grid([1])
+        np.testing.assert_array_equal(grid(pd.DataFrame({'sweep': [10]}), [2, 3]), [2])
+
+    @pytest.mark.parametrize("shared_memory", [False, True])
+    def test_bootstrap_grid_levels_per_group(self, shared_memory):
+        """Test that every group only bootstraps the levels of its resource grid."""
+        df = pd.DataFrame({
+            'energy': -np.arange(8.0),
+            'time': np.ones(8),
+            'sweep': [10] * 4 + [100] * 4,
+            'instance': [0, 1] * 4,
+        })
+        params_list = params_range(range(10), bootstrap_iterations=5)
+        grid = self.sweep_grid([40, 200])
+
+        with patch('bootstrap.Pool', serial_pool()):
+            result = Bootstrap(
+                df, ['sweep', 'instance'], params_list,
+                grid_levels=grid, shared_memory=shared_memory,
+            )
+
+        levels = result.groupby('sweep')['boots'].apply(lambda b: sorted(set(b)))
+        assert levels[10] == [4, 9]
+        assert levels[100] == [1, 2]
+        assert len(result) == 8
+
+
+class TestRace:
+    """Test class for the racing pre-screen of parameter sets."""
+
+    def make_df(self):
+        # alpha=1 always reaches -10, alpha=2 never does and alpha=3 sometimes does
+        energy = {1: [-10.0] * 4, 2: [0.0] * 4, 3: [-10.0, 0.0, 0.0, 0.0]}
+        return pd.DataFrame([
+            {'alpha': alpha, 'instance': instance, 'energy': e, 'time': 1.0}
+            for alpha in [1, 2, 3] for instance in [0, 1] for e in energy[alpha]
+        ])
+
+    def race_params(self, **kwargs):
+        return RaceParameters(
+            ['alpha'], ['instance'], metric='Response', response_dir=-1, **kwargs
+        )
+
+    def params_list(self):
+        return params_range([1, 2, 4], bootstrap_iterations=20)
+
+    def test_race_drops_dominated(self):
+        """Test that only the parameter set worse everywhere is dropped and recorded."""
+        df = self.make_df()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manifest = os.path.join(tmpdir, 'race.json')
+            with patch('bootstrap.Pool', serial_pool()):
+                contenders, dropped = race(
+                    df, ['alpha', 'instance'], self.params_list(), self.race_params(),
+                    manifest=manifest, group_major=True,
+                )
+            with open(manifest) as f:
+                record = json.load(f)
+
+        assert dropped.to_dict('records') == [{'alpha': 2}]
+        assert set(contenders['alpha']) == {1, 3}
+        assert len(contenders) == 16
+        assert record['dropped'] == [{'alpha': 2}]
+        assert record['bootstrap_iterations'] == 50
+
+    def test_race_reuses_manifest(self):
+        """Test that an existing manifest is reused instead of racing again."""
+        df = self.make_df()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manifest = os.path.join(tmpdir, 'race.json')
+            with open(manifest, 'w') as f:
+                json.dump({'dropped': [{'alpha': 3}]}, f)
+            with patch('bootstrap.Bootstrap') as mock_bootstrap:
+                contenders, dropped = race(
+                    df, ['alpha', 'instance'], self.params_list(), self.race_params(),
+                    manifest=manifest,
+                )
+        mock_bootstrap.assert_not_called()
+        assert dropped.to_dict('records') == [{'alpha': 3}]
+        assert set(contenders['alpha']) == {1, 2}
+
+    def test_no_competitor_keeps_set(self):
+        """Test that a set is kept where no other set reaches its resource."""
+        with patch('bootstrap.Pool', serial_pool()):
+            bs_df = Bootstrap(
+                self.make_df(), ['alpha', 'instance'], self.params_list(), group_major=True
+            )
+        race_params = self.race_params(
+            resource_fcn=lambda df: df['boots'] * np.where(df['alpha'] == 2, 1, 10)
+        )
+        assert race_params(bs_df).empty
+
+    def test_undominated_on_one_instance(self):
+        """Test that a set is kept if it is not dominated on some instance."""
+        df = self.make_df()
+        df.loc[(df['alpha'] == 2) & (df['instance'] == 1), 'energy'] = -10.0
+        with patch('bootstrap.Pool', serial_pool()):
+            bs_df = Bootstrap(df, ['alpha', 'instance'], self.params_list(), group_major=True)
+        assert self.race_params()(bs_df).empty
+
+
+class TestSeededStreams:
+    """Test class for bootstrap results reproducible from a seed."""
+
+    def make_df(self):
+        return make_reads(4, 60, energies=[0.0, 5.0, 10.0], times=1.0, sweeps=[10, 100], instances=3)
+
+    def params_list(self, **kwargs):
+        return params_range([2, 5], bootstrap_iterations=50, seed=7, **kwargs)
+
+    def sorted_result(self, result):
+        return result.sort_values(['sweep', 'instance', 'boots']).reset_index(drop=True)
+
+    @pytest.mark.parametrize("kwargs", [{}, {'group_major': True}])
+    def test_serial_and_pool_match(self, kwargs):
+        """Test that a seeded bootstrap does not depend on the worker pool."""
+        df = self.make_df()
+        with patch('bootstrap.Pool', serial_pool()):
+            serial = Bootstrap(df, ['sweep', 'instance'], self.params_list(), **kwargs)
+        parallel = Bootstrap(df, ['sweep', 'instance'], self.params_list(), **kwargs)
+        pd.testing.assert_frame_equal(
+            self.sorted_result(serial), self.sorted_result(parallel)
+        )
+
+    def test_group_order_and_shared_memory(self):
+        """Test that a group's resamples do not depend on the other groups."""
+        df = self.make_df()
+        with patch('bootstrap.Pool', serial_pool()):
+            full = Bootstrap_group_major(df, ['sweep', 'instance'], self.params_list())
+            shared = Bootstrap_group_major(
+                df, ['sweep', 'instance'], self.params_list(), shared_memory=True
+            )
+            single = Bootstrap_group_major(
+                df[df['sweep'] == 100], ['sweep', 'instance'], self.params_list()
+            )
+        pd.testing.assert_frame_equal(full, shared)
+        pd.testing.assert_frame_equal(
+            full[full['sweep'] == 100].reset_index(drop=True), single
+        )
+
+    def test_seed_changes_results(self):
+        """Test that different seeds give different resamples."""
+        df = self.make_df()
+        results = []
+        for seed in [7, 8]:
+            params = level_params(bootstrap_iterations=50, seed=seed)
+            results.append(BootstrapSingleLevels(df, params, [5]))
+        assert not results[0].equals(results[1])
+
+    def test_common_random_numbers(self):
+        """Test that groups of the same instance share their resamples with crn_cols."""
+        df = pd.DataFrame({
+            'energy': np.tile(np.linspace(-10.0, 0.0, 6), 2) + np.repeat([0.0, 1.0], 6),
+            'time': np.ones(12),
+            'sweep': np.repeat([10, 100], 6),
+            'instance': np.zeros(12, dtype=int),
+        })
+        col = names.param2filename({'Key': 'Response'}, '')
+        for kwargs in [{}, {'group_major': True}]:
+            results = []
+            for crn_cols in [None, ['instance']]:
+                params = params_range([2, 5], bootstrap_iterations=50, seed=7, crn_cols=crn_cols)
+                with patch('bootstrap.Pool', serial_pool()):
+                    result = Bootstrap(df, ['sweep', 'instance'], params, **kwargs)
+                results.append(self.sorted_result(result))
+            independent, crn = results
+            # The responses of sweep 100 are those of sweep 10 shifted by one
+            shift = crn[col].values[2:] - crn[col].values[:2]
+            np.testing.assert_allclose(shift, 1.0)
+            shift = independent[col].values[2:] - independent[col].values[:2]
+            assert not np.allclose(shift, 1.0)
+
+    def test_crn_needs_seed(self):
+        """Test that common random numbers without a seed are disabled."""
+        with pytest.warns(UserWarning, match="Common random numbers need a seed"):
+            params = level_params(crn_cols=['instance'])
+        assert params.crn_cols is None
+
+    def test_online_bootstrap_reproducible(self):
+        """Test that seeded online bootstraps of the same batches match."""
+        df = self.make_df()
+        results = []
+        for _ in range(2):
+            online = OnlineBootstrap(['sweep', 'instance'], self.params_list())
+            online.ingest(df.iloc[:30])
+            online.ingest(df.iloc[30:])
+            results.append(online.evaluate())
+        pd.testing.assert_frame_equal(results[0], results[1])
+
+
+class TestProgressShards:
+    """Test class for resumable bootstrap progress shards."""
+
+    def make_df(self):
+        return make_reads(5, 48, energies=[0.0, 5.0, 10.0], times=1.0, sweeps=[10, 100], instances=4)
+
+    def params_list(self):
+        return params_range([2, 3, 5], bootstrap_iterations=20, seed=2)
+
+    def run(self, progress_dir, **kwargs):
+        with patch('bootstrap.Pool', serial_pool_with_initializer()):
+            return Bootstrap(
+                self.make_df(), ['sweep', 'instance'], self.params_list(),
+                progress_dir=progress_dir, group_parts=3, **kwargs
+            )
+
+    @pytest.mark.parametrize("kwargs", [{}, {'group_major': True}, {'shared_memory': True}])
+    def test_matches_bootstrap_without_progress(self, kwargs):
+        """Test that merged shards hold the same rows as a run without progress_dir."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result = self.run(temp_dir, **kwargs)
+        with patch('bootstrap.Pool', serial_pool()):
+            expected = Bootstrap(
+                self.make_df(), ['sweep', 'instance'], self.params_list(), **kwargs
+            )
+        sort_cols = ['boots', 'sweep', 'instance']
+        pd.testing.assert_frame_equal(
+            result.sort_values(sort_cols).reset_index(drop=True),
+            expected[result.columns].sort_values(sort_cols).reset_index(drop=True),
+            check_dtype=False,
+        )
+
+    def test_manifest(self):
+        """Test that every shard is recorded in the manifest with its rows."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result = self.run(temp_dir)
+            with open(os.path.join(temp_dir, 'manifest.json')) as f:
+                shards = json.load(f)['shards']
+            assert len(shards) == 9
+            assert sum(record['rows'] for record in shards.values()) == len(result) == 24
+            for name, record in shards.items():
+                shard = pd.read_pickle(os.path.join(temp_dir, name))
+                assert len(shard) == record['rows']
+                assert record['dtypes'] == [[col, d.str] for col, d in shard.dtypes.items()]
+
+    def test_resume_only_missing_shards(self):
+        """Test that a rerun only computes shards missing from the manifest."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = self.run(temp_dir)
+            manifest_file = os.path.join(temp_dir, 'manifest.json')
+            with open(manifest_file) as f:
+                shards = json.load(f)['shards']
+            # Interrupted before recording a shard, and before writing another one
+            del shards['bootstrapped_results_boots=3_part=1of3.pkl']
+            os.remove(os.path.join(temp_dir, 'bootstrapped_results_boots=5_part=0of3.pkl'))
+            with open(manifest_file, 'w') as f:
+                json.dump({'shards': shards}, f)
+
+            with patch('bootstrap._bootstrap_groups', wraps=bootstrap._bootstrap_groups) as mock_groups:
+                second = self.run(temp_dir)
+
+            assert mock_groups.call_count == 2
+            pd.testing.assert_frame_equal(first, second)
+
+
+    def test_resume_with_default_parts_on_other_machine(self):
+        """Test that the default shards do not depend on the number of CPUs."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            kwargs = dict(progress_dir=temp_dir)
+            with patch('os.cpu_count', return_value=4), patch('bootstrap.Pool', serial_pool()):
+                first = Bootstrap(self.make_df(), ['sweep', 'instance'], self.params_list(), **kwargs)
+            with patch('os.cpu_count', return_value=12), patch('bootstrap.Pool', serial_pool()), \
+                    patch('bootstrap._bootstrap_groups', wraps=bootstrap._bootstrap_groups) as mock_groups:
+                second = Bootstrap(self.make_df(), ['sweep', 'instance'], self.params_list(), **kwargs)
+            assert mock_groups.call_count == 0
+            pd.testing.assert_frame_equal(first, second)
+
+    def test_default_one_shard_per_level(self):
+        """Test that progress is written as one shard per level by default."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch('bootstrap.Pool', serial_pool()):
+                Bootstrap(
+                    self.make_df(), ['sweep', 'instance'], self.params_list(),
+                    progress_dir=temp_dir,
+                )
+            assert sorted(os.listdir(temp_dir)) == [
+                'bootstrapped_results_boots={}_part=0of1.pkl'.format(n) for n in [2, 3, 5]
+            ] + ['manifest.json']
+
+    def test_manifest_log_replayed(self):
+        """Test that shards recorded in the manifest log of an interrupted run are reused."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = self.run(temp_dir)
+            manifest_file = os.path.join(temp_dir, 'manifest.json')
+            with open(manifest_file) as f:
+                shards = json.load(f)['shards']
+            # Interrupted after appending a few shards to the log, and within a line
+            logged = sorted(shards)[:4]
+            with open(os.path.join(temp_dir, 'manifest.log'), 'w') as f:
+                for name in logged:
+                    f.write(json.dumps({'shard': name, 'record': shards.pop(name)}) + '\n')
+                f.write('{"shard": "bootstrapped')
+            with open(manifest_file, 'w') as f:
+                json.dump({'shards': shards}, f)
+
+            with patch('bootstrap._bootstrap_groups', wraps=bootstrap._bootstrap_groups) as mock_groups:
+                second = self.run(temp_dir)
+            with open(manifest_file) as f:
+                assert len(json.load(f)['shards']) == 9
+            assert not os.path.exists(os.path.join(temp_dir, 'manifest.log'))
+
+        assert mock_groups.call_count == 0
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_changed_params_recompute_stale_shards(self):
+        """Test that shards computed with other bootstrap parameters are not reused."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.run(temp_dir)
+            params_list = params_range([2, 3, 5], bootstrap_iterations=30, seed=2)
+            with patch('bootstrap.Pool', serial_pool_with_initializer()), \
+                    patch('bootstrap._bootstrap_groups', wraps=bootstrap._bootstrap_groups) as mock_groups:
+                result = Bootstrap(
+                    self.make_df(), ['sweep', 'instance'], params_list,
+                    progress_dir=temp_dir, group_parts=3,
+                )
+            with patch('bootstrap.Pool', serial_pool()):
+                expected = Bootstrap(self.make_df(), ['sweep', 'instance'], params_list)
+
+        assert mock_groups.call_count == 9
+        sort_cols = ['boots', 'sweep', 'instance']
+        pd.testing.assert_frame_equal(
+            result.sort_values(sort_cols).reset_index(drop=True),
+            expected[result.columns].sort_values(sort_cols).reset_index(drop=True),
+            check_dtype=False,
+        )
+
+    def test_changed_groups_recompute_stale_shards(self):
+        """Test that shards of groups that changed are not reused."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.run(temp_dir)
+            df = self.make_df()
+            df = df[df['instance'] != 3]  # A group set without instance 3
+            with patch('bootstrap.Pool', serial_pool_with_initializer()):
+                result = Bootstrap(
+                    df, ['sweep', 'instance'], self.params_list(),
+                    progress_dir=temp_dir, group_parts=3,
+                )
+        assert len(result) == 18
+        assert set(result['instance']) == {0, 1, 2}
+
+
 class TestBootstrap:
     """Test class for Bootstrap function."""
     
@@ -582,6 +2067,24 @@ class TestBootstrap:
         
         assert isinstance(result, pd.DataFrame)
     
+    def test_results_in_level_order(self):
+        """Test that results arriving out of order are written in level order."""
+        df = pd.DataFrame({
+            'energy': [-1.0, -2.0, -1.0, 0.0],
+            'time': np.ones(4),
+            'group': ['A', 'A', 'B', 'B'],
+        })
+        params_list = params_range([1, 2, 3], bootstrap_iterations=5)
+        pool = MagicMock()
+        pool.return_value.__enter__.return_value.imap_unordered.side_effect = (
+            lambda f, it, chunksize=1: reversed([f(task) for task in it])
+        )
+        with patch('bootstrap.Pool', pool):
+            result = Bootstrap(df, ['group'], params_list)
+
+        assert list(result['boots']) == [1, 1, 2, 2, 3, 3]
+        assert list(result['group']) == ['A', 'B'] * 3
+
     def test_bootstrap_with_progress_dir(self):
         """Test Bootstrap function with progress directory."""
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -648,6 +2151,124 @@ class TestBootstrapReduceMem:
             os.unlink(tmp_file.name)
 
 
+class TestBootstrapReduceMemPersistentPool:
+    """Test class for the persistent pool scheduler of Bootstrap_reduce_mem."""
+
+    def write_upper_groups(self, tmp_dir):
+        rng = np.random.default_rng(3)
+        filenames = []
+        for upper, ngroups in [('X', 3), ('Y', 1)]:
+            df = pd.DataFrame({
+                'energy': -rng.integers(0, 11, size=4 * ngroups).astype(float),
+                'time': rng.uniform(1, 2, size=4 * ngroups),
+                'group': np.repeat(['g{}'.format(k) for k in range(ngroups)], 4),
+            })
+            filename = os.path.join(tmp_dir, 'raw_{}.pkl'.format(upper))
+            df.to_pickle(filename)
+            filenames.append(filename)
+        return filenames
+
+    def name_fcn(self, filename):
+        return os.path.basename(filename)[4:-4]
+
+    @pytest.mark.parametrize("group_major", [False, True])
+    def test_persistent_pool_output(self, group_major):
+        """Test one results file per upper group with every group and level."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filenames = self.write_upper_groups(tmp_dir)
+            params_list = params_range([1, 3], bootstrap_iterations=10)
+
+            with patch('bootstrap.Pool', serial_pool_with_initializer()):
+                with patch('bootstrap.pd.read_pickle', wraps=pd.read_pickle) as mock_read:
+                    result = Bootstrap_reduce_mem(
+                        filenames, ['group'], params_list, tmp_dir, self.name_fcn,
+                        group_major=group_major, persistent_pool=True, group_parts=2,
+                    )
+                    assert mock_read.call_count == 2  # Each file is loaded once
+
+            assert [os.path.basename(f) for f in result] == [
+                'bootstrapped_results_X.pkl', 'bootstrapped_results_Y.pkl'
+            ]
+            res_x = pd.read_pickle(result[0])
+            res_y = pd.read_pickle(result[1])
+            assert res_x.columns[0] == 'group'
+            assert sorted(zip(res_x['group'], res_x['boots'])) == [
+                ('g0', 1), ('g0', 3), ('g1', 1), ('g1', 3), ('g2', 1), ('g2', 3)
+            ]
+            assert len(res_y) == 2
+
+    def test_persistent_pool_skips_existing(self):
+        """Test that existing results files are not recomputed."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filenames = self.write_upper_groups(tmp_dir)
+            existing = os.path.join(tmp_dir, 'bootstrapped_results_X.pkl')
+            pd.DataFrame({'done': [1]}).to_pickle(existing)
+            params_list = params_range([2], bootstrap_iterations=10)
+
+            with patch('bootstrap.Pool', serial_pool_with_initializer()):
+                Bootstrap_reduce_mem(
+                    filenames, ['group'], params_list, tmp_dir, self.name_fcn,
+                    persistent_pool=True,
+                )
+            assert list(pd.read_pickle(existing).columns) == ['done']
+            assert len(pd.read_pickle(os.path.join(tmp_dir, 'bootstrapped_results_Y.pkl'))) == 1
+
+    def test_persistent_pool_worker_processes(self):
+        """Test the scheduler with worker processes."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filenames = self.write_upper_groups(tmp_dir)
+            params_list = params_range([2], bootstrap_iterations=10)
+            result = Bootstrap_reduce_mem(
+                filenames, ['group'], params_list, tmp_dir, self.name_fcn,
+                persistent_pool=True, group_parts=2,
+            )
+            assert len(pd.read_pickle(result[0])) == 3
+
+    def test_dataframe_input_split_by_upper_group(self):
+        """Test that a single DataFrame is split in upper groups."""
+        df = pd.DataFrame({
+            'energy': [-1.0, -2.0, -3.0, -4.0],
+            'time': [1.0, 1.0, 1.0, 1.0],
+            'upper': ['X', 'X', 'Y', 'Y'],
+            'group': ['a', 'b', 'a', 'a'],
+        })
+        params_list = [level_params(bootstrap_iterations=5, downsample=2)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch('bootstrap.Pool', serial_pool_with_initializer()):
+                result = Bootstrap_reduce_mem(
+                    df, [['upper'], ['group']], params_list, tmp_dir,
+                    lambda key: key[0], persistent_pool=True,
+                )
+            assert [os.path.basename(f) for f in result] == [
+                'bootstrapped_results_X.pkl', 'bootstrapped_results_Y.pkl'
+            ]
+            assert len(pd.read_pickle(result[0])) == 2
+            assert len(pd.read_pickle(result[1])) == 1
+
+
+    def test_workers_load_upper_groups_from_files(self):
+        """Test that workers get pickle filenames, not the upper group DataFrames."""
+        df = pd.DataFrame({
+            'energy': [-1.0, -2.0, -3.0, -4.0],
+            'time': [1.0, 1.0, 1.0, 1.0],
+            'upper': ['X', 'X', 'Y', 'Y'],
+            'group': ['a', 'b', 'a', 'a'],
+        })
+        params_list = [level_params(bootstrap_iterations=5, downsample=2)]
+        pool = serial_pool()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch('bootstrap.Pool', pool):
+                with patch('bootstrap.pd.read_pickle', wraps=pd.read_pickle) as mock_read:
+                    Bootstrap_reduce_mem(
+                        df, [['upper'], ['group']], params_list, tmp_dir,
+                        lambda key: key[0], persistent_pool=True, group_parts=2,
+                    )
+        assert pool.call_args == ((), {})
+        tasks = list(pool.return_value.__enter__.return_value.imap_unordered.call_args[0][1])
+        for task in tasks:
+            assert all(isinstance(item, (str, int)) for item in task)
+        assert mock_read.call_count == 2  # Each upper group is loaded once
+
 class TestConstants:
     """Test module constants."""
     
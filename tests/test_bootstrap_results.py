@@ -0,0 +1,87 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+import os
+import sys
+TESTS_DIR = os.path.dirname(__file__)
+SRC_PATH = os.path.abspath(os.path.join(TESTS_DIR, os.pardir, 'src'))
+sys.path.insert(0, SRC_PATH)
+
+from bootstrap_results import BootstrapResults, metric_columns
+
+
+def results_frame():
+    """Long bootstrap frame with two metrics and a group missing a level."""
+    rng = np.random.default_rng(0)
+    rows = []
+    for sweep in [10, 20]:
+        for instance in [0, 1, 2]:
+            for boots in [1, 2, 4]:
+                if (sweep, instance, boots) == (20, 2, 4):
+                    continue
+                row = {'sweep': sweep, 'instance': instance, 'param': 'p{}'.format(sweep)}
+                for metric in ['PerfRatio', 'SuccProb']:
+                    center = rng.random()
+                    names = metric_columns(metric)
+                    row[names[0]] = center
+                    row[names[1]] = center - 0.1
+                    row[names[2]] = center + 0.1
+                row['iterations'] = boots * 10
+                row['boots'] = boots
+                rows.append(row)
+    return pd.DataFrame(rows)
+
+
+class TestBootstrapResults:
+    """Test class for BootstrapResults."""
+
+    def test_from_frame_layout(self):
+        """Test the array shapes, keys and metrics parsed from a frame."""
+        results = BootstrapResults.from_frame(results_frame(), ['sweep', 'instance'])
+        assert results.metrics == ['PerfRatio', 'SuccProb']
+        assert results.values.shape == (6, 3, 2, 3)
+        np.testing.assert_array_equal(results.levels, [1, 2, 4])
+        assert list(results.keys.columns) == ['sweep', 'instance', 'param']
+        assert results.valid.sum() == 17
+        assert not results.valid[5, 2]
+        assert list(results.extra) == ['iterations']
+
+    def test_to_frame_round_trip(self):
+        """Test that to_frame gives back the rows of the frame."""
+        df = results_frame()
+        result = BootstrapResults.from_frame(df, ['sweep', 'instance']).to_frame()
+        pd.testing.assert_frame_equal(
+            result[df.columns].sort_values(['sweep', 'instance', 'boots']).reset_index(drop=True),
+            df.sort_values(['sweep', 'instance', 'boots']).reset_index(drop=True),
+        )
+
+    def test_metric_view(self):
+        """Test that metric returns the (group, level, bound) values of a metric."""
+        df = results_frame()
+        results = BootstrapResults.from_frame(df, ['sweep', 'instance'])
+        row = df[(df['sweep'] == 10) & (df['instance'] == 1) & (df['boots'] == 2)]
+        np.testing.assert_array_equal(
+            results.metric('SuccProb')[1, 1], row[list(metric_columns('SuccProb'))].values[0]
+        )
+
+    def test_take_groups_and_level_range(self):
+        """Test slicing by group and by level range."""
+        df = results_frame()
+        results = BootstrapResults.from_frame(df, ['sweep', 'instance'])
+        subset = results.take_groups(results.keys['sweep'].values == 20).level_range(2, 4)
+        expected = df[(df['sweep'] == 20) & (df['boots'] >= 2)]
+        assert subset.ngroups() == 3
+        np.testing.assert_array_equal(subset.levels, [2, 4])
+        result = subset.to_frame()
+        assert len(result) == len(expected) == 5
+        np.testing.assert_array_equal(
+            np.sort(result['Key=PerfRatio'].values), np.sort(expected['Key=PerfRatio'].values)
+        )
+
+    def test_varying_non_numeric_column(self):
+        """Test that non-numeric columns must be constant within a group."""
+        df = results_frame()
+        df['param'] = df['boots'].astype(str)
+        with pytest.raises(ValueError):
+            BootstrapResults.from_frame(df, ['sweep', 'instance'])
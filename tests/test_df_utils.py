@@ -16,7 +16,16 @@ from df_utils import (
     applyParallel,
     monotone_df,
     eval_cumm,
+    compress_counts,
     read_exp_raw,
+    concat_frames,
+    frame_dtypes,
+    FrameSpool,
+    compress_runs,
+    expand_runs,
+    is_run_encoded,
+    save_results,
+    load_results,
     parameter_set,
     get_best,
     rename_df,
@@ -268,6 +277,17 @@ class TestReadExpRaw:
                 assert all(result['alpha'] == '0.5')
                 assert all(result['beta'] == '10')
     
+    def test_read_exp_raw_compressed(self):
+        """Test compressing each file to distinct outcomes while reading."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            df1 = pd.DataFrame({'energy': [1, 1, 2, 1], 'time': [5, 5, 5, 5]})
+            df1.to_pickle(os.path.join(temp_dir, 'exp1.pkl'))
+
+            result = read_exp_raw(temp_dir, outcome_cols=['energy', 'time'])
+
+            assert len(result) == 2
+            assert dict(zip(result['energy'], result['count'])) == {1: 3, 2: 1}
+
     def test_read_exp_raw_no_files(self):
         """Test error when no files found."""
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -285,6 +305,116 @@ class TestReadExpRaw:
                 read_exp_raw(temp_dir)
 
 
+class TestCompressCounts:
+    """Test class for compress_counts function."""
+
+    def test_compress_counts_reads(self):
+        """Test counting the reads of each distinct outcome."""
+        df = pd.DataFrame({
+            'instance': [0, 0, 0, 1, 1],
+            'energy': [-2.0, -1.0, -2.0, -2.0, -2.0],
+            'time': [1.0, 1.0, 1.0, 1.0, 1.0],
+            'extra': ['a', 'b', 'c', 'd', 'e'],
+        })
+        result = compress_counts(df, ['instance', 'energy', 'time'])
+
+        assert list(result.columns) == ['instance', 'energy', 'time', 'count']
+        assert len(result) == 3
+        assert result['count'].sum() == len(df)
+        row = result[(result['instance'] == 0) & (result['energy'] == -2.0)]
+        assert row['count'].iloc[0] == 2
+
+    def test_compress_counts_sums_existing_counts(self):
+        """Test that already aggregated counts are summed."""
+        df = pd.DataFrame({'energy': [1, 1, 2], 'n': [10, 5, 1]})
+        result = compress_counts(df, ['energy'], count_col='n')
+        assert dict(zip(result['energy'], result['n'])) == {1: 15, 2: 1}
+
+
+class TestFrameSpool:
+    """Test class for FrameSpool and concat_frames."""
+
+    def test_frames_in_position_order(self):
+        """Test that frames appended out of order are read back by position."""
+        frames = [pd.DataFrame({'a': [i, i], 'b': ['x', 'y']}) for i in range(3)]
+        with FrameSpool() as spool:
+            for i in [2, 0, 1]:
+                spool.append(frames[i], i)
+            result = spool.to_frame()
+        pd.testing.assert_frame_equal(result, pd.concat(frames, ignore_index=True))
+
+    def test_append_without_position(self):
+        """Test that frames without a position are appended last."""
+        with FrameSpool() as spool:
+            spool.append(pd.DataFrame({'a': [1.0]}))
+            spool.append(pd.DataFrame({'a': [2.0]}))
+            assert list(spool.to_frame()['a']) == [1.0, 2.0]
+
+    def test_concat_frames_dtypes_and_missing_columns(self):
+        """Test dtype promotion and NaN filling like pd.concat."""
+        frames = [
+            pd.DataFrame({'a': [1, 2], 'b': [0.5, 1.5]}),
+            pd.DataFrame(),
+            pd.DataFrame({'a': [3.5]}),
+        ]
+        result = concat_frames(
+            iter(frames), [len(f) for f in frames], [frame_dtypes(f) for f in frames]
+        )
+        pd.testing.assert_frame_equal(result, pd.concat(frames, ignore_index=True))
+
+    def test_concat_frames_empty(self):
+        """Test that no rows give an empty DataFrame."""
+        assert concat_frames(iter([pd.DataFrame()]), [0], [{}]).empty
+
+
+class TestRunLength:
+    """Test class for run-length encoded results."""
+
+    def plateau_frame(self):
+        return pd.DataFrame({
+            'instance': [0] * 6 + [1] * 4,
+            'boots': [1, 2, 3, 4, 5, 6, 1, 2, 4, 5],
+            'Key=PerfRatio': [0.2, 0.5, 1.0, 1.0, 1.0, 1.0, 0.3, 0.3, 0.3, 0.3],
+            'Key=RTT': [5.0, 4.0, np.nan, np.nan, np.nan, np.nan, 1.0, 1.0, 1.0, 1.0],
+        })
+
+    def test_runs(self):
+        """Test that plateaus collapse into runs, which do not span missing levels."""
+        runs = compress_runs(self.plateau_frame(), ['instance'])
+        assert is_run_encoded(runs)
+        assert list(runs['boots']) == [1, 2, 3, 1, 4]
+        assert list(runs['run_length']) == [1, 1, 4, 2, 2]
+
+    def test_round_trip(self):
+        """Test that decoding gives back the frame."""
+        df = self.plateau_frame()
+        result = expand_runs(compress_runs(df, ['instance']))
+        assert not is_run_encoded(result)
+        pd.testing.assert_frame_equal(result, df)
+
+    def test_round_trip_with_index(self):
+        """Test that index levels are restored on decoding."""
+        df = self.plateau_frame().rename(columns={'boots': 'resource'})
+        df = df.set_index(['instance', 'resource'])
+        result = expand_runs(compress_runs(df, ['instance'], 'resource'))
+        pd.testing.assert_frame_equal(result, df)
+
+    def test_endpoints(self):
+        """Test that endpoints only keep the first and last level of each run."""
+        runs = compress_runs(self.plateau_frame(), ['instance'])
+        result = expand_runs(runs, endpoints=True)
+        assert list(result['boots']) == [1, 2, 3, 6, 1, 2, 4, 5]
+
+    def test_save_and_load_results(self):
+        """Test that encoded checkpoints are decoded on load."""
+        df = self.plateau_frame()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filename = os.path.join(temp_dir, 'results.pkl')
+            save_results(df, filename, ['instance'], run_length=True)
+            assert len(pd.read_pickle(filename)) == 5
+            pd.testing.assert_frame_equal(load_results(filename), df)
+
+
 class TestParameterSet:
     """Test class for parameter_set function."""
     
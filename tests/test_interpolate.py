@@ -2,6 +2,7 @@ import pytest
 import pandas as pd
 import numpy as np
 import warnings
+import tempfile
 from unittest.mock import patch, MagicMock
 
 # Monkey patch pandas DataFrame to add back iteritems for compatibility
@@ -23,6 +24,8 @@ from interpolate import (
     Interpolate_reduce_mem,
     default_ninterp
 )
+from bootstrap_results import BootstrapResults
+from test_bootstrap_results import results_frame
 
 
 class TestInterpolationParameters:
@@ -363,6 +366,60 @@ class TestInterpolate:
             assert mock_interp_single.call_count == 2  # Two groups: A and B
 
 
+class TestInterpolateResults:
+    """Test class for interpolating BootstrapResults."""
+
+    def interp_params(self):
+        return InterpolationParameters(
+            lambda df: df['sweep'] * df['boots'],
+            parameters=['sweep'],
+            resource_value_type='manual',
+            resource_values=[10, 15, 20, 30, 40, 60, 80],
+        )
+
+    def test_matches_frame_interpolation(self):
+        """Test that BootstrapResults interpolate like their frame."""
+        df = results_frame()
+        results = BootstrapResults.from_frame(df, ['sweep', 'instance'])
+
+        result = Interpolate(results, self.interp_params(), ['sweep', 'instance'])
+        expected = Interpolate(df, self.interp_params(), ['sweep', 'instance']).reset_index()
+
+        assert isinstance(result, BootstrapResults)
+        result = result.to_frame()
+        cols = [col for col in expected.columns if col != 'param']
+        pd.testing.assert_frame_equal(
+            result[cols].sort_values(['sweep', 'instance', 'resource']).reset_index(drop=True),
+            expected[cols].sort_values(['sweep', 'instance', 'resource']).reset_index(drop=True),
+            check_dtype=False,
+        )
+
+
+class TestInterpolateRunLength:
+    """Test class for interpolating run-length encoded results."""
+
+    @pytest.mark.parametrize("resource_value_type", ['log', 'data'])
+    def test_matches_decoded_results(self, resource_value_type):
+        """Test that encoded results interpolate like the decoded ones."""
+        import df_utils
+        df = pd.DataFrame({
+            'instance': np.repeat([0, 1], 8),
+            'boots': np.tile(np.arange(1, 9), 2),
+            'Key=PerfRatio': np.minimum(np.tile(np.arange(1, 9), 2) * np.repeat([0.2, 0.1], 8), 1.0),
+        })
+        results = []
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for run_length in [False, True]:
+                filename = os.path.join(temp_dir, 'bs_{}.pkl'.format(run_length))
+                df_utils.save_results(df, filename, ['instance'], run_length=run_length)
+                params = InterpolationParameters(
+                    lambda df: df['boots'] * 1000, parameters=[],
+                    resource_value_type=resource_value_type,
+                )
+                results.append(Interpolate_reduce_mem([filename], params, ['instance']))
+        pd.testing.assert_frame_equal(results[0], results[1])
+
+
 class TestInterpolateReduceMem:
     """Test class for Interpolate_reduce_mem function."""
     
@@ -0,0 +1,47 @@
+import pytest
+import numpy as np
+
+import os
+import sys
+TESTS_DIR = os.path.dirname(__file__)
+SRC_PATH = os.path.abspath(os.path.join(TESTS_DIR, os.pardir, 'src'))
+sys.path.insert(0, SRC_PATH)
+
+from seeding import stream
+
+
+class TestStream:
+    """Test class for keyed random streams."""
+
+    def test_no_seed_uses_global_state(self):
+        """Test that streams without a seed are the global NumPy random state."""
+        assert stream(None, "bootstrap", 1) is np.random
+
+    def test_same_key_same_draws(self):
+        """Test that a stream only depends on the seed and the key."""
+        draws = [stream(5, "bootstrap", ("a", 1), 10).randint(0, 100, 20) for _ in range(2)]
+        np.testing.assert_array_equal(draws[0], draws[1])
+
+    def test_different_keys_and_seeds(self):
+        """Test that other keys or seeds give other draws."""
+        base = stream(5, "bootstrap", ("a", 1), 10).random_sample(20)
+        for other in [
+            stream(5, "bootstrap", ("a", 1), 20),
+            stream(5, "bootstrap", ("a", 2), 10),
+            stream(6, "bootstrap", ("a", 1), 10),
+        ]:
+            assert not np.array_equal(base, other.random_sample(20))
+
+    def test_key_normalization(self):
+        """Test that NumPy scalars and single-element tuples match their values."""
+        a = stream(5, "split", (np.int64(3),), np.float64(0.5)).random_sample(5)
+        b = stream(5, "split", 3, 0.5).random_sample(5)
+        np.testing.assert_array_equal(a, b)
+
+    def test_array_keys(self):
+        """Test that arrays are keyed by their contents."""
+        a = stream(5, "percentile", np.arange(4.0)).random_sample(5)
+        b = stream(5, "percentile", np.arange(4.0)).random_sample(5)
+        c = stream(5, "percentile", np.arange(5.0)).random_sample(5)
+        np.testing.assert_array_equal(a, b)
+        assert not np.array_equal(a, c)
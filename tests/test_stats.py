@@ -2,6 +2,9 @@ import pytest
 import pandas as pd
 import numpy as np
 from stats import StatsParameters, Mean, Median, StatsSingle, applyBounds, Stats
+from bootstrap_results import BootstrapResults
+import df_utils
+from test_bootstrap_results import results_frame
 
 
 def test_StatsSingle():
@@ -316,3 +319,45 @@ def test_Stats_2():
     assert np.array(result["ConfInt=upper_Key=B_Metric=median"]) == pytest.approx(
         median_ci_upper_B
     ), "The upper bound to the median of metric B should be applied"
+
+
+@pytest.mark.parametrize("group_on", [["sweep", "boots"], ["sweep"], ["boots"]])
+def test_Stats_BootstrapResults(group_on):
+    df = results_frame()
+    results = BootstrapResults.from_frame(df, ["sweep", "instance"])
+    stats_params = StatsParameters(
+        metrics=["PerfRatio", "SuccProb"], stats_measures=[Mean(), Median()]
+    )
+    result = Stats(results, stats_params, group_on)
+    expected = Stats(df.drop(columns="param"), stats_params, group_on)
+    pd.testing.assert_frame_equal(
+        result.sort_values(group_on).reset_index(drop=True),
+        expected.sort_values(group_on).reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+@pytest.mark.parametrize("group_on", [["sweep", "resource"], ["sweep"]])
+def test_Stats_run_length(group_on):
+    resource = np.arange(1, 11)
+    df = pd.DataFrame(
+        {
+            "sweep": np.repeat([10, 20], 30),
+            "instance": np.tile(np.repeat([0, 1, 2], 10), 2),
+            "resource": np.tile(resource, 6),
+        }
+    )
+    saturation = 2 + np.tile(np.repeat([1, 4, 7], 10), 2)
+    df["Key=PerfRatio"] = np.minimum(df["resource"] / saturation, 1.0)
+    df["ConfInt=lower_Key=PerfRatio"] = df["Key=PerfRatio"] - 0.1
+    df["ConfInt=upper_Key=PerfRatio"] = np.minimum(df["Key=PerfRatio"] + 0.1, 1.0)
+    df = df[~((df["instance"] == 2) & (df["resource"] > 8))]  # Instance ends early
+    stats_params = StatsParameters(
+        metrics=["PerfRatio"], stats_measures=[Mean(), Median()]
+    )
+
+    runs = df_utils.compress_runs(df, ["sweep", "instance"], "resource")
+    assert len(runs) < len(df)
+    result = Stats(runs, stats_params, group_on)
+    expected = Stats(df, stats_params, group_on)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
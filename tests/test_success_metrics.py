@@ -18,9 +18,16 @@ from success_metrics import (
     SuccessProb,
     Resource,
     RTT,
-    EPSILON
+    EPSILON,
+    best_of_n_distribution,
+    ResampleStats,
+    CountStats,
+    StackedStats,
+    MetricColumns,
+    FusedMetrics,
 )
 import names
+import success_metrics
 
 
 class TestSuccessMetrics:
@@ -585,6 +592,562 @@ class TestRTT:
             assert bs_df[expected_upper].iloc[0] == 1e6
 
 
+class TestEvaluateLevels:
+    """Test that evaluate_levels matches evaluate on the first rows of a shared resample."""
+
+    shared_args = {
+        'confidence_level': 68,
+        'random_value': 0.0,
+        'best_value': -10.0,
+        'response_dir': -1,
+    }
+    metric_args = {
+        Response: {'opt_sense': -1},
+        PerfRatio: {},
+        InvPerfRatio: {},
+        SuccessProb: {'gap': 20.0},
+        Resource: {},
+        RTT: {'gap': 20.0, 'fail_value': np.nan, 'RTT_factor': 2.0, 's': 0.99},
+    }
+
+    def make_resample(self):
+        rng = np.random.default_rng(1)
+        responses = -rng.integers(0, 11, size=(12, 30)).astype(float)
+        resources = rng.uniform(1, 3, size=(12, 30))
+        return responses, resources
+
+    @pytest.mark.parametrize("metric_ref", [Response, SuccessProb, Resource, RTT])
+    def test_evaluate_levels_matches_evaluate(self, metric_ref):
+        """Test vectorized levels against per-level evaluation."""
+        responses, resources = self.make_resample()
+        boots = np.array([1, 3, 7, 12])
+        metric = metric_ref(self.shared_args, self.metric_args[metric_ref])
+
+        levels_df = pd.DataFrame(index=range(len(boots)))
+        metric.evaluate_levels(levels_df, responses, resources, boots)
+
+        for i, n in enumerate(boots):
+            level_df = pd.DataFrame(index=[0])
+            metric.evaluate(level_df, responses[:n], resources[:n])
+            for col in level_df.columns:
+                np.testing.assert_allclose(
+                    levels_df[col].iloc[i], level_df[col].iloc[0], err_msg=col
+                )
+
+    def test_perf_ratio_levels_from_response_columns(self):
+        """Test that PerfRatio levels are derived from every Response row."""
+        responses, resources = self.make_resample()
+        boots = np.array([1, 6, 12])
+        levels_df = pd.DataFrame(index=range(len(boots)))
+        for metric_ref in [Response, PerfRatio, InvPerfRatio]:
+            metric = metric_ref(self.shared_args, self.metric_args[metric_ref])
+            metric.evaluate_levels(levels_df, responses, resources, boots)
+
+        response = levels_df[names.param2filename({"Key": "Response"}, "")]
+        perf_ratio = levels_df[names.param2filename({"Key": "PerfRatio"}, "")]
+        np.testing.assert_allclose(perf_ratio, (0.0 - response) / 10.0)
+
+    def test_base_class_fallback(self):
+        """Test that metrics without a vectorized version are evaluated level by level."""
+
+        class MaxResource(SuccessMetrics):
+            def evaluate(self, bs_df, responses, resources):
+                bs_df['MaxResource'] = [np.max(resources)]
+
+        responses, resources = self.make_resample()
+        levels_df = pd.DataFrame(index=range(2))
+        MaxResource({}).evaluate_levels(levels_df, responses, resources, [2, 12])
+
+        assert levels_df['MaxResource'].iloc[0] == np.max(resources[:2])
+        assert levels_df['MaxResource'].iloc[1] == np.max(resources)
+
+    def test_rtt_evaluate_array_matches_single(self):
+        """Test the vectorized RTT transform against evaluate_single."""
+        rtt = RTT(self.shared_args, self.metric_args[RTT])
+        probs = np.array([0.0, 0.1, 0.5, 0.99, 1.0])
+        expected = [rtt.evaluate_single(p, scale=2.0) for p in probs]
+        np.testing.assert_allclose(rtt.evaluate_array(probs, scale=2.0), expected)
+
+
+class TestFusedMetrics:
+    """Test the single-pass evaluation of several metrics."""
+
+    shared_args = TestEvaluateLevels.shared_args
+    metric_args = {
+        metric_ref.__name__: args
+        for metric_ref, args in TestEvaluateLevels.metric_args.items()
+    }
+    metric_refs = [Response, PerfRatio, InvPerfRatio, SuccessProb, Resource, RTT]
+
+    def make_resample(self):
+        return TestEvaluateLevels.make_resample(self)
+
+    def test_fused_matches_per_metric_evaluate(self):
+        """Test fused results against evaluating each metric on its own DataFrame."""
+        responses, resources = self.make_resample()
+        fused = FusedMetrics(self.shared_args, self.metric_args, self.metric_refs)
+        fused_df = fused.evaluate([len(responses)], responses, resources)
+
+        expected_df = pd.DataFrame()
+        for metric_ref in self.metric_refs:
+            metric = metric_ref(self.shared_args, self.metric_args[metric_ref.__name__])
+            metric.evaluate(expected_df, responses, resources)
+
+        assert len(fused_df) == 1
+        assert set(fused_df.columns) == set(expected_df.columns)
+        for col in expected_df.columns:
+            np.testing.assert_allclose(
+                fused_df[col].iloc[0], expected_df[col].iloc[0], err_msg=col
+            )
+
+    def test_fused_levels(self):
+        """Test that fused results have one row per level."""
+        responses, resources = self.make_resample()
+        fused = FusedMetrics(self.shared_args, self.metric_args, self.metric_refs)
+        fused_df = fused.evaluate([2, 5, 12], responses, resources)
+        assert len(fused_df) == 3
+        resource = fused_df[names.param2filename({"Key": "MeanTime"}, "")]
+        np.testing.assert_allclose(resource.iloc[1], resources[:5].mean())
+
+    def test_success_counts_shared(self):
+        """Test that SuccessProb and RTT share a single pass over the success mask."""
+        responses, resources = self.make_resample()
+        fused = FusedMetrics(self.shared_args, self.metric_args, [SuccessProb, RTT])
+        with patch('success_metrics.success_mask', wraps=success_metrics.success_mask) as mask:
+            fused.evaluate([4, 12], responses, resources)
+        assert mask.call_count == 1
+
+    def test_resample_stats_cache(self):
+        """Test that intermediate values are computed once and reused."""
+        responses, resources = self.make_resample()
+        stats = ResampleStats(responses, resources, [3, 12])
+        best = stats.best(-1)
+        assert stats.best(-1) is best
+        np.testing.assert_array_equal(best[0], responses[:3].min(axis=0))
+        np.testing.assert_array_equal(best[1], responses.min(axis=0))
+        assert stats.mean_resource() is stats.mean_resource()
+
+    def test_stacked_stats_concatenate_blocks(self):
+        """Test that blocks of iterations match a single resample."""
+        responses, resources = self.make_resample()
+        boots = [2, 7, 12]
+        stats = ResampleStats(responses, resources, boots)
+        stacked = StackedStats([
+            ResampleStats(responses[:, :10], resources[:, :10], boots),
+            ResampleStats(responses[:, 10:], resources[:, 10:], boots),
+        ])
+        np.testing.assert_array_equal(stacked.best(-1), stats.best(-1))
+        np.testing.assert_allclose(
+            stacked.success_prob(self.shared_args, 20.0),
+            stats.success_prob(self.shared_args, 20.0),
+        )
+        np.testing.assert_allclose(stacked.mean_resource(), stats.mean_resource())
+        np.testing.assert_array_equal(stacked.level(1)[0], responses[:7])
+
+    def test_compact_keeps_cached_values(self):
+        """Test that a compacted resample evaluates from its cached values."""
+        responses, resources = self.make_resample()
+        fused = FusedMetrics(self.shared_args, self.metric_args, self.metric_refs)
+        stats = ResampleStats(responses, resources, [2, 12])
+        expected = fused.evaluate(stats.boots, None, None, stats=stats)
+        stats.compact()
+        assert stats.responses is None and stats.resources is None
+        pd.testing.assert_frame_equal(fused.evaluate(stats.boots, None, None, stats=stats), expected)
+
+    def test_cache_matches_evaluate(self):
+        """Test that caching a resample lets the metrics evaluate it once compacted."""
+        responses, resources = self.make_resample()
+        fused = FusedMetrics(self.shared_args, self.metric_args, self.metric_refs)
+        stats = ResampleStats(responses, resources, [2, 12])
+        expected = fused.evaluate(stats.boots, responses, resources)
+        fused.cache(stats)
+        stats.compact()
+        with patch('success_metrics.MetricColumns.__setitem__') as write:
+            fused.cache(stats)
+        write.assert_not_called()
+        pd.testing.assert_frame_equal(fused.evaluate(stats.boots, None, None, stats=stats), expected)
+
+    def test_metric_columns_to_frame(self):
+        """Test that MetricColumns builds a single DataFrame."""
+        bs_cols = MetricColumns()
+        assert bs_cols.to_frame().empty
+        bs_cols['a'] = np.array([1.0, 2.0])
+        bs_cols['b'] = bs_cols['a'] * 2
+        frame = bs_cols.to_frame()
+        assert list(frame.columns) == ['a', 'b']
+        np.testing.assert_array_equal(frame['b'], [2.0, 4.0])
+
+
+class TestResponseMetrics:
+    """Test the evaluation of several responses on the same resample."""
+
+    shared_args = TestFusedMetrics.shared_args
+    metric_args = TestFusedMetrics.metric_args
+    metric_refs = TestFusedMetrics.metric_refs
+
+    def test_response_args(self):
+        """Test that dict arguments take the entry of the response."""
+        args = {'response_col': ['a', 'b'], 'response_dir': {'a': -1, 'b': 1}, 'gap': 1.0}
+        assert success_metrics.response_args(args, 'b') == {
+            'response_col': 'b', 'response_dir': 1, 'gap': 1.0
+        }
+
+    def test_matches_fused_per_response(self):
+        """Test that every response gets the results of its own FusedMetrics."""
+        responses, resources = TestEvaluateLevels.make_resample(self)
+        stacked = np.stack([responses, 2 * responses], axis=-1)
+        shared_args = dict(self.shared_args, response_col=['x', 'y'])
+        shared_args['best_value'] = {'x': self.shared_args['best_value'],
+                                     'y': 2 * self.shared_args['best_value']}
+        multi = success_metrics.ResponseMetrics(shared_args, self.metric_args, self.metric_refs)
+        multi_df = multi.evaluate([3, 12], stacked, resources)
+
+        for j, col in enumerate(['x', 'y']):
+            single_args = success_metrics.response_args(shared_args, col)
+            fused = FusedMetrics(single_args, self.metric_args, self.metric_refs)
+            single_df = fused.evaluate([3, 12], stacked[..., j], resources)
+            for single_col in single_df.columns:
+                np.testing.assert_allclose(
+                    multi_df['{}_Response={}'.format(single_col, col)],
+                    single_df[single_col],
+                    err_msg=single_col,
+                )
+
+
+    def test_cache_every_response(self):
+        """Test that caching a resample of several responses fills every response."""
+        responses, resources = TestEvaluateLevels.make_resample(self)
+        stacked = np.stack([responses, 2 * responses], axis=-1)
+        shared_args = dict(self.shared_args, response_col=['x', 'y'])
+        multi = success_metrics.ResponseMetrics(shared_args, self.metric_args, self.metric_refs)
+        stats = ResampleStats(stacked, resources, [3, 12])
+        expected = multi.evaluate([3, 12], stacked, resources)
+        multi.cache(stats)
+        stats.compact()
+        pd.testing.assert_frame_equal(multi.evaluate([3, 12], None, None, stats=stats), expected)
+
+
+class TestSweep:
+    """Test metrics evaluated for several gaps and target probabilities at once."""
+
+    shared_args = TestEvaluateLevels.shared_args
+    gaps = [5.0, 20.0, 60.0]
+
+    def rtt_args(self, gap, s):
+        return {'gap': gap, 'fail_value': np.nan, 'RTT_factor': 2.0, 's': s}
+
+    def test_sweep_columns(self):
+        """Test that only the arguments given as lists qualify the columns."""
+        combinations = list(success_metrics.sweep({'gap': [1.0, 2.0], 's': 0.99}, ['gap', 's']))
+        assert combinations == [
+            ({'gap': 1.0, 's': 0.99}, {'gap': 1.0}),
+            ({'gap': 2.0, 's': 0.99}, {'gap': 2.0}),
+        ]
+        assert success_metrics.metric_names('RTT', {'gap': 1.0, 's': 0.9}) == (
+            'Key=RTT_gap=1.0_s=0.9',
+            'ConfInt=upper_Key=RTT_gap=1.0_s=0.9',
+            'ConfInt=lower_Key=RTT_gap=1.0_s=0.9',
+        )
+
+    def test_success_probs_match_single_gaps(self):
+        """Test resample and count success probabilities against one gap at a time."""
+        responses, resources = TestEvaluateLevels.make_resample(self)
+        stats = ResampleStats(responses, resources, [4, 12])
+        probs = stats.success_probs(self.shared_args, self.gaps)
+        for g, gap in enumerate(self.gaps):
+            np.testing.assert_allclose(probs[g], stats.success_prob(self.shared_args, gap))
+
+        values, value_resources, counts, boots = TestCountStats.make_counts(self)
+        for response_dir in [-1, 1]:
+            shared_args = dict(self.shared_args, response_dir=response_dir)
+            count_stats = CountStats(values, value_resources, counts, boots)
+            probs = count_stats.success_probs(shared_args, self.gaps)
+            for g, gap in enumerate(self.gaps):
+                np.testing.assert_allclose(probs[g], count_stats.success_prob(shared_args, gap))
+
+    def test_success_probabilities(self):
+        """Test the sorted weighted success probabilities against the mask."""
+        rng = np.random.default_rng(3)
+        responses = -rng.integers(0, 11, size=40).astype(float)
+        weights = rng.integers(1, 5, size=40)
+        for response_dir in [-1, 1]:
+            shared_args = dict(self.shared_args, response_dir=response_dir)
+            probs = success_metrics.success_probabilities(responses, weights, shared_args, self.gaps)
+            expected = [
+                success_metrics.success_probability(responses, weights, shared_args, gap)
+                for gap in self.gaps
+            ]
+            np.testing.assert_allclose(probs, expected)
+
+    @pytest.mark.parametrize("exact", [False, True])
+    def test_metrics_match_single_runs(self, exact):
+        """Test that a sweep gives the columns of one run per (gap, s)."""
+        responses, resources = TestEvaluateLevels.make_resample(self)
+        boots = [3, 12]
+        s_values = [0.9, 0.99]
+        sweep_args = {'SuccessProb': {'gap': self.gaps}, 'RTT': self.rtt_args(self.gaps, s_values)}
+        fused = FusedMetrics(self.shared_args, sweep_args, [SuccessProb, RTT], exact=exact)
+        group = (responses[:, 0], resources[:, 0], None)
+        sweep_df = fused.evaluate(boots, responses, resources, group=group)
+
+        for gap in self.gaps:
+            for s in s_values:
+                single_args = {'SuccessProb': {'gap': gap}, 'RTT': self.rtt_args(gap, s)}
+                fused = FusedMetrics(self.shared_args, single_args, [SuccessProb, RTT], exact=exact)
+                single_df = fused.evaluate(boots, responses, resources, group=group)
+                for key, swept in [('SuccProb', {'gap': gap}), ('RTT', {'gap': gap, 's': s})]:
+                    for col, sweep_col in zip(
+                        success_metrics.metric_names(key),
+                        success_metrics.metric_names(key, swept),
+                    ):
+                        np.testing.assert_allclose(
+                            sweep_df[sweep_col], single_df[col], err_msg=sweep_col
+                        )
+
+
+class TestDirichletMeans:
+    """Test Bayesian bootstrap means."""
+
+    def test_dirichlet_means_moments(self):
+        """Test the mean and spread of the means against the resample means."""
+        rng = np.random.RandomState(0)
+        values = np.array([1.0, 2.0, 2.0, 7.0])
+        boots = np.array([3, 30])
+        means = success_metrics.dirichlet_means(values, None, boots, 20000, rng)
+        assert means.shape == (2, 20000)
+        np.testing.assert_allclose(means.mean(axis=1), values.mean(), rtol=0.01)
+        # Var of a resample mean is var / n, the Dirichlet one var / (n + 1)
+        np.testing.assert_allclose(means.var(axis=1), values.var() / (boots + 1), rtol=0.05)
+
+    def test_dirichlet_means_weights(self):
+        """Test that weights act as repeated values."""
+        means = success_metrics.dirichlet_means(
+            np.array([1.0, 7.0]), np.array([3.0, 1.0]), [5], 2000, np.random.RandomState(1)
+        )
+        repeated = success_metrics.dirichlet_means(
+            np.array([1.0, 1.0, 1.0, 7.0]), None, [5], 2000, np.random.RandomState(1)
+        )
+        np.testing.assert_allclose(means, repeated)
+
+    def test_dirichlet_means_large_support(self):
+        """Test that a realistic support is drawn level by level within the budget."""
+        values = np.random.default_rng(2).exponential(1.0, size=2000)
+        boots = np.array([50, 1, 400, 10])
+        rng = MagicMock(wraps=np.random.RandomState(0))
+        means = success_metrics.dirichlet_means(
+            values, None, boots, 100, rng, memory_budget=8 * 2000 * 40
+        )
+        gamma = rng.standard_gamma
+        assert means.shape == (4, 100)
+        # 3 blocks of at most 40 iterations, one draw per level
+        assert gamma.call_count == 12
+        assert max(np.prod(call.kwargs['size']) for call in gamma.call_args_list) == 40 * 2000
+        np.testing.assert_allclose(means.mean(axis=1)[[0, 2]], values.mean(), rtol=0.05)
+        np.testing.assert_allclose(
+            means.std(axis=1)[[0, 2]], values.std() / np.sqrt(boots[[0, 2]] + 1), rtol=0.2
+        )
+
+    def test_mean_resources_passed_to_stats(self):
+        """Test that given mean resources are used instead of the resources."""
+        means = np.ones((2, 3))
+        stats = ResampleStats(np.zeros((4, 3)), None, [2, 4], mean_resources=means)
+        assert stats.mean_resource() is means
+
+
+class TestCountStats:
+    """Test count-based resamples against the equivalent resample arrays."""
+
+    shared_args = TestEvaluateLevels.shared_args
+
+    def make_counts(self):
+        rng = np.random.default_rng(4)
+        values = np.array([-4.0, -10.0, 0.0, -7.0])
+        value_resources = np.array([1.0, 2.0, 3.0, 4.0])
+        increments = rng.multinomial(3, [0.1, 0.2, 0.3, 0.4], size=(2, 6))
+        counts = np.cumsum(increments, axis=0)
+        return values, value_resources, counts, np.array([3, 6])
+
+    def test_count_stats_match_resample_stats(self):
+        """Test every intermediate value against the materialized resample."""
+        values, value_resources, counts, boots = self.make_counts()
+        count_stats = CountStats(values, value_resources, counts, boots)
+
+        for j, n in enumerate(boots):
+            responses, resources = count_stats.level(j)
+            assert responses.shape == (n, counts.shape[1])
+            stats = ResampleStats(responses, resources, [n])
+            for opt_sense in [-1, 1]:
+                np.testing.assert_array_equal(count_stats.best(opt_sense)[j], stats.best(opt_sense)[0])
+            np.testing.assert_allclose(
+                count_stats.success_prob(self.shared_args, 20.0)[j],
+                stats.success_prob(self.shared_args, 20.0)[0],
+            )
+            np.testing.assert_allclose(count_stats.mean_resource()[j], stats.mean_resource()[0])
+
+    def test_fused_metrics_on_counts(self):
+        """Test that every metric evaluates from counts, with the fallback for others."""
+
+        class MaxResource(SuccessMetrics):
+            def __init__(self, shared_args, metric_args):
+                SuccessMetrics.__init__(self, shared_args)
+
+            def evaluate(self, bs_df, responses, resources):
+                bs_df['MaxResource'] = [np.mean(np.max(resources, axis=0))]
+
+        values, value_resources, counts, boots = self.make_counts()
+        stats = CountStats(values, value_resources, counts, boots)
+        metric_args = dict(TestFusedMetrics.metric_args, MaxResource=None)
+        fused = FusedMetrics(
+            self.shared_args, metric_args, TestFusedMetrics.metric_refs + [MaxResource]
+        )
+        bs_df = fused.evaluate(boots, None, None, stats=stats)
+
+        assert len(bs_df) == 2
+        for key in ['Response', 'PerfRatio', 'SuccProb', 'MeanTime']:
+            assert not bs_df[names.param2filename({'Key': key}, '')].isna().any()
+        np.testing.assert_allclose(
+            bs_df['MaxResource'].iloc[1],
+            np.mean(np.max(stats.level(1)[1], axis=0)),
+        )
+
+
+class TestExactEvaluation:
+    """Test the exact best-of-n evaluation of Response and PerfRatio."""
+
+    def test_best_of_n_distribution_enumeration(self):
+        """Test against enumerating every pair of draws from three values."""
+        support, pmf = best_of_n_distribution(np.array([3.0, 1.0, 2.0]), None, np.array([1, 2]), -1)
+
+        np.testing.assert_allclose(support, [1.0, 2.0, 3.0])
+        np.testing.assert_allclose(pmf[0], [1 / 3, 1 / 3, 1 / 3])
+        # min of two draws: 1 in 5 of 9 pairs, 2 in 3 and 3 in 1
+        np.testing.assert_allclose(pmf[1], [5 / 9, 3 / 9, 1 / 9])
+
+    def test_best_of_n_distribution_weights_and_maximization(self):
+        """Test that weights act as repeated rows and maximization reverses the order."""
+        values = np.array([1.0, 2.0, 2.0, 3.0])
+        support, pmf = best_of_n_distribution(values, np.array([2, 1, 1, 0]), np.array([3]), 1)
+        repeated_support, repeated_pmf = best_of_n_distribution(
+            np.array([1.0, 1.0, 2.0, 2.0]), None, np.array([3]), 1
+        )
+
+        np.testing.assert_allclose(support, [3.0, 2.0, 1.0])
+        np.testing.assert_allclose(pmf[0], [0.0, 1 - 0.5**3, 0.5**3])
+        np.testing.assert_allclose(pmf[0] @ support, repeated_pmf[0] @ repeated_support)
+        np.testing.assert_allclose(pmf.sum(axis=1), 1.0)
+
+    def test_response_exact_matches_resampling(self):
+        """Test that the exact moments agree with a large Monte Carlo resample."""
+        shared_args = {'confidence_level': 68}
+        response = Response(shared_args, {'opt_sense': -1})
+        rng = np.random.default_rng(2)
+        values = rng.normal(size=40)
+        boots = np.array([1, 4, 16])
+
+        exact_df = pd.DataFrame(index=range(len(boots)))
+        response.evaluate_exact(exact_df, values, None, None, boots)
+
+        resampled = values[rng.integers(0, len(values), size=(16, 200000))]
+        resampled_df = pd.DataFrame(index=range(len(boots)))
+        response.evaluate_levels(resampled_df, resampled, None, boots)
+
+        for col in resampled_df.columns:
+            np.testing.assert_allclose(exact_df[col], resampled_df[col], atol=1e-2, err_msg=col)
+
+    def test_exact_attribute(self):
+        """Test which metrics support exact evaluation."""
+        assert Response.exact and PerfRatio.exact and InvPerfRatio.exact
+        assert SuccessProb.exact and RTT.exact
+        assert not Resource.exact
+        with pytest.raises(NotImplementedError):
+            SuccessMetrics({}).evaluate_exact(pd.DataFrame(), None, None, None, [1])
+
+
+class TestAnalyticSuccessProb:
+    """Test the binomial evaluation of SuccessProb and RTT."""
+
+    shared_args = {
+        'confidence_level': 68,
+        'random_value': 0.0,
+        'best_value': -10.0,
+        'response_dir': -1,
+    }
+    # With gap = 20 the threshold is -8, so 3 of the 5 responses are successes
+    responses = np.array([-10.0, -9.0, -8.5, -5.0, -1.0])
+
+    def test_success_prob_exact(self):
+        """Test the mean and binomial quantiles of the success probability."""
+        metric = SuccessProb(self.shared_args, {'gap': 20.0})
+        boots = np.array([1, 10, 100])
+        bs_df = pd.DataFrame(index=range(len(boots)))
+        metric.evaluate_exact(bs_df, self.responses, None, None, boots)
+
+        base = names.param2filename({"Key": "SuccProb"}, "")
+        lower = names.param2filename({"Key": "SuccProb", "ConfInt": "lower"}, "")
+        upper = names.param2filename({"Key": "SuccProb", "ConfInt": "upper"}, "")
+        np.testing.assert_allclose(bs_df[base], 0.6)
+        np.testing.assert_allclose(bs_df[lower], [0.0, 0.4, 0.55])
+        np.testing.assert_allclose(bs_df[upper], [1.0, 0.8, 0.65])
+
+    def test_success_prob_exact_weights(self):
+        """Test that aggregated counts weigh the success probability."""
+        metric = SuccessProb(self.shared_args, {'gap': 20.0})
+        bs_df = pd.DataFrame(index=[0])
+        weights = np.array([1, 0, 0, 2, 1])
+        metric.evaluate_exact(bs_df, self.responses, None, weights, np.array([4]))
+
+        assert bs_df[names.param2filename({"Key": "SuccProb"}, "")].iloc[0] == pytest.approx(0.25)
+
+    def test_rtt_exact_matches_resampling(self):
+        """Test the exact RTT against a large resample when failures are negligible."""
+        metric_args = {'gap': 20.0, 'fail_value': 1e6, 'RTT_factor': 2.0, 's': 0.99}
+        metric = RTT(self.shared_args, metric_args)
+        boots = np.array([30, 40])
+
+        exact_df = pd.DataFrame(index=range(len(boots)))
+        metric.evaluate_exact(exact_df, self.responses, None, None, boots)
+
+        rng = np.random.default_rng(3)
+        resampled = self.responses[rng.integers(0, len(self.responses), size=(40, 100000))]
+        resampled_df = pd.DataFrame(index=range(len(boots)))
+        metric.evaluate_levels(resampled_df, resampled, None, boots)
+
+        base = names.param2filename({"Key": "RTT"}, "")
+        np.testing.assert_allclose(exact_df[base], resampled_df[base], rtol=1e-2)
+        for col in resampled_df.columns:
+            np.testing.assert_allclose(exact_df[col], resampled_df[col], rtol=0.1, err_msg=col)
+
+    @pytest.mark.parametrize("fail_value", [np.nan, np.inf, 1e3])
+    def test_rtt_exact_matches_resampling_with_failures(self, fail_value):
+        """Test that exact and resampled RTTs treat levels that can fail alike."""
+        metric_args = {'gap': 20.0, 'fail_value': fail_value, 'RTT_factor': 2.0, 's': 0.99}
+        metric = RTT(self.shared_args, metric_args)
+        boots = np.array([1, 3])
+
+        exact_df = pd.DataFrame(index=range(len(boots)))
+        metric.evaluate_exact(exact_df, self.responses, None, None, boots)
+
+        rng = np.random.default_rng(4)
+        resampled = self.responses[rng.integers(0, len(self.responses), size=(3, 100000))]
+        resampled_df = pd.DataFrame(index=range(len(boots)))
+        metric.evaluate_levels(resampled_df, resampled, None, boots)
+
+        for col in resampled_df.columns:
+            np.testing.assert_allclose(
+                exact_df[col], resampled_df[col], rtol=0.05, err_msg=col
+            )
+
+    def test_rtt_exact_failure(self):
+        """Test that a level without any success reports the fail value."""
+        shared_args = dict(self.shared_args, best_value=-100.0)
+        metric = RTT(shared_args, {'gap': 1.0, 'fail_value': 1e6, 'RTT_factor': 1.0, 's': 0.99})
+        bs_df = pd.DataFrame(index=range(2))
+        metric.evaluate_exact(bs_df, self.responses, None, None, np.array([1, 5]))
+
+        for col in bs_df.columns:
+            assert list(bs_df[col]) == [1e6, 1e6]
+
+
 class TestConstants:
     """Test module constants."""
     
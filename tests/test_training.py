@@ -337,6 +337,29 @@ class TestSplitTrainTest:
         finally:
             training.check_split_validity = original_check
 
+    def test_split_train_test_seeded(self):
+        """Test that a seeded split labels each instance independently of the others."""
+        df = pd.DataFrame({
+            'instance': ['I{}'.format(i) for i in range(20)],
+            'value': np.arange(20),
+        })
+        original_check = check_split_validity
+        import training
+        training.check_split_validity = False
+
+        try:
+            full = split_train_test(df, split_on=['instance'], ptrain=0.5, seed=3)
+            again = split_train_test(df, split_on=['instance'], ptrain=0.5, seed=3)
+            part = split_train_test(df.iloc[5:], split_on=['instance'], ptrain=0.5, seed=3)
+
+            pd.testing.assert_frame_equal(full, again)
+            labels = full.set_index('instance')['train']
+            np.testing.assert_array_equal(
+                labels[part['instance']].values, part['train'].values
+            )
+        finally:
+            training.check_split_validity = original_check
+
 
 class TestBestRecommended:
     """Test class for best_recommended function."""